@@ -0,0 +1,388 @@
+"""
+Throughput e accuratezza degli anonimizzatori su documenti sintetici.
+
+Genera documenti italiani di diverse dimensioni (frasi senza dati personali
+prese da Giorno_10/data, alternate a frasi con nomi, IBAN, codici fiscali,
+email, telefoni e carte generati, di cui si conoscono le posizioni) e li
+passa a:
+    ner_anonymizer   NERAnonimizer.anonymize (Giorno_10/src)
+    anonymize_text   anonymize_text di studenti/Federico_Guzzo
+    mask_text        TextAnonymizer.mask_text di studenti/daniel_craciun
+
+Ogni implementazione gira in un processo separato (memoria di picco non
+condivisa, nessun conflitto tra moduli omonimi). Riporta documenti/s,
+caratteri/s, latenza p50/p95 per documento, RSS di picco e precision/recall
+delle entità. Le parti mascherate si ricavano confrontando input e output a
+livello di parola, così tutte le implementazioni sono misurate allo stesso
+modo. Un'entità è trovata solo se tutte le sue parole sono state
+sostituite; quelle sostituite solo in parte (es. il cognome rimasto in
+chiaro) sono riportate a parte come trovate parzialmente.
+
+Uso:
+    python benchmarks/bench_anonymizers.py [--sizes 500 2000 8000] [--docs 20]
+    python benchmarks/bench_anonymizers.py --output risultati.json
+    python benchmarks/bench_anonymizers.py --baseline risultati.json  # exit 1 se regressione
+"""
+
+import argparse
+import bisect
+import difflib
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from cascade_ner import is_candidate
+from config import Config, REGEX_PATTERNS
+
+DATA_DIR = ROOT / "data"
+IMPLEMENTATIONS = ("ner_anonymizer", "anonymize_text", "mask_text")
+
+FIRST_NAMES = ["Mario", "Luca", "Giulia", "Francesca", "Alessandro", "Chiara", "Marco", "Elena",
+               "Davide", "Sara", "Paolo", "Valentina"]
+LAST_NAMES = ["Rossi", "Bianchi", "Romano", "Colombo", "Ricci", "Marino", "Greco", "Bruno",
+              "Gallo", "Conti", "Esposito", "Ferrari"]
+
+# Frasi con dati personali: {ETICHETTA} viene sostituito da un valore generato
+PII_TEMPLATES = [
+    "Gentile {PER},",
+    "Cordiali saluti,\n{PER}",
+    "La pratica è seguita da {PER} del nostro ufficio.",
+    "Il sig. {PER} ha confermato l'ordine.",
+    "Il pagamento va effettuato sul conto IBAN {IBAN}.",
+    "Codice fiscale: {CF}",
+    "Per informazioni scrivere a {EMAIL}.",
+    "Telefono: {PHONE}",
+    "Carta di credito: {CARD}",
+]
+
+SLOT_RE = re.compile(r'\{([A-Z]+)\}')
+WORD_RE = re.compile(r'\S+')
+
+
+def digits(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice("0123456789") for _ in range(n))
+
+
+def letters(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(n))
+
+
+def generate_value(rng: random.Random, label: str) -> str:
+    if label == "PER":
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    if label == "IBAN":
+        return f"IT{digits(rng, 2)}{letters(rng, 1)}{digits(rng, 22)}"
+    if label == "CF":
+        return (f"{letters(rng, 6)}{digits(rng, 2)}{letters(rng, 1)}{digits(rng, 2)}"
+                f"{letters(rng, 1)}{digits(rng, 3)}{letters(rng, 1)}")
+    if label == "EMAIL":
+        return f"{rng.choice(FIRST_NAMES)}.{rng.choice(LAST_NAMES)}{rng.randint(1, 99)}@example.it".lower()
+    if label == "PHONE":
+        return f"+39 3{digits(rng, 2)} {digits(rng, 3)} {digits(rng, 4)}"
+    if label == "CARD":
+        return " ".join(digits(rng, 4) for _ in range(4))
+    raise ValueError(label)
+
+
+def filler_sentences() -> List[str]:
+    """Righe del corpus senza possibili nomi propri né match regex"""
+    lines = []
+    for path in sorted(DATA_DIR.glob("*.txt")):
+        for line in path.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if (line and not is_candidate(line)
+                    and not any(re.search(pattern, line) for pattern in REGEX_PATTERNS.values())):
+                lines.append(line)
+    return list(dict.fromkeys(lines))
+
+
+def make_document(rng: random.Random, fillers: List[str], size: int,
+                  pii_fraction: float = 0.3) -> Tuple[str, List[Tuple[int, int, str]]]:
+    """Documento di almeno size caratteri e le sue entità (start, end, etichetta)"""
+    parts: List[str] = []
+    entities: List[Tuple[int, int, str]] = []
+    length = 0
+    while length < size:
+        if rng.random() < pii_fraction:
+            template = rng.choice(PII_TEMPLATES)
+            line, cursor = "", 0
+            for match in SLOT_RE.finditer(template):
+                value = generate_value(rng, match.group(1))
+                line += template[cursor:match.start()]
+                entities.append((length + len(line), length + len(line) + len(value), match.group(1)))
+                line += value
+                cursor = match.end()
+            line += template[cursor:]
+        else:
+            line = rng.choice(fillers)
+        parts.append(line)
+        length += len(line) + 1
+    return "\n".join(parts) + "\n", entities
+
+
+def make_corpus(sizes: List[int], docs: int, seed: int) -> Dict[int, List[Tuple[str, List]]]:
+    rng = random.Random(seed)
+    fillers = filler_sentences()
+    return {size: [make_document(rng, fillers, size) for _ in range(docs)] for size in sizes}
+
+
+def masked_spans(original: str, output: str) -> List[Tuple[int, int]]:
+    """Intervalli dell'originale le cui parole non compaiono più nell'output"""
+    words = list(WORD_RE.finditer(original))
+    matcher = difflib.SequenceMatcher(
+        None, [w.group() for w in words], WORD_RE.findall(output), autojunk=False
+    )
+    return [
+        (words[i1].start(), words[i2 - 1].end())
+        for tag, i1, i2, _, _ in matcher.get_opcodes()
+        if tag in ("replace", "delete")
+    ]
+
+
+def score(text: str, entities: List[Tuple[int, int, str]], predicted: List[Tuple[int, int]],
+          counts: Dict[str, List[int]]) -> None:
+    """
+    Aggiorna i conteggi [attese, trovate per intero, trovate in parte] per
+    etichetta e, sotto None, [intervalli mascherati, intervalli che toccano
+    un'entità]. Un'entità è trovata per intero se ogni suo carattere (spazi
+    esclusi) cade in un intervallo mascherato.
+    """
+    predicted = sorted(predicted)
+    starts = [p_start for p_start, _ in predicted]
+
+    def masked(i: int) -> bool:
+        pos = bisect.bisect_right(starts, i) - 1
+        return pos >= 0 and i < predicted[pos][1]
+
+    for start, end, label in entities:
+        entry = counts.setdefault(label, [0, 0, 0])
+        entry[0] += 1
+        chars = [masked(i) for i in range(start, end) if not text[i].isspace()]
+        if all(chars):
+            entry[1] += 1
+        elif any(chars):
+            entry[2] += 1
+    entry = counts.setdefault(None, [0, 0])
+    entry[0] += len(predicted)
+    entry[1] += sum(
+        any(start < p_end and p_start < end for start, end, _ in entities)
+        for p_start, p_end in predicted
+    )
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def load_implementation(name: str, model: str) -> Tuple[Callable[[str], str], str]:
+    """Funzione testo -> testo anonimizzato e nome del modello NER usato"""
+    if name == "ner_anonymizer":
+        Config.NER_MODEL = model
+        from anonymizer import NERAnonimizer
+        anonymizer = NERAnonimizer()
+        return (lambda text: anonymizer.anonymize(text)[0]), model
+
+    if name == "anonymize_text":
+        os.environ["ANONYMIZATION_CACHE"] = "false"
+        sys.path.insert(0, str(ROOT / "studenti" / "Federico_Guzzo" / "src"))
+        import anonymize_mails
+        return anonymize_mails.anonymize_text, anonymize_mails.NER_MODEL_NAME
+
+    if name == "mask_text":
+        import importlib.util
+        from transformers import pipeline
+        # Solo il modulo anonymizer: l'__init__ del pacchetto importa LangChain
+        path = ROOT / "studenti" / "daniel_craciun" / "src" / "rag_app_daniel_craciun" / "anonymizer.py"
+        spec = importlib.util.spec_from_file_location("daniel_anonymizer", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        TextAnonymizer = module.TextAnonymizer
+        # Di default TextAnonymizer non maschera nulla: stessi pattern e
+        # etichette NER di NERAnonimizer
+        masks = {label: f"[{label}]" for label in (*REGEX_PATTERNS, "PER", "LOC", "ORG", "MISC")}
+        anonymizer = TextAnonymizer(
+            regex_patterns=REGEX_PATTERNS, entity_mask_map=masks,
+            custom_ner_pipeline=pipeline("ner", model=model, aggregation_strategy="simple"),
+        )
+        return anonymizer.mask_text, model
+
+    raise ValueError(f"Implementazione sconosciuta: {name}")
+
+
+def run_worker(args) -> Dict:
+    """Misura una sola implementazione nel processo corrente"""
+    corpus = make_corpus(args.sizes, args.docs, args.seed)
+
+    start = time.perf_counter()
+    anonymize, model = load_implementation(args.worker, args.model)
+    anonymize(corpus[args.sizes[0]][0][0])  # warm-up (carica il modello)
+    load_s = time.perf_counter() - start
+
+    report = {"model": model, "load_s": load_s, "sizes": {}}
+    all_docs, all_latencies, all_counts, all_errors = [], [], {}, 0
+    for size, documents in corpus.items():
+        latencies, counts, errors = [], {}, 0
+        for text, entities in documents:
+            start = time.perf_counter()
+            try:
+                output = anonymize(text)
+            except Exception:
+                # Documento non anonimizzato: le sue entità restano in chiaro
+                output, errors = text, errors + 1
+            latencies.append(time.perf_counter() - start)
+            predicted = masked_spans(text, output)
+            score(text, entities, predicted, counts)
+            score(text, entities, predicted, all_counts)
+        report["sizes"][str(size)] = summarize(documents, latencies, counts, errors)
+        all_docs += documents
+        all_latencies += latencies
+        all_errors += errors
+
+    report["overall"] = summarize(all_docs, all_latencies, all_counts, all_errors)
+    report["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return report
+
+
+def summarize(documents: List[Tuple[str, List]], latencies: List[float],
+              counts: Dict[str, List[int]], errors: int) -> Dict:
+    seconds = sum(latencies)
+    chars = sum(len(text) for text, _ in documents)
+    predicted, correct = counts.get(None, [0, 0])
+    labels = {label: entry for label, entry in counts.items() if label is not None}
+    gold = sum(entry[0] for entry in labels.values())
+    found = sum(entry[1] for entry in labels.values())
+    partial = sum(entry[2] for entry in labels.values())
+    return {
+        "docs": len(documents),
+        "errors": errors,
+        "chars": chars,
+        "docs_per_s": len(documents) / seconds if seconds else 0.0,
+        "chars_per_s": chars / seconds if seconds else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "precision": correct / predicted if predicted else 0.0,
+        "recall": found / gold if gold else 0.0,
+        "partial": partial / gold if gold else 0.0,
+        "recall_by_label": {label: entry[1] / entry[0] for label, entry in sorted(labels.items())},
+        "partial_by_label": {label: entry[2] / entry[0] for label, entry in sorted(labels.items())},
+    }
+
+
+def run_all(args) -> Dict:
+    """Lancia un processo per implementazione e raccoglie i report JSON"""
+    results = {}
+    for name in args.impl:
+        command = [
+            sys.executable, os.path.abspath(__file__), "--worker", name,
+            "--model", args.model, "--docs", str(args.docs), "--seed", str(args.seed),
+            "--sizes", *map(str, args.sizes),
+        ]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{name}: errore\n{completed.stderr[-2000:]}", file=sys.stderr)
+            results[name] = {"error": completed.stderr.strip().splitlines()[-1:]}
+            continue
+        results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {
+        "config": {"sizes": args.sizes, "docs": args.docs, "seed": args.seed, "model": args.model},
+        "results": results,
+    }
+
+
+def regressions(report: Dict, baseline: Dict, tolerance: float, recall_drop: float) -> List[str]:
+    """Confronto con un report precedente: throughput e recall per dimensione"""
+    found = []
+    for name, result in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or "sizes" not in previous or "sizes" not in result:
+            continue
+        for size, current in result["sizes"].items():
+            old = previous["sizes"].get(size)
+            if old is None:
+                continue
+            if current["docs_per_s"] < old["docs_per_s"] * (1 - tolerance):
+                found.append(f"{name} [{size}]: {current['docs_per_s']:.2f} doc/s "
+                             f"(prima {old['docs_per_s']:.2f})")
+            if current["recall"] < old["recall"] - recall_drop:
+                found.append(f"{name} [{size}]: recall {current['recall']:.3f} (prima {old['recall']:.3f})")
+    return found
+
+
+def print_report(report: Dict) -> None:
+    config = report["config"]
+    print(f"Documenti sintetici: {config['docs']} per dimensione {config['sizes']} (seed {config['seed']})")
+    for name, result in report["results"].items():
+        if "error" in result:
+            print(f"\n{name}: non eseguito ({' '.join(result['error'])})")
+            continue
+        print(f"\n{name} ({result['model']}): caricamento {result['load_s']:.1f} s, "
+              f"RSS di picco {result['peak_rss_mb']:.0f} MB")
+        print(f"  {'caratteri':>9} {'doc/s':>8} {'car/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'precision':>9} {'recall':>7} {'parziali':>8} {'errori':>6}")
+        for size, row in [*result["sizes"].items(), ("totale", result["overall"])]:
+            print(f"  {size:>9} {row['docs_per_s']:>8.2f} {row['chars_per_s']:>10.0f} "
+                  f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['precision']:>9.3f} {row['recall']:>7.3f} "
+                  f"{row.get('partial', 0.0):>8.3f} {row['errors']:>6}")
+        overall = result["overall"]
+        print("  recall per etichetta: " + ", ".join(
+            f"{label} {value:.2f}" + (f" (+{overall['partial_by_label'][label]:.2f} parziali)"
+                                      if overall.get("partial_by_label", {}).get(label) else "")
+            for label, value in overall["recall_by_label"].items()
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput e accuratezza degli anonimizzatori")
+    parser.add_argument("--impl", nargs="+", choices=IMPLEMENTATIONS, default=list(IMPLEMENTATIONS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[500, 2000, 8000],
+                        help="Dimensioni dei documenti in caratteri")
+    parser.add_argument("--docs", type=int, default=20, help="Documenti per dimensione")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default=Config.NER_MODEL,
+                        help="Modello NER (anonymize_text usa sempre il proprio)")
+    parser.add_argument("--output", help="File JSON in cui salvare il report")
+    parser.add_argument("--json", action="store_true", help="Output in formato JSON")
+    parser.add_argument("--baseline", help="Report JSON precedente da confrontare")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Calo massimo di doc/s rispetto alla baseline (frazione)")
+    parser.add_argument("--recall-drop", type=float, default=0.02,
+                        help="Calo massimo di recall rispetto alla baseline")
+    parser.add_argument("--worker", choices=IMPLEMENTATIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return 0
+
+    report = run_all(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(report, json.load(f), args.tolerance, args.recall_drop)
+        for line in found:
+            print(f"REGRESSIONE {line}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+NER a cascata vs modello completo su ogni frase.
+
+Riporta recall (e precision) delle entità della cascata rispetto al modello
+completo, frazione di testo che ha evitato il modello completo e throughput,
+sul corpus Giorno_10/data diviso in segmenti come fa NERAnonimizer.
+
+Uso:
+    python benchmarks/bench_cascade.py [--fast-model modello_piccolo]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from transformers import pipeline
+from anonymizer import split_segments
+from cascade_ner import CascadeNER
+from config import Config
+from onnx_ner import entity_agreement
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def timed(ner, segments, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = ner(segments, batch_size=Config.NER_BATCH_SIZE)
+    return results, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NER a cascata")
+    parser.add_argument("--model", default=Config.NER_MODEL, help="Modello completo")
+    parser.add_argument("--fast-model", default=Config.NER_CASCADE_MODEL, help="Modello piccolo (opzionale)")
+    parser.add_argument("--confidence", type=float, default=Config.NER_CASCADE_CONFIDENCE)
+    parser.add_argument("--repeat", type=int, default=3, help="Ripetizioni sul corpus")
+    parser.add_argument("--json", action="store_true", help="Output in formato JSON")
+    args = parser.parse_args()
+
+    corpus = [path.read_text(encoding="utf-8") for path in sorted(DATA_DIR.glob("*.txt"))]
+    segments = [segment for text in corpus for _, segment in split_segments(text, Config.NER_SEGMENT_CHARS)]
+
+    full = pipeline("ner", model=args.model, aggregation_strategy="simple")
+    fast = pipeline("ner", model=args.fast_model, aggregation_strategy="simple") if args.fast_model else None
+
+    full(segments[:1])  # warm-up
+    reference, full_time = timed(full, segments, args.repeat)
+    
+    # Statistiche di una sola passata
+    cascade = CascadeNER(full, fast, args.confidence)
+    results, cascade_time = timed(cascade, segments, 1)
+
+    report = {
+        **entity_agreement(reference, results),
+        "skipped_fraction": cascade.stats()["skipped_fraction"],
+        "full_segments_per_s": len(segments) / full_time,
+        "cascade_segments_per_s": len(segments) / cascade_time,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Corpus: {len(corpus)} documenti, {len(segments)} segmenti")
+    print(f"Recall vs modello completo: {report['recall']:.3f} (precision {report['precision']:.3f}, "
+          f"{report['candidate']}/{report['reference']} entità)")
+    print(f"Testo che ha evitato il modello completo: {report['skipped_fraction']:.1%}")
+    print(f"Throughput: completo {report['full_segments_per_s']:.1f} seg/s, "
+          f"cascata {report['cascade_segments_per_s']:.1f} seg/s")
+
+
+if __name__ == "__main__":
+    main()
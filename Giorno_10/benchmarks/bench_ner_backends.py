@@ -0,0 +1,72 @@
+"""
+Confronto backend NER: PyTorch vs ONNX Runtime (fp32 e int8).
+
+Per ogni backend riporta l'accordo a livello di entità con PyTorch e il
+throughput sul corpus Giorno_10/data.
+
+Uso:
+    python benchmarks/bench_ner_backends.py --repeat 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from config import Config
+from windowed_ner import WindowedNER
+from onnx_ner import OnnxWindowedNER, entity_agreement
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend NER")
+    parser.add_argument("--model", default=Config.NER_MODEL, help="Modello HuggingFace o path locale")
+    parser.add_argument("--repeat", type=int, default=3, help="Ripetizioni sul corpus")
+    parser.add_argument("--cache-dir", default=Config.ONNX_CACHE_DIR, help="Cartella modelli ONNX")
+    parser.add_argument("--json", action="store_true", help="Output in formato JSON")
+    args = parser.parse_args()
+    
+    corpus = [path.read_text(encoding="utf-8") for path in sorted(DATA_DIR.glob("*.txt"))]
+    total_chars = sum(len(text) for text in corpus)
+    
+    common = {"stride": Config.NER_WINDOW_STRIDE, "batch_size": Config.NER_BATCH_SIZE}
+    backends = {
+        "pytorch": WindowedNER.from_pretrained(args.model, **common),
+        "onnx-fp32": OnnxWindowedNER.from_pretrained(args.model, args.cache_dir, quantize=False, **common),
+        "onnx-int8": OnnxWindowedNER.from_pretrained(args.model, args.cache_dir, quantize=True, **common),
+    }
+    
+    reference = None
+    report = {}
+    for name, ner in backends.items():
+        ner(corpus[:1])  # warm-up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = ner(corpus)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        
+        reference = reference or results
+        report[name] = {
+            "docs_per_s": len(corpus) / elapsed,
+            "chars_per_s": total_chars / elapsed,
+            **entity_agreement(reference, results),
+        }
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    
+    print(f"Corpus: {len(corpus)} documenti, {total_chars} caratteri")
+    for name, row in report.items():
+        print(f"{name:<10} {row['docs_per_s']:8.1f} doc/s  {row['chars_per_s']:10.0f} char/s  "
+              f"F1 vs pytorch {row['f1']:.3f} (P {row['precision']:.3f} R {row['recall']:.3f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Carico concorrente sul NER: un modello per sessione vs server condiviso.
+
+Simula N sessioni che anonimizzano i documenti di Giorno_10/data in parallelo
+(a segmenti, come NERAnonimizer) e riporta throughput e memoria residente
+(RSS) dopo il caricamento dei modelli.
+
+Uso:
+    python benchmarks/bench_ner_server.py --sessions 1 4 8
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from transformers import pipeline
+from anonymizer import split_segments
+from config import Config
+from ner_server import NERInferenceServer
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def rss_mb() -> float:
+    """Picco di memoria residente del processo in MB (Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_sessions(pipes, segments, repeat):
+    """Ogni sessione usa la propria pipe: richieste da un segmento alla volta"""
+    def session(pipe):
+        for _ in range(repeat):
+            for segment in segments:
+                pipe(segment)
+
+    threads = [threading.Thread(target=session, args=(pipe,)) for pipe in pipes]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def load_pipe(model):
+    return pipeline("ner", model=model, aggregation_strategy="simple")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server NER condiviso")
+    parser.add_argument("--model", default=Config.NER_MODEL, help="Modello HuggingFace o path locale")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeat", type=int, default=2, help="Passate sul corpus per sessione")
+    parser.add_argument("--mode", choices=["shared", "per-session"], default="shared",
+                        help="Un solo processo per modalità, così l'RSS è confrontabile")
+    parser.add_argument("--json", action="store_true", help="Output in formato JSON")
+    args = parser.parse_args()
+
+    corpus = [path.read_text(encoding="utf-8") for path in sorted(DATA_DIR.glob("*.txt"))]
+    segments = [segment for text in corpus for _, segment in split_segments(text, Config.NER_SEGMENT_CHARS)]
+
+    report = {}
+    shared = None
+    for n in args.sessions:
+        if args.mode == "shared":
+            shared = shared or NERInferenceServer(load_pipe(args.model), Config.NER_BATCH_SIZE,
+                                                  Config.NER_MICROBATCH_MS)
+            pipes = [shared] * n
+        else:
+            pipes = [load_pipe(args.model) for _ in range(n)]
+
+        elapsed = run_sessions(pipes, segments, args.repeat)
+        report[n] = {
+            "segments_per_s": n * args.repeat * len(segments) / elapsed,
+            "rss_mb": rss_mb(),
+            **({"avg_batch": shared.stats()["avg_batch"]} if shared else {}),
+        }
+
+    if args.json:
+        print(json.dumps({args.mode: report}, indent=2))
+        return
+
+    print(f"Modalità {args.mode}: {len(segments)} segmenti per passata")
+    for n, row in report.items():
+        extra = f"  batch medio {row['avg_batch']:.1f}" if "avg_batch" in row else ""
+        print(f"{n:>3} sessioni {row['segments_per_s']:8.1f} segmenti/s  RSS {row['rss_mb']:7.0f} MB{extra}")
+
+
+if __name__ == "__main__":
+    main()
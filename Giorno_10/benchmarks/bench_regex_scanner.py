@@ -0,0 +1,71 @@
+"""
+Micro-benchmark: scanner regex compilato vs loop per pattern.
+
+Uso:
+    python benchmarks/bench_regex_scanner.py --repeat 200
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from config import REGEX_PATTERNS
+from regex_scanner import RegexScanner, re2
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def legacy_scan(text: str):
+    """Loop precedente: un finditer per pattern, ricompilato a ogni chiamata"""
+    matches = []
+    sorted_patterns = sorted(REGEX_PATTERNS.items(), key=lambda item: len(item[1]), reverse=True)
+    for label, pattern in sorted_patterns:
+        for match in re.finditer(pattern, text, flags=re.IGNORECASE):
+            matches.append((match.start(), match.end(), label))
+    return matches
+
+
+def load_corpus():
+    """Legge tutti i documenti .txt di Giorno_10/data"""
+    return [path.read_text(encoding="utf-8") for path in sorted(DATA_DIR.glob("*.txt"))]
+
+
+def run(func, corpus, repeat: int) -> float:
+    """Tempo medio (ms) per passata completa sul corpus"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            func(text)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scanner regex")
+    parser.add_argument("--repeat", type=int, default=200, help="Ripetizioni sul corpus")
+    args = parser.parse_args()
+    
+    corpus = load_corpus()
+    total_chars = sum(len(text) for text in corpus)
+    print(f"Corpus: {len(corpus)} documenti, {total_chars} caratteri")
+    
+    candidates = {"loop per pattern": legacy_scan}
+    engines = ["re", "re2"] if re2 is not None else ["re"]
+    for engine in engines:
+        scanner = RegexScanner(REGEX_PATTERNS, engine=engine)
+        candidates[f"scanner ({engine})"] = lambda text, s=scanner: list(s.scan(text))
+    
+    baseline = None
+    for name, func in candidates.items():
+        elapsed = run(func, corpus, args.repeat)
+        baseline = baseline or elapsed
+        mb_s = total_chars / (elapsed / 1000) / 1e6
+        print(f"{name:<20} {elapsed:8.3f} ms/corpus  {mb_s:7.2f} MB/s  x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ Tutti i componenti AI: Azure, RAG e CrewAI.
 """
 
 import re
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import streamlit as st
 from openai import AzureOpenAI
 
@@ -19,6 +19,8 @@ from crewai import Agent, Task, Crew
 from crewai.llm import LLM
 
 from config import Config
+from chunk_registry import ChunkRegistry
+from embedding_cache import CachedEmbeddings, get_embedding_cache
 
 class AzureProcessor:
     """Processore Azure OpenAI"""
@@ -84,6 +86,7 @@ class RAGChatbot:
     def __init__(self):
         self.vector_store = None
         self.qa_chain = None
+        self.chunks = ChunkRegistry()
         self.embeddings = None
         self.llm = None
         self.setup_langchain_components()
@@ -104,6 +107,14 @@ class RAGChatbot:
                 api_key=Config.AZURE_EMBEDDING_API_KEY,
                 chunk_size=16
             )
+            if Config.EMBEDDING_CACHE:
+                self.embeddings = CachedEmbeddings(
+                    self.embeddings,
+                    Config.AZURE_EMBEDDING_DEPLOYMENT_NAME,
+                    get_embedding_cache(Config.EMBEDDING_CACHE_PATH,
+                                        Config.EMBEDDING_CACHE_MB * 1024 * 1024,
+                                        Config.EMBEDDING_CACHE_DTYPE)
+                )
             
             # LLM
             self.llm = AzureChatOpenAI(
@@ -119,76 +130,121 @@ class RAGChatbot:
             self.llm = None
  
     def build_vector_store(self, anonymized_docs: Dict[str, Dict]):
-        """Costruisce vector store FAISS"""
+        """
+        Aggiorna il vector store FAISS con i documenti confermati: indicizza
+        solo quelli nuovi o modificati ed elimina i chunk di quelli rimossi o
+        cambiati. Se nulla è cambiato non richiama gli embedding.
+        """
         if not self.embeddings or not self.llm:
             st.error("Componenti LangChain non configurati.")
             return
  
         # Prepara testi per RAG
-        all_texts = []
+        documents = {}
         for filename, doc_data in anonymized_docs.items():
             if doc_data.get('confirmed', False):
-                all_texts.append(f"Documento {filename}:\n{doc_data['anonymized']}")
+                documents[filename] = f"Documento {filename}:\n{doc_data['anonymized']}"
  
-        if not all_texts:
+        if not documents and self.vector_store is None:
             st.warning("Nessun documento confermato per RAG.")
             return
  
-        with st.spinner("Creando vector store..."):
-            # Chunking
-            combined_text = "\n\n".join(all_texts)
+        to_add, stale_ids = self.chunks.plan(documents)
+        if not to_add and not stale_ids:
+            return
+ 
+        with st.spinner("Aggiornando vector store..."):
+            if stale_ids and self.vector_store is not None:
+                self.vector_store.delete(stale_ids)
+            self.chunks.forget([filename for filename in self.chunks.documents
+                                if filename not in documents or filename in to_add])
+ 
+            # Chunking per documento, con l'origine nei metadati
             text_splitter = CharacterTextSplitter(
                 separator="\n\n",
                 chunk_size=1000,
                 chunk_overlap=200,
                 length_function=len,
             )
-            texts = text_splitter.split_text(combined_text)
-            
-            # Crea FAISS index
-            self.vector_store = FAISS.from_texts(texts, self.embeddings)
-            st.success(f"Vector store con {len(texts)} chunks creato.")
-            
-            # Setup QA chain
-            qa_prompt = """Usa il contesto per rispondere alla domanda.
+            texts, metadatas, ids = [], [], []
+            for filename, text in to_add.items():
+                chunks = text_splitter.split_text(text)
+                texts.extend(chunks)
+                metadatas.extend({"source": filename} for _ in chunks)
+                ids.extend(self.chunks.register(filename, text, len(chunks)))
+ 
+            if not self.chunks.documents:
+                self.vector_store = None
+                self.qa_chain = None
+                st.info("Vector store svuotato.")
+                return
+ 
+            try:
+                if self.vector_store is None:
+                    self.vector_store = FAISS.from_texts(texts, self.embeddings, metadatas=metadatas, ids=ids)
+                    self.qa_chain = self._build_qa_chain()
+                elif texts:
+                    self.vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+            except Exception:
+                # I documenti non indicizzati verranno ritentati al prossimo aggiornamento
+                self.chunks.forget(to_add)
+                raise
+            st.success(
+                f"Vector store aggiornato: {len(texts)} chunks aggiunti, "
+                f"{len(stale_ids)} rimossi ({len(self.chunks)} totali)."
+            )
+ 
+    def _build_qa_chain(self):
+        """Catena RetrievalQA sul vector store corrente"""
+        qa_prompt = """Usa il contesto per rispondere alla domanda.
 Se non sai la risposta, dillo chiaramente.
 
 {context}
 
 Domanda: {question}
 Risposta:"""
-            
-            QA_PROMPT = PromptTemplate.from_template(qa_prompt)
-            
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=self.vector_store.as_retriever(),
-                return_source_documents=True,
-                chain_type_kwargs={"prompt": QA_PROMPT}
-            )
+        
+        QA_PROMPT = PromptTemplate.from_template(qa_prompt)
+        
+        return RetrievalQA.from_chain_type(
+            llm=self.llm,
+            chain_type="stuff",
+            retriever=self.vector_store.as_retriever(),
+            return_source_documents=True,
+            chain_type_kwargs={"prompt": QA_PROMPT}
+        )
  
     def answer_question(self, query: str) -> str:
         """Risponde usando RAG"""
+        return self.answer_with_sources(query)[0]
+    
+    def answer_with_sources(self, query: str) -> Tuple[str, List[str]]:
+        """Risponde usando RAG e restituisce anche i documenti da cui è tratta la risposta"""
         if not self.qa_chain:
-            return "RAG non pronto. Costruisci prima il knowledge base."
+            return "RAG non pronto. Costruisci prima il knowledge base.", []
  
         try:
             result = self.qa_chain.invoke({"query": query})
             answer = result["result"]
+            sources: List[str] = []
             
             # Aggiungi fonti se disponibili
             source_docs = result.get("source_documents", [])
             if source_docs:
                 answer += "\n\n**Fonti:**\n"
                 for i, doc in enumerate(source_docs):
-                    match = re.search(r"Documento (.*?):\n", doc.page_content)
-                    source_info = f" (da {match.group(1)})" if match else ""
+                    source = doc.metadata.get("source")
+                    if source is None:
+                        match = re.search(r"Documento (.*?):\n", doc.page_content)
+                        source = match.group(1) if match else None
+                    if source and source not in sources:
+                        sources.append(source)
+                    source_info = f" (da {source})" if source else ""
                     answer += f"- ...{doc.page_content[-100:]}{source_info}\n"
             
-            return answer
+            return answer, sources
         except Exception as e:
-            return f"Errore RAG: {e}"
+            return f"Errore RAG: {e}", []
     
     def get_relevant_context(self, query: str, max_docs: int = 3) -> str:
         """Estrae contesto rilevante per query"""
@@ -0,0 +1,197 @@
+"""
+Cache persistente dei risultati di anonimizzazione, indirizzata per contenuto.
+
+La mappa placeholder -> valore originale è cifrata con la chiave Fernet del
+vault: sul disco restano in chiaro solo il testo mascherato e gli span.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from vault import Fernet, InvalidToken, vault_key
+
+# Versione del formato: va incrementata se cambia la logica di mascheramento,
+# così le voci create dalle versioni precedenti non vengono più trovate
+# (2: placeholder stabili, resti degli span sovrapposti, regex case-insensitive;
+# 3: mappa entità cifrata, le voci in chiaro vengono cancellate all'apertura)
+CACHE_VERSION = 3
+
+
+def cache_key(text: str, model: str, patterns: Dict[str, str], *extra: object) -> str:
+    """Hash SHA-256 di testo, modello, pattern regex ed eventuali parametri extra"""
+    fingerprint = json.dumps(
+        [CACHE_VERSION, model, list(patterns.items()), [str(item) for item in extra]],
+        ensure_ascii=False
+    )
+    digest = hashlib.sha256(fingerprint.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnonymizationCache:
+    """
+    Cache su SQLite di testo mascherato, mappa entità e span.
+
+    La mappa entità è cifrata con la chiave Fernet key; le voci cifrate con
+    un'altra chiave vengono trattate come assenti. La dimensione totale delle
+    voci è limitata a max_bytes: oltre il limite vengono eliminate le voci
+    usate meno di recente (LRU).
+    """
+
+    def __init__(self, path: str, key: bytes, max_bytes: int = 256 * 1024 * 1024):
+        if Fernet is None:
+            raise ImportError("La cache richiede il pacchetto 'cryptography' (pip install cryptography)")
+        self.path = path
+        self._fernet = Fernet(key)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Apre la connessione (una per processo, condivisa tra i thread)"""
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Le pagine liberate vengono azzerate: le voci eliminate non restano nel file
+            conn.execute("PRAGMA secure_delete=ON")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " masked TEXT NOT NULL,"
+                " entities TEXT NOT NULL,"
+                " spans TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            # Totali aggiornati dai trigger: nessuna SUM sull'intera tabella a ogni put
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS totals ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " entries INTEGER NOT NULL,"
+                " bytes INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO totals (id, entries, bytes)"
+                " SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN"
+                " UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN"
+                " UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN"
+                " UPDATE totals SET bytes = bytes + NEW.size - OLD.size; END"
+            )
+            # Le versioni precedenti salvavano la mappa entità in chiaro
+            if conn.execute("PRAGMA user_version").fetchone()[0] < CACHE_VERSION:
+                conn.execute("DELETE FROM entries")
+                conn.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, str], List[list]]]:
+        """Restituisce (testo mascherato, entità, span) oppure None"""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT masked, entities, spans FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            try:
+                entities = row and self._fernet.decrypt(row[1])
+            except InvalidToken:
+                entities = None
+            if row is None or entities is None:
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+
+        return row[0], json.loads(entities), json.loads(row[2])
+
+    def put(self, key: str, masked: str, entities: Dict[str, str], spans: Sequence[Sequence]) -> None:
+        """Salva un risultato ed elimina le voci più vecchie oltre il limite"""
+        entities_blob = self._fernet.encrypt(json.dumps(entities, ensure_ascii=False).encode("utf-8"))
+        spans_json = json.dumps([list(span) for span in spans], ensure_ascii=False)
+        size = len(masked.encode("utf-8")) + len(entities_blob) + len(spans_json.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            conn = self._connection()
+            # Upsert invece di INSERT OR REPLACE, che non attiva il trigger di cancellazione
+            conn.execute(
+                "INSERT INTO entries (key, masked, entities, spans, size, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET masked = excluded.masked,"
+                " entities = excluded.entities, spans = excluded.spans,"
+                " size = excluded.size, last_access = excluded.last_access",
+                (key, masked, entities_blob, spans_json, size, time.time())
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Elimina le voci meno recenti finché la dimensione totale rientra nel limite"""
+        total = conn.execute("SELECT bytes FROM totals").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            to_delete.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+
+    def clear(self) -> None:
+        """Svuota la cache e azzera i contatori"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Contatori hit/miss, numero di voci e dimensione occupata"""
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT entries, bytes FROM totals"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+@lru_cache(maxsize=4)
+def get_cache(path: str, key_path: str, max_bytes: int) -> AnonymizationCache:
+    """Istanza condivisa della cache per percorso, con la chiave del vault (VAULT_KEY o key_path)"""
+    return AnonymizationCache(path, vault_key(key_path), max_bytes)
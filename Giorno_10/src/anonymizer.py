@@ -3,17 +3,245 @@ Sistema di anonimizzazione con NER e regex.
 """
 
 import re
-from typing import Dict, Tuple
+from bisect import bisect_right
+from heapq import heappop, heappush
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 from transformers import pipeline
 import streamlit as st
 from config import Config, REGEX_PATTERNS
+from regex_scanner import get_scanner
+from windowed_ner import WindowedNER
+from onnx_ner import OnnxWindowedNER
+from anonymization_cache import AnonymizationCache, cache_key
+from cascade_ner import CascadeNER
+from sentence_memo import MemoizedNER, get_sentence_memo
+from gazetteer import Gazetteer
+from pipeline_metrics import PipelineMetrics, get_metrics
+
+# Soglia minima di confidenza per le entità NER
+NER_SCORE_THRESHOLD = 0.5
+
+# Priorità nella risoluzione delle sovrapposizioni (più basso vince)
+GAZETTEER_PRIORITY = 0
+REGEX_PRIORITY = 1
+NER_PRIORITY = 2
+
+# Spazi da cui può iniziare la sovrapposizione tra segmenti
+_SPACE_RE = re.compile(r'\s')
+
+
+class Span(NamedTuple):
+    """Entità rilevata come intervallo di caratteri sul testo originale"""
+    start: int
+    end: int
+    label: str
+    score: float
+    placeholder: str = ""
+
+
+def _is_placeholder(value: str) -> bool:
+    """Verifica se il valore è già un placeholder"""
+    return value.startswith('[') and value.endswith(']')
+
+
+def _owned_pieces(intervals: List[Tuple[int, int]]) -> List[List[Tuple[int, int]]]:
+    """
+    Per ogni intervallo (in ordine di priorità, il primo vince) le parti in
+    cui nessun intervallo precedente lo copre. Una scansione da sinistra a
+    destra con un heap degli intervalli aperti assegna ogni tratto
+    all'intervallo più prioritario: O(n log n) in totale.
+    """
+    pieces: List[List[Tuple[int, int]]] = [[] for _ in intervals]
+    by_start = sorted(range(len(intervals)), key=lambda rank: intervals[rank][0])
+    coords = sorted({pos for interval in intervals for pos in interval})
+    heap: List[Tuple[int, int]] = []
+    i = 0
+    for left, right in zip(coords, coords[1:]):
+        while i < len(by_start) and intervals[by_start[i]][0] <= left:
+            heappush(heap, (by_start[i], intervals[by_start[i]][1]))
+            i += 1
+        while heap and heap[0][1] <= left:
+            heappop(heap)
+        if heap:
+            owned = pieces[heap[0][0]]
+            if owned and owned[-1][1] == left:
+                owned[-1] = (owned[-1][0], right)
+            else:
+                owned.append((left, right))
+    return pieces
+
+
+def _trimmed(span: Span, pieces: List[Tuple[int, int]], text: Optional[str]) -> List[Span]:
+    """
+    Span accettati per le parti non coperte di span. Con il testo, i pezzi
+    vengono ripuliti da spazi e punteggiatura ai bordi e scartati se non
+    contengono caratteri alfanumerici.
+    """
+    if pieces == [(span.start, span.end)]:
+        return [span]
+
+    result = []
+    for start, end in pieces:
+        if text is not None:
+            while start < end and not text[start].isalnum():
+                start += 1
+            while end > start and not text[end - 1].isalnum():
+                end -= 1
+        if start < end:
+            # Il placeholder assegnato valeva per il valore intero
+            result.append(span._replace(start=start, end=end, placeholder=""))
+    return result
+
+
+def resolve_spans(candidates: List[Tuple[Span, int]], text: Optional[str] = None,
+                  first_index: int = 0) -> List[Span]:
+    """
+    Risolve le sovrapposizioni tra span candidati in O(n log n).
+
+    Ogni candidato è una coppia (span, priorità): tra span sovrapposti vince
+    la priorità più bassa, poi lo span più lungo, poi quello più a sinistra.
+    Dello span perdente restano le parti non coperte dal vincitore, così un
+    nome taggato insieme all'email che lo segue non esce in chiaro.
+    Restituisce gli span accettati ordinati per posizione, con placeholder
+    numerati nell'ordine del testo a partire da first_index (quelli già
+    assegnati, es. dal dizionario delle entità note, restano invariati).
+    """
+    ordered = sorted(
+        candidates,
+        key=lambda item: (item[1], -(item[0].end - item[0].start), item[0].start)
+    )
+    spans = [span for span, _ in ordered if span.end > span.start]
+    pieces = _owned_pieces([(span.start, span.end) for span in spans])
+    accepted = [piece for span, owned in zip(spans, pieces) for piece in _trimmed(span, owned, text)]
+
+    # Span vuoti: tenuti solo se non cadono su uno span accettato
+    empty = sorted({span.start: span for span, _ in reversed(ordered) if span.end <= span.start}.values())
+    if empty:
+        accepted.sort(key=lambda span: span.start)
+        starts = [span.start for span in accepted]
+        for span in empty:
+            pos = bisect_right(starts, span.start)
+            if not (pos and accepted[pos - 1].end > span.start):
+                accepted.append(span)
+    accepted.sort(key=lambda span: span.start)
+
+    return [
+        span._replace(placeholder=span.placeholder or f"[{span.label}_{i}]")
+        for i, span in enumerate(accepted, start=first_index)
+    ]
+
+
+def render_spans(text: str, spans: List[Span]) -> str:
+    """Sostituisce gli span (ordinati e disgiunti) con un unico join"""
+    parts = []
+    cursor = 0
+    for span in spans:
+        parts.append(text[cursor:span.start])
+        parts.append(span.placeholder)
+        cursor = span.end
+    parts.append(text[cursor:])
+    return "".join(parts)
+
+
+def split_segments(text: str, max_chars: int, overlap_chars: int = 0) -> List[Tuple[int, str]]:
+    """
+    Divide il testo in segmenti (offset, testo) di al più max_chars caratteri,
+    tagliando preferibilmente su righe vuote, poi su a capo, poi su spazi.
+    Con overlap_chars ogni segmento riprende, dall'inizio di una parola, circa
+    gli ultimi overlap_chars caratteri del precedente.
+    """
+    segments = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            for sep in ("\n\n", "\n", " "):
+                cut = text.rfind(sep, start + 1, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        if text[start:end].strip():
+            segments.append((start, text[start:end]))
+        if end >= len(text):
+            break
+        next_start = end
+        if overlap_chars and end - overlap_chars > start:
+            space = _SPACE_RE.search(text, end - overlap_chars, end)
+            if space is not None and space.end() < end:
+                next_start = space.end()
+        start = next_start
+    return segments
+
+
+def segment_bounds(segments: List[Tuple[int, str]]) -> List[Tuple[int, int]]:
+    """
+    Parte di testo assegnata a ciascun segmento: i confini cadono a metà delle
+    sovrapposizioni e ogni entità viene presa dal segmento a cui appartiene il
+    suo centro, quello in cui è più lontana dai bordi e il modello la vede
+    intera e con contesto. I resti di un'entità tagliata che finiscono
+    nell'altro segmento vengono coperti dall'entità intera in resolve_spans.
+    """
+    bounds = []
+    for i, (offset, segment) in enumerate(segments):
+        start = bounds[-1][1] if bounds else 0
+        end = offset + len(segment)
+        if i + 1 < len(segments):
+            next_offset = segments[i + 1][0]
+            end = (next_offset + end) // 2 if next_offset < end else next_offset
+        bounds.append((start, end))
+    return bounds
+
+
+def unmask_candidates(candidates: List[Tuple[Span, int]], known: List[Tuple[Span, int]]
+                      ) -> List[Tuple[Span, int]]:
+    """
+    Riporta sul testo originale gli span trovati sul testo in cui gli span
+    known sono già stati sostituiti dai placeholder. Gli span che toccano
+    un placeholder vengono scartati.
+    """
+    if not known:
+        return candidates
+    
+    starts, ends, shifts = [], [], []
+    shift = 0
+    for span, _ in known:
+        start = span.start + shift
+        starts.append(start)
+        ends.append(start + len(span.placeholder))
+        shift += len(span.placeholder) - (span.end - span.start)
+        shifts.append(shift)
+    
+    result = []
+    for span, priority in candidates:
+        k = bisect_right(ends, span.start)
+        if k < len(starts) and starts[k] < span.end:
+            continue
+        delta = shifts[k - 1] if k else 0
+        result.append((span._replace(start=span.start - delta, end=span.end - delta), priority))
+    return result
+
+
+def spans_to_entities(text: str, spans: List[Span]) -> Dict[str, str]:
+    """Costruisce la mappa placeholder -> valore originale"""
+    return {span.placeholder: text[span.start:span.end] for span in spans}
+
 
 class NERAnonimizer:
     """Anonimizzatore con NER e regex"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[AnonymizationCache] = None,
+                 ner_loader: Optional[Callable[[], Callable]] = None,
+                 gazetteer: Optional[Gazetteer] = None,
+                 metrics: Optional[PipelineMetrics] = None):
         self.regex_patterns = REGEX_PATTERNS
         self._ner_pipe = None
+        self.cache = cache
+        # Entità già confermate, mascherate prima di regex e NER
+        self.gazetteer = gazetteer
+        # Funzione che fornisce il backend NER (default: _load_ner_pipe)
+        self.ner_loader = ner_loader
+        # Tempi per fase e contatori per documento
+        self.metrics = metrics if metrics is not None else get_metrics()
     
     @property
     def ner_pipe(self):
@@ -21,81 +249,322 @@ class NERAnonimizer:
         if self._ner_pipe is None:
             with st.spinner("Caricamento modello NER..."):
                 try:
-                    self._ner_pipe = pipeline(
-                        "ner",
-                        model=Config.NER_MODEL,
-                        aggregation_strategy="simple"
-                    )
+                    with self.metrics.timer("model_load"):
+                        self._ner_pipe = (self.ner_loader or self._load_ner_pipe)()
                 except Exception as e:
                     st.error(f"Errore caricamento NER: {e}")
                     return None
         return self._ner_pipe
     
-    def mask_with_regex(self, text: str) -> Tuple[str, Dict]:
-        """Applica mascheramento con regex"""
-        masked_text = text
-        found_entities = {}
-        
-        # Ordina pattern per lunghezza (più lunghi prima)
-        sorted_patterns = sorted(
-            self.regex_patterns.items(), 
-            key=lambda item: len(item[1]), 
-            reverse=True
+    @staticmethod
+    def _load_ner_pipe():
+        """
+        Crea il backend NER, a cascata se Config.NER_CASCADE e con memo per
+        frase se Config.NER_SENTENCE_MEMO
+        """
+        pipe = NERAnonimizer._load_backend()
+        if Config.NER_CASCADE:
+            fast_pipe = None
+            if Config.NER_CASCADE_MODEL:
+                fast_pipe = pipeline("ner", model=Config.NER_CASCADE_MODEL, aggregation_strategy="simple")
+            pipe = CascadeNER(pipe, fast_pipe, Config.NER_CASCADE_CONFIDENCE)
+        if Config.NER_SENTENCE_MEMO:
+            pipe = MemoizedNER(pipe, get_sentence_memo(Config.NER_SENTENCE_MEMO_SIZE))
+        return pipe
+    
+    @staticmethod
+    def _load_backend():
+        """Crea il backend NER scelto in Config.NER_BACKEND"""
+        if Config.NER_BACKEND == "windowed":
+            return WindowedNER.from_pretrained(
+                Config.NER_MODEL,
+                stride=Config.NER_WINDOW_STRIDE,
+                batch_size=Config.NER_BATCH_SIZE
+            )
+        if Config.NER_BACKEND == "onnx":
+            return OnnxWindowedNER.from_pretrained(
+                Config.NER_MODEL,
+                cache_dir=Config.ONNX_CACHE_DIR,
+                quantize=Config.NER_ONNX_QUANTIZE,
+                stride=Config.NER_WINDOW_STRIDE,
+                batch_size=Config.NER_BATCH_SIZE
+            )
+        return pipeline(
+            "ner",
+            model=Config.NER_MODEL,
+            aggregation_strategy="simple"
         )
-
-        for label, pattern in sorted_patterns:
-            matches = list(re.finditer(pattern, masked_text, flags=re.IGNORECASE))
-            for match in reversed(matches):
-                original = match.group()
-                if original.startswith('[') and original.endswith(']'):
-                    continue
-
-                placeholder = f"[{label}_{len(found_entities)}]"
-                found_entities[placeholder] = original
-                masked_text = masked_text[:match.start()] + placeholder + masked_text[match.end():]
+    
+    def find_gazetteer_spans(self, text: str) -> List[Tuple[Span, int]]:
+        """Entità note del dizionario, con il loro placeholder stabile"""
+        if self.gazetteer is None:
+            return []
+        return [
+            (Span(start, end, label, 1.0, placeholder), GAZETTEER_PRIORITY)
+            for start, end, label, placeholder in self.gazetteer.find(text)
+        ]
+    
+    def find_candidates(self, text: str) -> List[Tuple[Span, int]]:
+        """
+        Span candidati di dizionario, regex e NER. Il NER lavora sul testo con
+        le entità note già mascherate, quindi solo sulla parte sconosciuta.
+        """
+        with self.metrics.timer("gazetteer"):
+            known = self.find_gazetteer_spans(text)
+            ner_text = render_spans(text, [span for span, _ in known])
+        ner_candidates = unmask_candidates(self.find_ner_spans(ner_text), known)
+        with self.metrics.timer("regex"):
+            regex_candidates = self.find_regex_spans(text)
+        return known + regex_candidates + ner_candidates
+    
+    def find_candidates_batch(self, texts: List[str], batch_size: Optional[int] = None,
+                              on_progress: Optional[Callable[[float], None]] = None
+                              ) -> List[List[Tuple[Span, int]]]:
+        """Come find_candidates, con il NER eseguito a batch su tutti i testi"""
+        with self.metrics.timer("gazetteer", len(texts)):
+            known = [self.find_gazetteer_spans(text) for text in texts]
+            ner_texts = [render_spans(text, [span for span, _ in spans]) for text, spans in zip(texts, known)]
+        ner_candidates = self.find_ner_spans_batch(ner_texts, batch_size, on_progress)
+        with self.metrics.timer("regex", len(texts)):
+            regex_candidates = [self.find_regex_spans(text) for text in texts]
+        return [
+            spans + regex + unmask_candidates(candidates, spans)
+            for spans, regex, candidates in zip(known, regex_candidates, ner_candidates)
+        ]
+    
+    def find_regex_spans(self, text: str) -> List[Tuple[Span, int]]:
+        """Raccoglie gli span candidati trovati dai pattern regex"""
+        scanner = get_scanner(self.regex_patterns, Config.REGEX_ENGINE)
+        
+        candidates = []
+        for start, end, label in scanner.scan(text):
+            if _is_placeholder(text[start:end]):
+                continue
+            candidates.append((Span(start, end, label, 1.0), REGEX_PRIORITY))
         
-        return masked_text, found_entities
+        return candidates
     
-    def mask_with_ner(self, text: str) -> Tuple[str, Dict]:
-        """Applica mascheramento con NER"""
+    def find_ner_spans(self, text: str) -> List[Tuple[Span, int]]:
+        """
+        Raccoglie gli span candidati trovati dal modello NER. I testi oltre
+        NER_SEGMENT_CHARS seguono la stessa segmentazione del batch.
+        """
         if not self.ner_pipe:
-            return text, {}
+            return []
+        if len(text) > Config.NER_SEGMENT_CHARS:
+            return self.find_ner_spans_batch([text])[0]
             
         try:
-            entities = self.ner_pipe(text)
-            entity_map = {}
-            
-            sorted_entities = sorted(entities, key=lambda x: x['start'], reverse=True)
-            
-            for ent in sorted_entities:
-                if ent['score'] > 0.5:
-                    label = ent['entity_group']
-                    original_text = text[ent['start']:ent['end']]
-                    
-                    if original_text.startswith('[') and original_text.endswith(']'):
-                        continue
-
-                    placeholder = f"[{label}_{len(entity_map)}]"
-                    entity_map[placeholder] = original_text
-                    
-                    text = text[:ent['start']] + placeholder + text[ent['end']:]
-            
-            return text, entity_map
-            
+            with self.metrics.timer("ner"):
+                entities = self.ner_pipe(text)
         except Exception as e:
             st.error(f"Errore NER: {e}")
-            return text, {}
+            return []
+
+        return self._ner_candidates(text, entities)
     
-    def anonymize(self, text: str) -> Tuple[str, Dict]:
-        """Pipeline completa di anonimizzazione"""
+    @staticmethod
+    def _ner_candidates(text: str, entities: List[Dict], offset: int = 0,
+                        bounds: Optional[Tuple[int, int]] = None) -> List[Tuple[Span, int]]:
+        """
+        Converte l'output della pipeline NER in span candidati sul testo;
+        con bounds tiene solo le entità il cui centro cade in [start, end)
+        """
+        candidates = []
+        for ent in entities:
+            if ent['score'] <= NER_SCORE_THRESHOLD:
+                continue
+            if bounds is not None and not 2 * bounds[0] <= ent['start'] + ent['end'] + 2 * offset < 2 * bounds[1]:
+                continue
+            start = min(ent['start'] + offset, len(text))
+            end = min(ent['end'] + offset, len(text))
+            if _is_placeholder(text[start:end]):
+                continue
+            candidates.append((Span(start, end, ent['entity_group'], float(ent['score'])), NER_PRIORITY))
+        
+        return candidates
+    
+    def _segment_lengths(self, segments: List[str]) -> List[int]:
+        """Lunghezza in token dei segmenti (caratteri se manca il tokenizer)"""
+        tokenizer = getattr(self.ner_pipe, 'tokenizer', None)
+        if tokenizer is None:
+            return [len(segment) for segment in segments]
+        try:
+            encoded = tokenizer(segments, add_special_tokens=False)
+            return [len(ids) for ids in encoded['input_ids']]
+        except Exception:
+            return [len(segment) for segment in segments]
+    
+    def find_ner_spans_batch(self, texts: List[str], batch_size: Optional[int] = None,
+                             on_progress: Optional[Callable[[float], None]] = None
+                             ) -> List[List[Tuple[Span, int]]]:
+        """
+        NER su più testi: i segmenti di tutti i documenti vengono ordinati per
+        lunghezza in token e passati alla pipeline a blocchi di batch_size,
+        così ogni batch ha padding minimo. I risultati tornano nell'ordine
+        originale, con offset riportati su ciascun documento.
+
+        I segmenti consecutivi si sovrappongono di NER_SEGMENT_OVERLAP
+        caratteri e ogni entità viene presa da un solo segmento (segment_bounds):
+        un nome a cavallo di un taglio resta intero.
+        """
+        results: List[List[Tuple[Span, int]]] = [[] for _ in texts]
+        if not texts or not self.ner_pipe:
+            return results
+        
+        batch_size = batch_size or Config.NER_BATCH_SIZE
+        segments = []
+        for doc_index, text in enumerate(texts):
+            pieces = split_segments(text, Config.NER_SEGMENT_CHARS, Config.NER_SEGMENT_OVERLAP)
+            for (offset, segment), bounds in zip(pieces, segment_bounds(pieces)):
+                segments.append((doc_index, offset, segment, bounds))
+        if not segments:
+            return results
+        
+        with self.metrics.timer("tokenize", len(segments)):
+            lengths = self._segment_lengths([segment for _, _, segment, _ in segments])
+        order = sorted(range(len(segments)), key=lambda i: lengths[i])
+        
+        for batch_start in range(0, len(order), batch_size):
+            batch = order[batch_start:batch_start + batch_size]
+            try:
+                with self.metrics.timer("ner", len(batch)):
+                    outputs = self.ner_pipe(
+                        [segments[i][2] for i in batch],
+                        batch_size=batch_size
+                    )
+            except Exception as e:
+                st.error(f"Errore NER: {e}")
+                outputs = [[] for _ in batch]
+            
+            for i, entities in zip(batch, outputs):
+                doc_index, offset, _, bounds = segments[i]
+                results[doc_index].extend(
+                    self._ner_candidates(texts[doc_index], entities, offset, bounds)
+                )
+            
+            if on_progress:
+                on_progress(min(batch_start + batch_size, len(order)) / len(order))
+        
+        return results
+    
+    def mask_with_regex(self, text: str) -> Tuple[str, Dict]:
+        """Applica mascheramento con regex"""
+        spans = resolve_spans(self.find_regex_spans(text), text)
+        return render_spans(text, spans), spans_to_entities(text, spans)
+    
+    def mask_with_ner(self, text: str) -> Tuple[str, Dict]:
+        """Applica mascheramento con NER"""
+        spans = resolve_spans(self.find_ner_spans(text), text)
+        return render_spans(text, spans), spans_to_entities(text, spans)
+    
+    def _cache_key(self, text: str) -> str:
+        """Chiave di cache: contenuto, modello, pattern e parametri NER"""
+        return cache_key(
+            text, Config.NER_MODEL, self.regex_patterns,
+            Config.NER_BACKEND, NER_SCORE_THRESHOLD,
+            Config.NER_SEGMENT_CHARS, Config.NER_SEGMENT_OVERLAP, Config.NER_WINDOW_STRIDE,
+            Config.NER_CASCADE, Config.NER_CASCADE_MODEL, Config.NER_CASCADE_CONFIDENCE,
+            Config.NER_SENTENCE_MEMO,
+            self.gazetteer.version if self.gazetteer is not None else ""
+        )
+    
+    def _cache_get(self, text: str) -> Optional[Tuple[str, Dict, List[Span]]]:
+        """Cerca il risultato in cache (None se assente o cache disattivata)"""
+        if self.cache is None:
+            return None
+        with self.metrics.timer("cache"):
+            cached = self.cache.get(self._cache_key(text))
+        if cached is None:
+            return None
+        masked, entities, spans = cached
+        return masked, entities, [Span(*span) for span in spans]
+    
+    def _cache_put(self, text: str, result: Tuple[str, Dict, List[Span]]) -> None:
+        """Salva il risultato in cache se attiva (mai senza modello NER caricato)"""
+        if self.cache is not None and self._ner_pipe is not None:
+            self.cache.put(self._cache_key(text), *result)
+    
+    def anonymize_with_spans(self, text: str) -> Tuple[str, Dict, List[Span]]:
+        """
+        Pipeline completa: raccoglie span regex e NER sul testo originale,
+        risolve le sovrapposizioni una sola volta e scrive l'output in un
+        unico passaggio. Restituisce testo, mappa entità e lista di span.
+        """
         if not text or not text.strip():
-            return text, {}
+            return text, {}, []
+        
+        cached = self._cache_get(text)
+        if cached is not None:
+            self.metrics.observe_document(len(text), len(cached[2]))
+            return cached
+        
+        candidates = self.find_candidates(text)
+        with self.metrics.timer("merge"):
+            spans = resolve_spans(candidates, text)
+        with self.metrics.timer("render"):
+            result = render_spans(text, spans), spans_to_entities(text, spans), spans
+        self._cache_put(text, result)
+        self.metrics.observe_document(len(text), len(spans))
+        return result
+    
+    def anonymize_batch(self, texts: List[str], batch_size: Optional[int] = None,
+                        on_progress: Optional[Callable[[float], None]] = None
+                        ) -> List[Tuple[str, Dict, List[Span]]]:
+        """
+        Anonimizza più testi con inferenza NER a batch.
+        Restituisce (testo, mappa entità, span) per ogni testo, nello stesso ordine.
+        I testi già presenti in cache non passano dal modello.
+        """
+        results: List[Optional[Tuple[str, Dict, List[Span]]]] = []
+        for text in texts:
+            if not text or not text.strip():
+                results.append((text, {}, []))
+            else:
+                results.append(self._cache_get(text))
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        candidates = self.find_candidates_batch([texts[i] for i in missing], batch_size, on_progress)
         
-        # Regex prima, poi NER
-        masked_text, regex_entities = self.mask_with_regex(text)
-        final_text, ner_entities = self.mask_with_ner(masked_text)
+        for i, text_candidates in zip(missing, candidates):
+            text = texts[i]
+            with self.metrics.timer("merge"):
+                spans = resolve_spans(text_candidates, text)
+            with self.metrics.timer("render"):
+                results[i] = render_spans(text, spans), spans_to_entities(text, spans), spans
+            self._cache_put(text, results[i])
         
-        # Combina entità
-        all_entities = {**regex_entities, **ner_entities}
+        for text, (_, _, spans) in zip(texts, results):
+            if text and text.strip():
+                self.metrics.observe_document(len(text), len(spans))
+        return results
+    
+    def detect_batch(self, texts: List[str], batch_size: Optional[int] = None,
+                     on_progress: Optional[Callable[[float], None]] = None) -> List[List[Span]]:
+        """
+        Solo rilevamento: span risolti per ogni testo, senza riscrivere l'output.
+        Usa gli stessi percorsi a batch (e la cache) di anonymize_batch.
+        """
+        results: List[Optional[List[Span]]] = []
+        for text in texts:
+            if not text or not text.strip():
+                results.append([])
+            else:
+                cached = self._cache_get(text)
+                results.append(cached[2] if cached is not None else None)
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        candidates = self.find_candidates_batch([texts[i] for i in missing], batch_size, on_progress)
+        for i, text_candidates in zip(missing, candidates):
+            with self.metrics.timer("merge"):
+                results[i] = resolve_spans(text_candidates, texts[i])
         
-        return final_text, all_entities
\ No newline at end of file
+        for text, spans in zip(texts, results):
+            if text and text.strip():
+                self.metrics.observe_document(len(text), len(spans))
+        return results
+    
+    def anonymize(self, text: str) -> Tuple[str, Dict]:
+        """Pipeline completa di anonimizzazione"""
+        final_text, all_entities, _ = self.anonymize_with_spans(text)
+        return final_text, all_entities
@@ -0,0 +1,141 @@
+"""
+NER a cascata: un filtro economico decide quali frasi passano al modello completo.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Frase: fino a punteggiatura finale o a capo
+SENTENCE_RE = re.compile(r'[^.!?\n]+(?:[.!?]+|\n|$)')
+
+# Parola con iniziale maiuscola (anche tutta maiuscola, es. ACME)
+CAPITALIZED_RE = re.compile(r"\b[A-ZÀ-Ý][\wÀ-ÿ'’&.-]*")
+
+# Parole spesso maiuscole che da sole non indicano un nome proprio
+COMMON_CAPITALIZED = {
+    "il", "lo", "la", "i", "gli", "le", "un", "una", "uno", "di", "da", "in", "con",
+    "su", "per", "tra", "fra", "e", "ed", "o", "ma", "se", "che", "non", "si", "ci",
+    "mi", "ti", "vi", "ho", "ha", "abbiamo", "come", "quando", "dove", "questo",
+    "questa", "questi", "queste", "nel", "nella", "della", "del", "al", "alla",
+    "a", "ai", "all", "dal", "dalla", "sono", "è", "gentile", "gentili", "egregio",
+    "spett", "spettabile", "caro", "cara", "cordiali", "distinti", "saluti",
+    "buongiorno", "buonasera", "grazie", "oggetto", "data", "tel", "telefono",
+    "email", "mail", "fax", "iban", "totale", "subtotale", "iva", "imponibile",
+    "fattura", "importo", "pagamento", "scadenza", "descrizione", "quantità",
+    "prezzo", "note", "allegato", "the", "an", "and", "or", "of",
+    "to", "for", "dear", "best", "regards", "hello", "hi", "thanks", "subject",
+    "from", "date", "invoice", "total", "payment",
+}
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Intervalli (start, end) delle frasi non vuote"""
+    return [
+        (match.start(), match.end())
+        for match in SENTENCE_RE.finditer(text)
+        if match.group().strip()
+    ]
+
+
+def is_candidate(sentence: str) -> bool:
+    """Vero se la frase contiene una parola maiuscola che potrebbe essere un nome"""
+    return any(
+        word.lower().rstrip(".") not in COMMON_CAPITALIZED
+        for word in CAPITALIZED_RE.findall(sentence)
+    )
+
+
+def candidate_runs(text: str) -> List[Tuple[int, int]]:
+    """Frasi candidate, con quelle adiacenti unite per dare contesto al modello"""
+    runs: List[Tuple[int, int]] = []
+    last_end = None
+    for start, end in split_sentences(text):
+        if not is_candidate(text[start:end]):
+            last_end = None
+            continue
+        if runs and last_end is not None:
+            runs[-1] = (runs[-1][0], end)
+        else:
+            runs.append((start, end))
+        last_end = end
+    return runs
+
+
+class CascadeNER:
+    """
+    Wrapper con la stessa interfaccia della pipeline NER.
+
+    Primo stadio: euristica su maiuscole che scarta le frasi senza possibili
+    nomi propri. Se è dato fast_pipe (modello piccolo) le frasi candidate
+    passano prima da lì e vanno al modello completo solo se contengono entità
+    con confidenza sotto confidence. Le statistiche riportano la frazione di
+    testo che ha evitato il modello completo.
+    """
+
+    def __init__(self, full_pipe: Callable, fast_pipe: Optional[Callable] = None,
+                 confidence: float = 0.9):
+        self.full_pipe = full_pipe
+        self.fast_pipe = fast_pipe
+        self.confidence = confidence
+        self.tokenizer = getattr(full_pipe, 'tokenizer', None)
+        self.total_chars = 0
+        self.full_chars = 0
+
+    def __call__(self, inputs: Union[str, List[str]], batch_size: Optional[int] = None,
+                 **kwargs) -> Union[List[Dict], List[List[Dict]]]:
+        if isinstance(inputs, str):
+            return self._predict([inputs], batch_size)[0]
+        return self._predict(list(inputs), batch_size)
+
+    def _run(self, pipe: Callable, texts: List[str], batch_size: Optional[int]) -> List[List[Dict]]:
+        if not texts:
+            return []
+        if batch_size:
+            return pipe(texts, batch_size=batch_size)
+        return pipe(texts)
+
+    def _predict(self, texts: List[str], batch_size: Optional[int]) -> List[List[Dict]]:
+        # (indice documento, start, end) per ogni frase candidata
+        runs = [
+            (doc_index, start, end)
+            for doc_index, text in enumerate(texts)
+            for start, end in candidate_runs(text)
+        ]
+        results: List[List[Dict]] = [[] for _ in texts]
+        to_full = runs
+
+        if self.fast_pipe is not None:
+            fast_outputs = self._run(self.fast_pipe, [texts[d][s:e] for d, s, e in runs], batch_size)
+            to_full = []
+            for run, entities in zip(runs, fast_outputs):
+                if all(ent['score'] >= self.confidence for ent in entities):
+                    self._collect(results, run, entities)
+                else:
+                    to_full.append(run)
+
+        full_outputs = self._run(self.full_pipe, [texts[d][s:e] for d, s, e in to_full], batch_size)
+        for run, entities in zip(to_full, full_outputs):
+            self._collect(results, run, entities)
+
+        self.total_chars += sum(len(text) for text in texts)
+        self.full_chars += sum(end - start for _, start, end in to_full)
+
+        for entities in results:
+            entities.sort(key=lambda ent: ent['start'])
+        return results
+
+    @staticmethod
+    def _collect(results: List[List[Dict]], run: Tuple[int, int, int], entities: List[Dict]) -> None:
+        """Riporta le entità di una frase sulle posizioni del documento"""
+        doc_index, start, _ = run
+        for ent in entities:
+            results[doc_index].append({**ent, 'start': ent['start'] + start, 'end': ent['end'] + start})
+
+    def stats(self) -> Dict[str, float]:
+        """Caratteri analizzati e frazione che ha evitato il modello completo"""
+        skipped = 1 - self.full_chars / self.total_chars if self.total_chars else 0.0
+        return {
+            "total_chars": self.total_chars,
+            "full_model_chars": self.full_chars,
+            "skipped_fraction": skipped,
+        }
@@ -0,0 +1,61 @@
+"""
+Registro dei chunk indicizzati nel vector store, per documento sorgente.
+
+Per ogni documento tiene l'hash del testo e gli ID dei suoi chunk: a ogni
+conferma o reset si calcola la differenza con i documenti confermati, così
+il vector store riceve solo i documenti nuovi o modificati e perde solo i
+vettori di quelli rimossi o cambiati.
+"""
+
+import hashlib
+from typing import Dict, List, Tuple
+
+
+def document_digest(text: str) -> str:
+    """Hash del contenuto di un documento"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ChunkRegistry:
+    """Mappa documento -> (hash del contenuto, ID dei chunk nel vector store)"""
+
+    def __init__(self):
+        self.documents: Dict[str, Tuple[str, List[str]]] = {}
+
+    def plan(self, texts: Dict[str, str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Confronta i documenti attuali (nome -> testo) con quelli indicizzati.
+
+        Returns:
+            (documenti da indicizzare, ID dei chunk da eliminare): i documenti
+            modificati compaiono in entrambi, con i vecchi ID da eliminare.
+        """
+        to_add = {}
+        to_delete = []
+        for filename, (digest, ids) in self.documents.items():
+            text = texts.get(filename)
+            if text is None or document_digest(text) != digest:
+                to_delete.extend(ids)
+        for filename, text in texts.items():
+            indexed = self.documents.get(filename)
+            if indexed is None or indexed[0] != document_digest(text):
+                to_add[filename] = text
+        return to_add, to_delete
+
+    def register(self, filename: str, text: str, n_chunks: int) -> List[str]:
+        """Registra il documento e restituisce gli ID dei suoi chunk"""
+        digest = document_digest(text)
+        ids = [f"{filename}:{digest[:12]}:{i}" for i in range(n_chunks)]
+        self.documents[filename] = (digest, ids)
+        return ids
+
+    def forget(self, filenames) -> None:
+        """Rimuove i documenti dal registro"""
+        for filename in filenames:
+            self.documents.pop(filename, None)
+
+    def clear(self) -> None:
+        self.documents.clear()
+
+    def __len__(self) -> int:
+        return sum(len(ids) for _, ids in self.documents.values())
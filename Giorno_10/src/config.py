@@ -22,10 +22,87 @@ class Config:
     AZURE_API_VERSION = "2024-02-01"
     DEPLOYMENT_NAME = "gpt-4o"
     AZURE_EMBEDDING_DEPLOYMENT_NAME = "text-embedding-ada-002"
+    
+    # Backend NER: "pipeline" (HuggingFace), "windowed" (finestre scorrevoli
+    # per documenti oltre i 512 token, sovrapposte di NER_WINDOW_STRIDE token)
+    # o "onnx" (finestre eseguite con ONNX Runtime, opzionalmente int8)
+    NER_BACKEND = os.getenv("NER_BACKEND", "pipeline")
+    NER_WINDOW_STRIDE = int(os.getenv("NER_WINDOW_STRIDE", "128"))
+    NER_ONNX_QUANTIZE = os.getenv("NER_ONNX_QUANTIZE", "true").lower() == "true"
+    ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", ".onnx_cache")
+    
+    # Inferenza NER a batch: dimensione batch, lunghezza massima dei segmenti
+    # e caratteri ripresi dal segmento precedente (entità a cavallo dei tagli)
+    NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "16"))
+    NER_SEGMENT_CHARS = int(os.getenv("NER_SEGMENT_CHARS", "1000"))
+    NER_SEGMENT_OVERLAP = int(os.getenv("NER_SEGMENT_OVERLAP", "200"))
+    
+    # NER a cascata: solo le frasi con possibili nomi propri (euristica sulle
+    # maiuscole) arrivano a NER_MODEL; con NER_CASCADE_MODEL un modello piccolo
+    # le filtra ancora e passa al grande solo quelle sotto NER_CASCADE_CONFIDENCE
+    NER_CASCADE = os.getenv("NER_CASCADE", "false").lower() == "true"
+    NER_CASCADE_MODEL = os.getenv("NER_CASCADE_MODEL", "")
+    NER_CASCADE_CONFIDENCE = float(os.getenv("NER_CASCADE_CONFIDENCE", "0.9"))
+    
+    # Memo NER per frase: firme, disclaimer e citazioni già viste riusano le
+    # entità trovate la prima volta (LRU di al più NER_SENTENCE_MEMO_SIZE frasi)
+    NER_SENTENCE_MEMO = os.getenv("NER_SENTENCE_MEMO", "false").lower() == "true"
+    NER_SENTENCE_MEMO_SIZE = int(os.getenv("NER_SENTENCE_MEMO_SIZE", "50000"))
+    
+    # Modello NER unico per processo, condiviso tra le sessioni: le richieste
+    # arrivate entro NER_MICROBATCH_MS millisecondi vengono unite in un batch
+    NER_SHARED_SERVER = os.getenv("NER_SHARED_SERVER", "true").lower() == "true"
+    NER_MICROBATCH_MS = float(os.getenv("NER_MICROBATCH_MS", "10"))
+    # Secondi massimi di attesa di una richiesta al server NER
+    NER_SERVER_TIMEOUT = float(os.getenv("NER_SERVER_TIMEOUT", "120"))
+    
+    # Motore regex: "auto" usa RE2 se installato, altrimenti "re"
+    REGEX_ENGINE = os.getenv("REGEX_ENGINE", "auto")
+    
+    # Cache persistente dei risultati (SQLite, LRU entro ANONYMIZATION_CACHE_MB)
+    ANONYMIZATION_CACHE = os.getenv("ANONYMIZATION_CACHE", "true").lower() == "true"
+    ANONYMIZATION_CACHE_PATH = os.getenv("ANONYMIZATION_CACHE_PATH", ".cache/anonymization.sqlite")
+    ANONYMIZATION_CACHE_MB = int(os.getenv("ANONYMIZATION_CACHE_MB", "256"))
+    
+    # Dizionario delle entità confermate: mascherate in ogni documento
+    # successivo con lo stesso placeholder, prima di regex e NER (file cifrato
+    # con la chiave del vault)
+    GAZETTEER = os.getenv("GAZETTEER", "true").lower() == "true"
+    GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", ".cache/gazetteer.json")
+    
+    # Vault cifrato placeholder -> valore originale per la re-identificazione
+    # delle risposte (chiave da VAULT_KEY oppure generata in VAULT_KEY_PATH)
+    VAULT = os.getenv("VAULT", "true").lower() == "true"
+    VAULT_PATH = os.getenv("VAULT_PATH", ".cache/vault.sqlite")
+    VAULT_KEY_PATH = os.getenv("VAULT_KEY_PATH", ".cache/vault.key")
+    
+    # Inventario dei dati personali (solo rilevamento): indice SQLite e chiave
+    # HMAC degli hash dei valori (da PII_INVENTORY_KEY oppure generata in
+    # PII_INVENTORY_KEY_PATH)
+    PII_INVENTORY_PATH = os.getenv("PII_INVENTORY_PATH", ".cache/pii_inventory.sqlite")
+    PII_INVENTORY_KEY = os.getenv("PII_INVENTORY_KEY", "")
+    PII_INVENTORY_KEY_PATH = os.getenv("PII_INVENTORY_KEY_PATH", ".cache/pii_inventory.key")
+    
+    # Cache degli embedding per (deployment, chunk): la ricostruzione del
+    # vector store ricalcola solo i chunk nuovi (float16 dimezza lo spazio)
+    EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+    EMBEDDING_CACHE_MB = int(os.getenv("EMBEDDING_CACHE_MB", "512"))
+    EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+    
+    # Tempi per fase della pipeline: destinazione delle misure ("none", "log",
+    # "csv" in METRICS_CSV_PATH, "prometheus" su /metrics alla porta METRICS_PORT)
+    METRICS_SINK = os.getenv("METRICS_SINK", "none").lower()
+    METRICS_CSV_PATH = os.getenv("METRICS_CSV_PATH", ".cache/metrics.csv")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
 
 # Pattern regex per entità sensibili
+# L'ordine è la priorità nello scanner: a parità di posizione vince il primo
+# I pattern sono compilati senza distinzione tra maiuscole e minuscole:
+# l'IBAN termina con una cifra o una maiuscola, così non ingloba le parole
+# in minuscolo che lo seguono ("... 0123 456 per i pagamenti")
 REGEX_PATTERNS = {
-    "IBAN": r'\bIT\d{2}(?: ?[A-Z0-9]){11,30}\b',
+    "IBAN": r'\bIT\d{2}(?: ?[A-Z0-9]){10,29}(?: ?\d|(?-i:[A-Z]))\b',
     "EMAIL": r'\b[\w\.-]+@[\w\.-]+\.\w{2,}\b',
     "CF": r'\b[A-Z]{6}[0-9]{2}[A-Z][0-9]{2}[A-Z][0-9]{3}[A-Z]\b',
     "CARD": r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b',
@@ -0,0 +1,242 @@
+"""
+Cache persistente degli embedding, indirizzata per (modello, contenuto del chunk).
+
+Ricostruire il vector store dopo la conferma di un documento ricalcola solo i
+chunk nuovi: gli altri vettori vengono letti da SQLite come blob float32 (o
+float16) invece di richiamare l'API di embedding.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
+# Versione del formato: va incrementata se cambia la normalizzazione dei testi
+CACHE_VERSION = 1
+
+# SQLite limita il numero di parametri per query
+_LOOKUP_CHUNK = 500
+
+
+def normalize_chunk(text: str) -> str:
+    """Forma canonica del chunk: Unicode NFC e spazi compattati"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def embedding_key(model: str, text: str) -> bytes:
+    """Hash SHA-256 di versione, modello (o deployment) e chunk normalizzato"""
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0{model}\0".encode("utf-8"))
+    digest.update(normalize_chunk(text).encode("utf-8"))
+    return digest.digest()
+
+
+class EmbeddingCache:
+    """
+    Cache su SQLite dei vettori di embedding.
+
+    I vettori sono salvati come blob numpy (float32, o float16 per dimezzare
+    lo spazio) e restituiti come float32. La dimensione totale è limitata a
+    max_bytes: oltre il limite vengono eliminate le voci usate meno di
+    recente (LRU).
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"dtype non supportato: {dtype}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Apre la connessione (una per processo, condivisa tra i thread)"""
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key BLOB PRIMARY KEY,"
+                " dtype TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+            # Totali aggiornati dai trigger: nessuna SUM sull'intera tabella a ogni put
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS totals ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " entries INTEGER NOT NULL,"
+                " bytes INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO totals (id, entries, bytes)"
+                " SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings BEGIN"
+                " UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings BEGIN"
+                " UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS embeddings_update AFTER UPDATE OF size ON embeddings BEGIN"
+                " UPDATE totals SET bytes = bytes + NEW.size - OLD.size; END"
+            )
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """Vettori trovati per le chiavi date (quelle assenti non compaiono)"""
+        found: Dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(unique), _LOOKUP_CHUNK):
+                chunk = unique[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                for key, dtype, blob in conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ):
+                    found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32)
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                conn.commit()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, items: Sequence[tuple]) -> None:
+        """Salva coppie (chiave, vettore) ed elimina le voci più vecchie oltre il limite"""
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            blob = np.asarray(vector, dtype=self.dtype).tobytes()
+            rows.append((key, self.dtype.name, blob, len(blob), now))
+        if not rows:
+            return
+
+        with self._lock:
+            conn = self._connection()
+            # Upsert invece di INSERT OR REPLACE, che non attiva il trigger di cancellazione
+            conn.executemany(
+                "INSERT INTO embeddings (key, dtype, vector, size, last_access)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET dtype = excluded.dtype, vector = excluded.vector,"
+                " size = excluded.size, last_access = excluded.last_access", rows
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Elimina le voci meno recenti finché la dimensione totale rientra nel limite"""
+        total = conn.execute("SELECT bytes FROM totals").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM embeddings ORDER BY last_access"):
+            to_delete.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", to_delete)
+
+    def clear(self) -> None:
+        """Svuota la cache e azzera i contatori"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM embeddings")
+            conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Contatori hit/miss, numero di voci e dimensione occupata"""
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT entries, bytes FROM totals"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+def embed_with_cache(texts: Sequence[str], embed: Callable[[List[str]], List[List[float]]],
+                     model: str, cache: Optional[EmbeddingCache]) -> List[List[float]]:
+    """
+    Embedding dei testi nello stesso ordine, calcolando con embed (lista di
+    testi -> lista di vettori) solo quelli assenti dalla cache. I chunk
+    ripetuti vengono calcolati una volta sola.
+    """
+    if cache is None:
+        return embed(list(texts))
+
+    keys = [embedding_key(model, text) for text in texts]
+    found = cache.get_many(keys)
+
+    missing: Dict[bytes, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+    if missing:
+        vectors = embed(list(missing.values()))
+        cache.put_many(list(zip(missing, vectors)))
+        for key, vector in zip(missing, vectors):
+            found[key] = np.asarray(vector, dtype=np.float32)
+
+    return [found[key].tolist() for key in keys]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings LangChain con cache: embed_documents passa al modello
+    sottostante solo i chunk mai visti. Le query non vengono salvate.
+    """
+
+    def __init__(self, embeddings, model: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return embed_with_cache(texts, self.embeddings.embed_documents, self.model, self.cache)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+@lru_cache(maxsize=4)
+def get_embedding_cache(path: str, max_bytes: int, dtype: str = "float32") -> EmbeddingCache:
+    """Istanza condivisa della cache per percorso (una per processo)"""
+    return EmbeddingCache(path, max_bytes, dtype)
@@ -0,0 +1,195 @@
+"""
+Dizionario globale delle entità confermate, cercate con un automa Aho-Corasick.
+
+Il file contiene nomi, IBAN e codici fiscali confermati: è cifrato con la
+chiave Fernet del vault.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from vault import Fernet, vault_key
+
+# Valori più corti non entrano nel dizionario (troppi falsi positivi)
+MIN_ENTITY_CHARS = 3
+
+PLACEHOLDER_RE = re.compile(r'^\[([A-Za-z]+)_G?\d+\]$')
+
+
+class AhoCorasick:
+    """Automa Aho-Corasick: trova tutte le chiavi in un solo passaggio lineare"""
+
+    def __init__(self, keys: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self.keys = keys
+
+        for index, key in enumerate(keys):
+            state = 0
+            for char in key:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(index)
+
+        # Collegamenti di fallimento in ampiezza; le uscite ereditano quelle del suffisso
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Restituisce (start, end, indice chiave) per ogni occorrenza"""
+        goto, fail, out, keys = self._goto, self._fail, self._out, self.keys
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                yield pos + 1 - len(keys[index]), pos + 1, index
+
+
+def _is_boundary(text: str, pos: int) -> bool:
+    """Vero se pos non è dentro una parola"""
+    return pos <= 0 or pos >= len(text) or not (text[pos - 1].isalnum() and text[pos].isalnum())
+
+
+class Gazetteer:
+    """
+    Entità confermate (valore -> etichetta e placeholder stabile), salvate su
+    JSON cifrato con la chiave Fernet key e compilate in un automa
+    Aho-Corasick alla prima ricerca dopo una modifica. Lo stesso valore
+    riceve lo stesso placeholder in ogni documento.
+    """
+
+    def __init__(self, path: Optional[str] = None, key: Optional[bytes] = None):
+        if path and key is None:
+            raise ValueError("Il dizionario su disco contiene dati personali: serve una chiave di cifratura")
+        if path and Fernet is None:
+            raise ImportError("Il dizionario su disco richiede il pacchetto 'cryptography' (pip install cryptography)")
+        self.path = path
+        self._fernet = Fernet(key) if path else None
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._automaton: Optional[AhoCorasick] = None
+        self._info: List[Tuple[str, str]] = []
+        self._version = ""
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                content = f.read()
+            # Le versioni precedenti salvavano il JSON in chiaro: viene riscritto cifrato
+            plaintext = content.lstrip().startswith(b"{")
+            data = json.loads(content if plaintext else self._fernet.decrypt(content))
+            self._entries = {value: tuple(entry) for value, entry in data["entries"].items()}
+            self._counter = data["counter"]
+            if plaintext:
+                self.save()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, value: str, label: str) -> Optional[str]:
+        """Aggiunge un valore; restituisce il suo placeholder (None se scartato)"""
+        value = value.strip()
+        if len(value) < MIN_ENTITY_CHARS:
+            return None
+        with self._lock:
+            if value not in self._entries:
+                self._counter += 1
+                self._entries[value] = (label, f"[{label}_G{self._counter}]")
+                self._automaton = None
+            return self._entries[value][1]
+
+    def add_confirmed(self, entities: Dict[str, str]) -> int:
+        """Aggiunge una mappa placeholder -> valore confermata; restituisce i nuovi valori"""
+        before = len(self._entries)
+        for placeholder, value in entities.items():
+            match = PLACEHOLDER_RE.match(placeholder)
+            if match and value:
+                self.add(value, match.group(1))
+        added = len(self._entries) - before
+        if added:
+            self.save()
+        return added
+
+    def save(self) -> None:
+        """Scrive il dizionario cifrato su disco (scrittura atomica, file 0600)"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {"counter": self._counter, "entries": {v: list(e) for v, e in self._entries.items()}}
+        token = self._fernet.encrypt(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(token)
+        os.replace(tmp_path, self.path)
+
+    def _compiled(self) -> Tuple[Optional[AhoCorasick], List[Tuple[str, str]]]:
+        with self._lock:
+            if self._automaton is None and self._entries:
+                values = sorted(self._entries)
+                self._automaton = AhoCorasick(values)
+                self._info = [self._entries[value] for value in values]
+                self._version = hashlib.sha256(
+                    json.dumps([[v, *self._entries[v]] for v in values], ensure_ascii=False).encode("utf-8")
+                ).hexdigest()[:16]
+            return self._automaton, self._info
+
+    @property
+    def version(self) -> str:
+        """Impronta del contenuto (per le chiavi di cache)"""
+        self._compiled()
+        return self._version
+
+    def find(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """
+        Occorrenze (start, end, etichetta, placeholder) a confine di parola,
+        senza sovrapposizioni: a parità di inizio vince la più lunga.
+        """
+        automaton, info = self._compiled()
+        if automaton is None:
+            return []
+
+        matches = sorted(
+            ((start, end, index) for start, end, index in automaton.iter(text)
+             if _is_boundary(text, start) and _is_boundary(text, end)),
+            key=lambda m: (m[0], -m[1])
+        )
+        found = []
+        last_end = 0
+        for start, end, index in matches:
+            if start < last_end:
+                continue
+            label, placeholder = info[index]
+            found.append((start, end, label, placeholder))
+            last_end = end
+        return found
+
+
+@lru_cache(maxsize=4)
+def get_gazetteer(path: str, key_path: str) -> Gazetteer:
+    """Dizionario condiviso tra le sessioni (uno per percorso), con la chiave del vault"""
+    return Gazetteer(path, vault_key(key_path))
@@ -13,8 +13,8 @@ from ui_components import (
 from utils import (
     init_session_state, process_uploaded_files, run_anonymization,
     run_ai_analysis, build_rag_knowledge_base, export_results_json,
-    get_confirmed_docs_count, reset_document_state, add_chat_message,
-    add_crewai_result, clear_crewai_history
+    get_confirmed_docs_count, reset_document_state, confirm_document, add_chat_message,
+    add_crewai_result, clear_crewai_history, reidentify
 )
 
 def main():
@@ -147,10 +147,8 @@ def anonymization_tab():
                 
                 with col_confirm:
                     if st.button(f"✅ Conferma {filename}", key=f"confirm_{filename}"):
-                        st.session_state.anonymized_docs[filename]['confirmed'] = True
-                        st.session_state.anonymized_docs[filename]['entities'] = updated_entities
+                        confirm_document(filename, updated_entities)
                         st.success(f"✅ {filename} confermato!")
-                        st.session_state.vector_store_built = False
                         st.rerun()
                 
                 with col_reset:
@@ -190,7 +188,8 @@ def analysis_tab():
                 'anonymized_text': result['anonymized_text'],
                 'analysis': result['analysis'],
                 'entities': result['entities'],
-                'entities_count': result['entities_count']
+                'entities_count': result['entities_count'],
+                'spans': [span._asdict() for span in result.get('spans', [])]
             }, f"analisi_{filename}")
             
             create_download_button(
@@ -215,10 +214,18 @@ def rag_tab():
     if build_rag_knowledge_base():
         st.info(f"Chatbot pronto per {len(confirmed_docs)} documenti")
         
-        # Mostra cronologia chat
+        # La cronologia resta anonimizzata: i valori reali solo a video
+        show_real = st.session_state.vault is not None and st.toggle(
+            "🔓 Mostra valori reali", key="rag_reidentify"
+        )
+        
+        # Mostra cronologia chat (le risposte con i valori dei propri documenti fonte)
         for message in st.session_state.chat_history:
+            content = message["content"]
+            if show_real:
+                content = reidentify(content, message.get("sources"))
             with st.chat_message(message["role"]):
-                st.markdown(message["content"])
+                st.markdown(content)
         
         # Input utente
         if prompt := st.chat_input("Fai una domanda sui documenti..."):
@@ -230,11 +237,11 @@ def rag_tab():
             # Genera risposta
             with st.chat_message("assistant"):
                 with st.spinner("Generando risposta..."):
-                    response = st.session_state.rag_chatbot.answer_question(prompt)
-                    st.markdown(response)
+                    response, sources = st.session_state.rag_chatbot.answer_with_sources(prompt)
+                    st.markdown(reidentify(response, sources) if show_real else response)
             
             # Aggiungi risposta
-            add_chat_message("assistant", response)
+            add_chat_message("assistant", response, sources)
     else:
         st.error("Impossibile costruire knowledge base. Verifica configurazione Azure.")
 
@@ -342,8 +349,15 @@ def crewai_tab():
     if st.session_state.crewai_history:
         st.subheader("📋 Risultati Analisi CrewAI")
         
-        for i, analysis in enumerate(reversed(st.session_state.crewai_history)):
-            display_crewai_result(analysis, len(st.session_state.crewai_history) - i)
+        show_real = st.session_state.vault is not None and st.toggle(
+            "🔓 Mostra valori reali", key="crewai_reidentify"
+        )
+        history = list(reversed(st.session_state.crewai_history))
+        results = reidentify([str(a["result"]) for a in history]) if show_real else None
+        
+        for i, analysis in enumerate(history):
+            shown = {**analysis, "result": results[i]} if show_real else analysis
+            display_crewai_result(shown, len(st.session_state.crewai_history) - i)
             
             # Download
             result_json = export_results_json(analysis, f"crewai_analysis_{i}")
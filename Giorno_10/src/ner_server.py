@@ -0,0 +1,165 @@
+"""
+Server di inferenza NER condiviso tra le sessioni Streamlit, con micro-batching.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import Callable, Dict, List, Optional, Union
+
+from config import Config
+from anonymizer import NERAnonimizer
+
+
+class NERInferenceServer:
+    """
+    Esegue un'unica pipeline NER per tutto il processo.
+
+    Le richieste di tutte le sessioni finiscono in una coda; un thread worker
+    le raccoglie per al più max_wait_ms (o finché ci sono max_batch testi),
+    esegue un solo batch ordinato per lunghezza e restituisce a ogni chiamante
+    i propri risultati. Si usa come la pipeline HuggingFace: server(testo)
+    oppure server([testi]); espone anche il tokenizer della pipeline.
+    """
+
+    def __init__(self, pipe: Callable, max_batch: int = 16, max_wait_ms: float = 10.0,
+                 timeout: Optional[float] = 120.0):
+        self.pipe = pipe
+        self.tokenizer = getattr(pipe, 'tokenizer', None)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self._worker = threading.Thread(target=self._run, name="ner-inference-server", daemon=True)
+        self._worker.start()
+
+    def __call__(self, inputs: Union[str, List[str]], **kwargs) -> Union[List[Dict], List[List[Dict]]]:
+        """Accoda i testi e attende i risultati (kwargs ignorati: il batch è del server)"""
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        if not texts:
+            return []
+
+        future: Future = Future()
+        with self._lock:
+            if self._error is not None:
+                raise self._error
+            self._queue.put((texts, future))
+        try:
+            results = future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Se il worker non l'ha ancora presa, la richiesta viene scartata
+            future.cancel()
+            raise TimeoutError(f"Nessuna risposta dal server NER entro {self.timeout}s")
+        return results[0] if single else results
+
+    @property
+    def alive(self) -> bool:
+        """Vero finché il worker accetta richieste"""
+        return self._error is None and self._worker.is_alive()
+
+    def _collect(self) -> List[tuple]:
+        """Attende una richiesta, poi raccoglie le altre arrivate entro la finestra"""
+        pending = [self._queue.get()]
+        count = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(request)
+            count += len(request[0])
+        return pending
+
+    def _run(self) -> None:
+        pending: List[tuple] = []
+        try:
+            while True:
+                pending = self._collect()
+                self._serve(pending)
+                pending = []
+        except BaseException as e:
+            # Il worker termina: nessuna richiesta deve restare in attesa
+            error = RuntimeError(f"Server NER terminato: {e!r}")
+            with self._lock:
+                self._error = error
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+
+    def _serve(self, pending: List[tuple]) -> None:
+        """Esegue un batch con le richieste raccolte e non ancora scadute"""
+        pending = [request for request in pending if request[1].set_running_or_notify_cancel()]
+        if not pending:
+            return
+        texts = [text for request_texts, _ in pending for text in request_texts]
+
+        # Ordinamento per lunghezza: padding minimo nei batch della pipeline
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        try:
+            outputs = self.pipe([texts[i] for i in order], batch_size=self.max_batch)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        results: List[Optional[List[Dict]]] = [None] * len(texts)
+        for i, output in zip(order, outputs):
+            results[i] = output
+
+        self.requests += len(pending)
+        self.batches += 1
+        self.texts += len(texts)
+
+        start = 0
+        for request_texts, future in pending:
+            future.set_result(results[start:start + len(request_texts)])
+            start += len(request_texts)
+
+    def stats(self) -> Dict[str, float]:
+        """Richieste servite, batch eseguiti e dimensione media dei batch"""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": self.texts / self.batches if self.batches else 0.0,
+        }
+
+
+_server: Optional[NERInferenceServer] = None
+_server_lock = threading.Lock()
+
+
+def get_ner_server(loader: Optional[Callable[[], Callable]] = None) -> NERInferenceServer:
+    """
+    Restituisce il server condiviso, caricando il modello alla prima chiamata.
+    Se il caricamento fallisce l'eccezione arriva al chiamante e il server
+    non viene creato, così il tentativo successivo riprova; un server il cui
+    worker si è fermato viene sostituito.
+    """
+    global _server
+    with _server_lock:
+        if _server is None or not _server.alive:
+            loader = loader or NERAnonimizer._load_ner_pipe
+            _server = NERInferenceServer(
+                loader(),
+                max_batch=Config.NER_BATCH_SIZE,
+                max_wait_ms=Config.NER_MICROBATCH_MS,
+                timeout=Config.NER_SERVER_TIMEOUT
+            )
+        return _server
@@ -0,0 +1,115 @@
+"""
+Backend ONNX Runtime (opzionalmente quantizzato int8) per il modello NER.
+"""
+
+import inspect
+import re
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModelForTokenClassification, AutoTokenizer
+from windowed_ner import WindowedNER
+
+try:
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+except ImportError:
+    ort = None
+
+
+def _model_dir(model_name: str, cache_dir: str) -> Path:
+    """Cartella di cache per un modello (nome HF reso sicuro per il filesystem)"""
+    return Path(cache_dir) / re.sub(r'[^\w.-]', '_', model_name)
+
+
+def export_onnx(model_name: str, cache_dir: str, quantize: bool = True) -> Path:
+    """
+    Esporta il token-classifier in ONNX una sola volta e, se richiesto,
+    applica la quantizzazione dinamica int8. Restituisce il path del modello.
+    """
+    if ort is None:
+        raise ImportError("Backend ONNX richiede i pacchetti 'onnx' e 'onnxruntime'")
+    
+    model_dir = _model_dir(model_name, cache_dir)
+    fp32_path = model_dir / "model.onnx"
+    int8_path = model_dir / "model.int8.onnx"
+    target = int8_path if quantize else fp32_path
+    if target.exists():
+        return target
+    
+    model_dir.mkdir(parents=True, exist_ok=True)
+    if not fp32_path.exists():
+        model = AutoModelForTokenClassification.from_pretrained(model_name)
+        model.eval()
+        dummy = torch.ones((1, 8), dtype=torch.long)
+        
+        # Le versioni recenti di torch usano di default l'exporter dynamo
+        export_kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs["dynamo"] = False
+        
+        dynamic_axes = {name: {0: "batch", 1: "sequence"}
+                        for name in ("input_ids", "attention_mask", "logits")}
+        torch.onnx.export(
+            model,
+            (dummy, torch.ones_like(dummy)),
+            str(fp32_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            **export_kwargs
+        )
+    
+    if quantize:
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    
+    return target
+
+
+class OnnxWindowedNER(WindowedNER):
+    """NER a finestre eseguito con ONNX Runtime su CPU"""
+    
+    def __init__(self, tokenizer, session, id2label: Dict[int, str], **kwargs):
+        super().__init__(tokenizer, model=None, id2label=id2label, **kwargs)
+        self.session = session
+    
+    @classmethod
+    def from_pretrained(cls, model_name: str, cache_dir: str = ".onnx_cache",
+                        quantize: bool = True, **kwargs) -> "OnnxWindowedNER":
+        """Esporta (se serve) e carica il modello in una sessione ONNX Runtime"""
+        model_path = export_onnx(model_name, cache_dir, quantize)
+        
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        id2label = AutoConfig.from_pretrained(model_name).id2label
+        session = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+        return cls(tokenizer, session, id2label, **kwargs)
+    
+    def _forward(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        return self.session.run(
+            ["logits"],
+            {"input_ids": input_ids, "attention_mask": attention_mask}
+        )[0]
+
+
+def entity_agreement(reference: List[List[Dict]], candidate: List[List[Dict]],
+                     threshold: float = 0.5) -> Dict[str, float]:
+    """
+    Accordo a livello di entità tra due backend: precision, recall e F1 del
+    candidato rispetto al riferimento, confrontando (start, end, gruppo).
+    """
+    def keys(results):
+        return {
+            (doc_index, ent['start'], ent['end'], ent['entity_group'])
+            for doc_index, entities in enumerate(results)
+            for ent in entities if ent['score'] > threshold
+        }
+    
+    ref, cand = keys(reference), keys(candidate)
+    common = len(ref & cand)
+    precision = common / len(cand) if cand else 1.0
+    recall = common / len(ref) if ref else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1,
+            "reference": len(ref), "candidate": len(cand)}
@@ -0,0 +1,271 @@
+"""
+Inventario dei dati personali in un archivio: solo rilevamento, nessun testo
+riscritto. Le occorrenze (documento, etichetta, offset, hash del valore)
+finiscono in un indice SQLite interrogabile senza rileggere l'archivio.
+
+Uso da riga di comando:
+    python src/pii_inventory.py scan cartella/ [--workers 4]
+    python src/pii_inventory.py find "IT60X0542811101000000123456"
+    python src/pii_inventory.py summary
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from anonymizer import NERAnonimizer, Span
+from config import Config, REGEX_PATTERNS
+from vault import Fernet, load_key
+
+# Documenti passati insieme a detect_batch da ogni worker
+BATCH_DOCS = 16
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_value(label: str, value: str) -> str:
+    """
+    Forma canonica del valore prima dell'hash: per i dati strutturati (IBAN,
+    CF, ...) senza spazi e in maiuscolo, per le entità NER con spazi compattati.
+    """
+    if label in REGEX_PATTERNS:
+        return _WHITESPACE_RE.sub("", value).upper()
+    return _WHITESPACE_RE.sub(" ", value).strip()
+
+
+def _digest(data: str, key: str) -> str:
+    if not key:
+        # Senza chiave l'hash di un IBAN o di un CF si inverte per forza bruta
+        raise ValueError("Serve una chiave HMAC per gli hash dei valori")
+    return hmac.new(key.encode("utf-8"), data.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def value_hash(label: str, value: str, key: str) -> str:
+    """HMAC-SHA256 del valore normalizzato"""
+    return _digest(normalize_value(label, value), key)
+
+
+def load_inventory_key(key_path: str) -> str:
+    """Chiave HMAC letta da key_path, generata (casuale, file 0600) al primo utilizzo"""
+    return load_key(key_path, lambda: secrets.token_hex(32).encode("ascii")).decode("ascii")
+
+
+class PIIInventory:
+    """
+    Indice SQLite delle occorrenze di dati personali.
+
+    Una riga per occorrenza in 'occurrences', indicizzata per hash, etichetta e
+    documento; 'documents' tiene dimensione e mtime dei file scansionati, così
+    una nuova scansione salta quelli non modificati. La chiave HMAC è
+    obbligatoria e l'indice ricorda la sua impronta: con una chiave diversa
+    gli hash non sarebbero confrontabili e l'indice non viene aperto.
+    """
+
+    def __init__(self, path: str, key: str):
+        if not key:
+            raise ValueError("Serve una chiave HMAC (PII_INVENTORY_KEY o PII_INVENTORY_KEY_PATH)")
+        self.path = path
+        self.key = key
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " doc TEXT PRIMARY KEY, size INTEGER, mtime REAL, scanned_at REAL);"
+            "CREATE TABLE IF NOT EXISTS occurrences ("
+            " doc TEXT NOT NULL, label TEXT NOT NULL, start INTEGER NOT NULL,"
+            " end INTEGER NOT NULL, value_hash TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS occurrences_hash ON occurrences (value_hash);"
+            "CREATE INDEX IF NOT EXISTS occurrences_label ON occurrences (label, doc);"
+            "CREATE INDEX IF NOT EXISTS occurrences_doc ON occurrences (doc);"
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        key_id = _digest("pii-inventory-key-id", key)
+        self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('key_id', ?)", (key_id,))
+        self._conn.commit()
+        stored = self._conn.execute("SELECT value FROM meta WHERE name = 'key_id'").fetchone()[0]
+        if stored != key_id:
+            self._conn.close()
+            raise ValueError(f"L'indice {path} è stato creato con un'altra chiave HMAC")
+
+    def is_current(self, doc: str, size: int, mtime: float) -> bool:
+        """Vero se il documento è già indicizzato con la stessa dimensione e mtime"""
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime FROM documents WHERE doc = ?", (doc,)).fetchone()
+        return row is not None and row[0] == size and row[1] == mtime
+
+    def record(self, doc: str, text: str, spans: List[Span], size: int = 0, mtime: float = 0.0) -> int:
+        """Sostituisce le occorrenze di un documento; restituisce quante sono"""
+        rows = [
+            (doc, span.label, span.start, span.end, value_hash(span.label, text[span.start:span.end], self.key))
+            for span in spans
+        ]
+        with self._lock:
+            self._conn.execute("DELETE FROM occurrences WHERE doc = ?", (doc,))
+            self._conn.executemany(
+                "INSERT INTO occurrences (doc, label, start, end, value_hash) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (doc, size, mtime, scanned_at) VALUES (?, ?, ?, ?)",
+                (doc, size, mtime, time.time())
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def documents_with_hash(self, hashed: str) -> List[Tuple[str, str, int]]:
+        """(documento, etichetta, occorrenze) dei documenti che contengono il valore"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT doc, label, COUNT(*) FROM occurrences WHERE value_hash = ?"
+                " GROUP BY doc, label ORDER BY doc", (hashed,)
+            ).fetchall()
+
+    def documents_with_value(self, value: str, label: Optional[str] = None) -> List[Tuple[str, str, int]]:
+        """Come documents_with_hash, calcolando l'hash del valore in chiaro"""
+        if label is not None:
+            return self.documents_with_hash(value_hash(label, value, self.key))
+        # Senza etichetta si provano entrambe le normalizzazioni
+        hashes = {
+            _digest(_WHITESPACE_RE.sub("", value).upper(), self.key),
+            _digest(_WHITESPACE_RE.sub(" ", value).strip(), self.key),
+        }
+        return sorted(row for hashed in hashes for row in self.documents_with_hash(hashed))
+
+    def documents_with_label(self, label: str) -> List[Tuple[str, int]]:
+        """(documento, occorrenze) dei documenti con almeno un'entità dell'etichetta"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT doc, COUNT(*) FROM occurrences WHERE label = ? GROUP BY doc ORDER BY doc", (label,)
+            ).fetchall()
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """Per etichetta: occorrenze, valori distinti e documenti coinvolti"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT label, COUNT(*), COUNT(DISTINCT value_hash), COUNT(DISTINCT doc)"
+                " FROM occurrences GROUP BY label ORDER BY label"
+            ).fetchall()
+        return {
+            label: {"occurrences": count, "distinct_values": distinct, "documents": docs}
+            for label, count, distinct, docs in rows
+        }
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def scan_files(anonymizer: NERAnonimizer, inventory: PIIInventory, paths: Iterable[str],
+               workers: int = 4, batch_docs: int = BATCH_DOCS,
+               on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """
+    Indicizza i file in parallelo: ogni worker legge un gruppo di documenti e
+    chiama detect_batch. Con il server NER condiviso le richieste dei worker
+    finiscono negli stessi batch del modello. I file non modificati dalla
+    scansione precedente vengono saltati.
+    """
+    # Il modello NER viene caricato una sola volta, prima dei worker
+    if anonymizer.ner_pipe is None:
+        raise RuntimeError("Modello NER non disponibile: scansione annullata")
+
+    pending = []
+    skipped = 0
+    for path in paths:
+        stat = os.stat(path)
+        if inventory.is_current(path, stat.st_size, stat.st_mtime):
+            skipped += 1
+        else:
+            pending.append((path, stat.st_size, stat.st_mtime))
+
+    groups = [pending[i:i + batch_docs] for i in range(0, len(pending), batch_docs)]
+    stats = {"documents": 0, "skipped": skipped, "occurrences": 0}
+    lock = threading.Lock()
+
+    def scan_group(group):
+        texts = [_read(path) for path, _, _ in group]
+        found = 0
+        for (path, size, mtime), text, spans in zip(group, texts, anonymizer.detect_batch(texts)):
+            found += inventory.record(path, text, spans, size, mtime)
+        with lock:
+            stats["documents"] += len(group)
+            stats["occurrences"] += found
+            if on_progress:
+                on_progress(stats["documents"], len(pending))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for _ in pool.map(scan_group, groups):
+            pass
+
+    return stats
+
+
+def iter_files(root: str, suffixes: Tuple[str, ...] = (".txt",)) -> Iterable[str]:
+    """Percorsi dei file di testo sotto root (ricorsivo)"""
+    for directory, _, files in os.walk(root):
+        for name in sorted(files):
+            if name.lower().endswith(suffixes):
+                yield os.path.join(directory, name)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inventario dei dati personali (solo rilevamento)")
+    parser.add_argument("--db", default=Config.PII_INVENTORY_PATH, help="Indice SQLite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="Indicizza i file di testo di una cartella")
+    scan.add_argument("root", help="Cartella dell'archivio")
+    scan.add_argument("--workers", type=int, default=4)
+    scan.add_argument("--suffix", action="append", help="Estensioni da includere (default .txt)")
+
+    find = commands.add_parser("find", help="Documenti che contengono un valore")
+    find.add_argument("value", help="Valore in chiaro (oppure hash con --hash)")
+    find.add_argument("--label", help="Etichetta del valore (es. IBAN, PER)")
+    find.add_argument("--hash", action="store_true", help="Il valore è già un hash")
+
+    commands.add_parser("summary", help="Conteggi per etichetta")
+    args = parser.parse_args(argv)
+
+    key = Config.PII_INVENTORY_KEY or load_inventory_key(Config.PII_INVENTORY_KEY_PATH)
+    inventory = PIIInventory(args.db, key)
+
+    if args.command == "scan":
+        from gazetteer import get_gazetteer
+        from ner_server import get_ner_server
+        anonymizer = NERAnonimizer(
+            ner_loader=get_ner_server if Config.NER_SHARED_SERVER else None,
+            gazetteer=(
+                get_gazetteer(Config.GAZETTEER_PATH, Config.VAULT_KEY_PATH)
+                if Config.GAZETTEER and Fernet is not None else None
+            ),
+        )
+        suffixes = tuple(args.suffix) if args.suffix else (".txt",)
+        start = time.perf_counter()
+        stats = scan_files(anonymizer, inventory, iter_files(args.root, suffixes), args.workers)
+        print(f"{stats['documents']} documenti indicizzati ({stats['skipped']} invariati), "
+              f"{stats['occurrences']} occorrenze in {time.perf_counter() - start:.1f} s")
+    elif args.command == "find":
+        rows = (inventory.documents_with_hash(args.value) if args.hash
+                else inventory.documents_with_value(args.value, args.label))
+        for doc, label, count in rows:
+            print(f"{doc}\t{label}\t{count}")
+    else:
+        for label, counts in inventory.summary().items():
+            print(f"{label}\t{counts['occurrences']} occorrenze\t{counts['distinct_values']} valori\t"
+                  f"{counts['documents']} documenti")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
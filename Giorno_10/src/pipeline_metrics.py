@@ -0,0 +1,193 @@
+"""
+Tempi e contatori per fase della pipeline di anonimizzazione.
+
+Ogni fase (dizionario, regex, tokenizzazione, NER, merge degli span,
+riscrittura, caricamento del modello) accumula chiamate e secondi; i
+documenti accumulano caratteri ed entità. Ogni misura passa anche al sink
+configurato (log, file CSV o endpoint Prometheus in formato testo).
+"""
+
+import csv
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+from config import Config
+
+logger = logging.getLogger("anonymizer.metrics")
+
+# Fasi nell'ordine in cui compaiono nella sidebar
+STAGES = ("model_load", "cache", "gazetteer", "regex", "tokenize", "ner", "merge", "render")
+
+
+class MetricsSink:
+    """Destinazione delle misure: una chiamata per fase o documento misurato"""
+
+    def emit(self, name: str, seconds: float, count: int) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class LoggingSink(MetricsSink):
+    """Una riga di log (livello DEBUG) per misura"""
+
+    def emit(self, name: str, seconds: float, count: int) -> None:
+        logger.debug("%s %.3f ms (%d)", name, seconds * 1000, count)
+
+
+class CSVSink(MetricsSink):
+    """Righe timestamp,nome,secondi,conteggio in coda a un file CSV"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._lock = threading.Lock()
+        if new_file:
+            self._writer.writerow(["timestamp", "name", "seconds", "count"])
+
+    def emit(self, name: str, seconds: float, count: int) -> None:
+        with self._lock:
+            self._writer.writerow([f"{time.time():.3f}", name, f"{seconds:.6f}", count])
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class PipelineMetrics:
+    """Accumulatori thread-safe per fase e per documento"""
+
+    def __init__(self, sink: Optional[MetricsSink] = None):
+        self.sink = sink or MetricsSink()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            # fase -> [chiamate, elementi, secondi totali, secondi massimi]
+            self._stages: Dict[str, List[float]] = {}
+            self.documents = 0
+            self.chars = 0
+            self.entities = 0
+
+    def record(self, stage: str, seconds: float, items: int = 1) -> None:
+        """Aggiunge una misura alla fase (items: documenti o segmenti trattati)"""
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += items
+            entry[2] += seconds
+            entry[3] = max(entry[3], seconds)
+        self.sink.emit(stage, seconds, items)
+
+    @contextmanager
+    def timer(self, stage: str, items: int = 1) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, items)
+
+    def observe_document(self, chars: int, entities: int) -> None:
+        """Caratteri ed entità di un documento anonimizzato"""
+        with self._lock:
+            self.documents += 1
+            self.chars += chars
+            self.entities += entities
+        self.sink.emit("document", 0.0, entities)
+
+    def snapshot(self) -> Dict:
+        """Copia dei contatori: fasi (chiamate, elementi, totale, media, massimo) e documenti"""
+        with self._lock:
+            stages = {
+                stage: {
+                    "calls": int(calls),
+                    "items": int(items),
+                    "total_s": total,
+                    "mean_ms": total / calls * 1000 if calls else 0.0,
+                    "max_ms": peak * 1000,
+                }
+                for stage, (calls, items, total, peak) in self._stages.items()
+            }
+            documents = {"documents": self.documents, "chars": self.chars, "entities": self.entities}
+        ordered = {stage: stages.pop(stage) for stage in STAGES if stage in stages}
+        ordered.update(stages)
+        return {"stages": ordered, **documents}
+
+
+def prometheus_text(metrics: PipelineMetrics) -> str:
+    """Contatori nel formato di esposizione testuale di Prometheus"""
+    snapshot = metrics.snapshot()
+    lines = []
+    for metric, key, fmt in (("seconds", "total_s", "{:.6f}"), ("calls", "calls", "{}"), ("items", "items", "{}")):
+        lines.append(f"# TYPE anonymizer_stage_{metric}_total counter")
+        for stage, values in snapshot["stages"].items():
+            lines.append(f'anonymizer_stage_{metric}_total{{stage="{stage}"}} ' + fmt.format(values[key]))
+    for name in ("documents", "chars", "entities"):
+        lines.append(f"# TYPE anonymizer_{name}_total counter")
+        lines.append(f"anonymizer_{name}_total {snapshot[name]}")
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusSink(MetricsSink):
+    """
+    Espone /metrics su HTTP (thread in background). Le singole misure non
+    servono: Prometheus legge i totali accumulati.
+    """
+
+    def __init__(self, port: int, host: str = "0.0.0.0"):
+        self.metrics: Optional[PipelineMetrics] = None
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics" or sink.metrics is None:
+                    self.send_error(404)
+                    return
+                body = prometheus_text(sink.metrics).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def create_sink(kind: str) -> MetricsSink:
+    """Sink da Config.METRICS_SINK: "none", "log", "csv" o "prometheus" """
+    if kind == "log":
+        return LoggingSink()
+    if kind == "csv":
+        return CSVSink(Config.METRICS_CSV_PATH)
+    if kind == "prometheus":
+        return PrometheusSink(Config.METRICS_PORT)
+    return MetricsSink()
+
+
+@lru_cache(maxsize=None)
+def get_metrics() -> PipelineMetrics:
+    """Contatori condivisi dal processo (il server Prometheus parte una volta sola)"""
+    sink = create_sink(Config.METRICS_SINK)
+    metrics = PipelineMetrics(sink)
+    if isinstance(sink, PrometheusSink):
+        sink.metrics = metrics
+    return metrics
@@ -0,0 +1,64 @@
+"""
+Scanner regex multi-pattern compilato una sola volta.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, Tuple
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+class RegexScanner:
+    """Trova tutte le etichette regex in un solo passaggio sul testo"""
+    
+    def __init__(self, patterns: Dict[str, str], engine: str = "auto"):
+        self.labels = list(patterns)
+        self.engine = self._select_engine(engine)
+        
+        # Se tutti i pattern iniziano con \b lo si porta fuori dall'alternanza,
+        # così le posizioni senza confine di parola vengono scartate subito
+        prefix = ""
+        if patterns and all(pattern.startswith(r"\b") for pattern in patterns.values()):
+            prefix = r"\b"
+            patterns = {label: pattern[2:] for label, pattern in patterns.items()}
+        
+        # Un gruppo nominato per etichetta: a parità di posizione vince
+        # il pattern che compare prima nel dizionario
+        alternatives = "|".join(f"(?P<{label}>{pattern})" for label, pattern in patterns.items())
+        source = f"{prefix}(?:{alternatives})"
+        
+        # Come i pattern originali: CF, IBAN ed email anche in minuscolo
+        if self.engine == "re2":
+            self._compiled = re2.compile(f"(?i){source}")
+        else:
+            self._compiled = re.compile(source, flags=re.IGNORECASE)
+    
+    @staticmethod
+    def _select_engine(engine: str) -> str:
+        """Sceglie il motore regex (re2 solo se installato)"""
+        if engine == "re2" and re2 is None:
+            raise ValueError("Motore 're2' richiesto ma il pacchetto google-re2 non è installato")
+        if engine == "auto":
+            return "re2" if re2 is not None else "re"
+        if engine not in ("re", "re2"):
+            raise ValueError(f"Motore regex non supportato: {engine}")
+        return engine
+    
+    def scan(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Restituisce (start, end, label) per ogni match, in ordine di testo"""
+        for match in self._compiled.finditer(text):
+            yield match.start(), match.end(), match.lastgroup
+
+
+@lru_cache(maxsize=8)
+def _cached_scanner(items: Tuple[Tuple[str, str], ...], engine: str) -> RegexScanner:
+    return RegexScanner(dict(items), engine)
+
+
+def get_scanner(patterns: Dict[str, str], engine: str = "auto") -> RegexScanner:
+    """Scanner condiviso per un insieme di pattern (compilato una volta)"""
+    return _cached_scanner(tuple(patterns.items()), engine)
@@ -0,0 +1,137 @@
+"""
+Memoizzazione NER a livello di frase: firme, disclaimer e citazioni ripetute
+nelle mail passano dal modello una sola volta.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from cascade_ner import split_sentences
+
+
+def sentence_key(sentence: str) -> bytes:
+    """Chiave della frase (hash del testo, senza spazi ai bordi)"""
+    return hashlib.blake2b(sentence.encode("utf-8"), digest_size=16).digest()
+
+
+class SentenceMemo:
+    """
+    Cache LRU limitata: hash della frase -> entità con offset relativi alla
+    frase. Contatori di hit e miss per il tasso di riuso.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[Dict, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Optional[Tuple[Dict, ...]]:
+        with self._lock:
+            entities = self._entries.get(key)
+            if entities is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entities
+
+    def count_hit(self) -> None:
+        """Frase ripetuta nello stesso batch: risolta senza modello"""
+        with self._lock:
+            self.hits += 1
+
+    def put(self, key: bytes, entities: List[Dict]) -> None:
+        with self._lock:
+            self._entries[key] = tuple(entities)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Hit, miss, tasso di hit e voci in memoria"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+class MemoizedNER:
+    """
+    Wrapper con la stessa interfaccia della pipeline NER.
+
+    Divide ogni testo in frasi, cerca ciascuna nella memo e passa al modello,
+    in un unico batch, solo le frasi mai viste (ognuna una volta sola anche se
+    ripetuta nel batch). Le entità in cache vengono spostate sugli offset della
+    nuova occorrenza.
+    """
+
+    def __init__(self, pipe: Callable, memo: SentenceMemo):
+        self.pipe = pipe
+        self.memo = memo
+        self.tokenizer = getattr(pipe, 'tokenizer', None)
+
+    def __call__(self, inputs: Union[str, List[str]], batch_size: Optional[int] = None,
+                 **kwargs) -> Union[List[Dict], List[List[Dict]]]:
+        if isinstance(inputs, str):
+            return self._predict([inputs], batch_size)[0]
+        return self._predict(list(inputs), batch_size)
+
+    def _predict(self, texts: List[str], batch_size: Optional[int]) -> List[List[Dict]]:
+        # (indice documento, inizio frase, chiave) per ogni frase
+        sentences = []
+        missing: Dict[bytes, str] = {}
+        found: Dict[bytes, Tuple[Dict, ...]] = {}
+        for doc_index, text in enumerate(texts):
+            for start, end in split_sentences(text):
+                sentence = text[start:end]
+                stripped = sentence.strip()
+                start += len(sentence) - len(sentence.lstrip())
+                key = sentence_key(stripped)
+                sentences.append((doc_index, start, key))
+                if key in found or key in missing:
+                    self.memo.count_hit()
+                    continue
+                cached = self.memo.get(key)
+                if cached is None:
+                    missing[key] = stripped
+                else:
+                    found[key] = cached
+
+        if missing:
+            keys = list(missing)
+            batch = [missing[key] for key in keys]
+            outputs = self.pipe(batch, batch_size=batch_size) if batch_size else self.pipe(batch)
+            for key, entities in zip(keys, outputs):
+                self.memo.put(key, entities)
+                found[key] = tuple(entities)
+
+        results: List[List[Dict]] = [[] for _ in texts]
+        for doc_index, start, key in sentences:
+            for ent in found[key]:
+                results[doc_index].append({**ent, 'start': ent['start'] + start, 'end': ent['end'] + start})
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        return self.memo.stats()
+
+
+@lru_cache(maxsize=4)
+def get_sentence_memo(max_entries: int) -> SentenceMemo:
+    """Memo condivisa tra le sessioni del processo"""
+    return SentenceMemo(max_entries)
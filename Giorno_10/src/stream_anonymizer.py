@@ -0,0 +1,157 @@
+"""
+Anonimizzazione in streaming di file di testo molto grandi a memoria costante.
+
+Uso da riga di comando:
+    python src/stream_anonymizer.py input.txt output.txt [--entities entita.jsonl]
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from anonymizer import NERAnonimizer, Span, render_spans, resolve_spans, spans_to_entities
+
+# Dimensione dei blocchi elaborati e margine letto oltre il taglio (caratteri)
+BLOCK_CHARS = 64 * 1024
+OVERLAP_CHARS = 2 * 1024
+READ_CHARS = 64 * 1024
+
+
+def find_cut(text: str, limit: int) -> int:
+    """
+    Posizione di taglio entro limit caratteri: dopo l'ultima riga vuota,
+    altrimenti dopo l'ultimo a capo o spazio, altrimenti limit.
+    """
+    for sep in ("\n\n", "\n", " "):
+        cut = text.rfind(sep, 1, limit)
+        if cut != -1:
+            return cut + len(sep)
+    return limit
+
+
+def anonymize_stream(anonymizer: NERAnonimizer, source: TextIO,
+                     block_chars: int = BLOCK_CHARS,
+                     overlap_chars: int = OVERLAP_CHARS) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Legge source a blocchi allineati ai paragrafi e restituisce, blocco per
+    blocco, il testo mascherato e le nuove entità trovate.
+
+    Ogni blocco viene analizzato insieme ai successivi overlap_chars caratteri:
+    se un'entità attraversa il taglio, il taglio viene spostato alla sua fine,
+    così nessuna entità viene spezzata. In memoria restano al più
+    block_chars + overlap_chars + READ_CHARS caratteri.
+    """
+    if overlap_chars <= 0 or block_chars <= 0:
+        raise ValueError("block_chars e overlap_chars devono essere positivi")
+
+    window_chars = block_chars + overlap_chars
+    buffer = ""
+    eof = False
+    counter = 0
+
+    while True:
+        while not eof and len(buffer) < window_chars:
+            data = source.read(READ_CHARS)
+            if not data:
+                eof = True
+            buffer += data
+        if not buffer:
+            return
+
+        window = buffer[:window_chars]
+        if eof and len(buffer) <= window_chars:
+            cut = len(buffer)
+        else:
+            cut = find_cut(window, block_chars)
+
+        # Placeholder numerati in modo continuo su tutto il file, nell'ordine
+        # degli span (quelli stabili delle entità note restano invariati)
+        spans: List[Span] = []
+        if window.strip():
+            # NER a segmenti: la finestra supera il contesto del modello
+            spans = resolve_spans(anonymizer.find_candidates_batch([window])[0], window, counter)
+
+        for span in spans:
+            if span.start < cut < span.end:
+                cut = span.end
+
+        # Gli span sono ordinati: si emettono quelli che finiscono entro il taglio
+        emitted = [span for span in spans if span.end <= cut]
+        counter += len(emitted)
+
+        block = buffer[:cut]
+        yield render_spans(block, emitted), spans_to_entities(block, emitted)
+        buffer = buffer[cut:]
+
+
+def anonymize_to(anonymizer: NERAnonimizer, source: TextIO, target: TextIO,
+                 entities_target: Optional[TextIO] = None,
+                 block_chars: int = BLOCK_CHARS,
+                 overlap_chars: int = OVERLAP_CHARS) -> int:
+    """
+    Scrive su target (file, socket, stdout) ogni blocco appena mascherato e,
+    se indicato, su entities_target una riga JSON con le entità del blocco
+    (placeholder -> valore originale): la mappa non viene mai tenuta in memoria.
+    Restituisce il numero di entità trovate.
+    """
+    count = 0
+    for masked, block_entities in anonymize_stream(anonymizer, source, block_chars, overlap_chars):
+        target.write(masked)
+        target.flush()
+        if entities_target is not None and block_entities:
+            entities_target.write(json.dumps(block_entities, ensure_ascii=False) + "\n")
+            entities_target.flush()
+        count += len(block_entities)
+    return count
+
+
+def anonymize_file(anonymizer: NERAnonimizer, input_path: str, output_path: str,
+                   entities_path: Optional[str] = None,
+                   block_chars: int = BLOCK_CHARS,
+                   overlap_chars: int = OVERLAP_CHARS) -> int:
+    """Anonimizza input_path in output_path a memoria costante"""
+    with open(input_path, "r", encoding="utf-8", newline="") as source, \
+            open(output_path, "w", encoding="utf-8", newline="") as target, \
+            open(entities_path or os.devnull, "w", encoding="utf-8") as entities_target:
+        return anonymize_to(anonymizer, source, target, entities_target, block_chars, overlap_chars)
+
+
+def read_entities(path: str) -> Iterator[Tuple[str, str]]:
+    """Legge riga per riga la mappa delle entità scritta da anonymize_to"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield from json.loads(line).items()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Anonimizzazione in streaming di file di testo")
+    parser.add_argument("input", help="File di testo da anonimizzare ('-' per stdin)")
+    parser.add_argument("output", help="File di output ('-' per stdout)")
+    parser.add_argument("--entities", help="File JSONL in cui scrivere, blocco per blocco, la mappa delle entità")
+    parser.add_argument("--block-chars", type=int, default=BLOCK_CHARS)
+    parser.add_argument("--overlap-chars", type=int, default=OVERLAP_CHARS)
+    args = parser.parse_args(argv)
+
+    anonymizer = NERAnonimizer()
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    entities_target = open(args.entities, "w", encoding="utf-8") if args.entities else None
+
+    try:
+        anonymize_to(anonymizer, source, target, entities_target, args.block_chars, args.overlap_chars)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+        if entities_target is not None:
+            entities_target.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Anonimizzazione di tabelle (CSV/Excel) colonna per colonna.
+
+Ogni colonna viene profilata su un campione: le colonne strutturate (IBAN,
+email, CF, ...) sono sostituite con operazioni vettoriali di pandas sui
+valori distinti, le colonne senza lettere passano solo dalle regex e quelle
+di testo libero da regex e NER, una sola volta per valore distinto. Lo
+stesso valore riceve lo stesso placeholder in tutta la tabella.
+
+Uso da riga di comando:
+    python src/tabular_anonymizer.py clienti.csv clienti_anonimi.csv [--entities mappa.json]
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from anonymizer import NERAnonimizer, render_spans, resolve_spans
+
+# Frazione minima di valori del campione che deve combaciare con un pattern
+# perché la colonna sia considerata strutturata
+STRUCTURED_THRESHOLD = 0.8
+PROFILE_SAMPLE = 500
+
+# Colonne senza lettere (importi, date, telefoni): solo regex, senza NER
+NON_TEXT_RE = r'[\d\s.,:;/%€$+\-()]*'
+
+TEXT_COLUMN = "text"
+REGEX_COLUMN = "regex"
+SKIP_COLUMN = "skip"
+
+
+def profile_columns(df: pd.DataFrame, patterns: Dict[str, str],
+                    sample_size: int = PROFILE_SAMPLE,
+                    threshold: float = STRUCTURED_THRESHOLD) -> Dict[str, str]:
+    """
+    Tipo di ogni colonna: etichetta del pattern se strutturata, "text" per il
+    testo libero (analizzato con NER), "regex" per le colonne senza lettere
+    (cercate solo con le regex), "skip" per le colonne vuote.
+    """
+    profile = {}
+    for column in df.columns:
+        values = df[column].dropna().astype(str).str.strip()
+        values = values[values != ""]
+        if values.empty:
+            profile[column] = SKIP_COLUMN
+            continue
+        sample = values.drop_duplicates().head(sample_size)
+
+        best_label, best_fraction = None, 0.0
+        for label, pattern in patterns.items():
+            fraction = sample.str.fullmatch(pattern).mean()
+            if fraction > best_fraction:
+                best_label, best_fraction = label, fraction
+
+        if best_fraction >= threshold:
+            profile[column] = best_label
+        elif sample.str.fullmatch(NON_TEXT_RE).mean() >= threshold:
+            profile[column] = REGEX_COLUMN
+        else:
+            profile[column] = TEXT_COLUMN
+    return profile
+
+
+class PlaceholderRegistry:
+    """Placeholder globali della tabella: stesso (etichetta, valore), stesso placeholder"""
+
+    def __init__(self):
+        self._by_value: Dict[Tuple[str, str], str] = {}
+        self._counters: Dict[str, int] = {}
+        self.entities: Dict[str, str] = {}
+
+    def get(self, label: str, value: str) -> str:
+        placeholder = self._by_value.get((label, value))
+        if placeholder is None:
+            index = self._counters.get(label, 0)
+            self._counters[label] = index + 1
+            placeholder = f"[{label}_{index}]"
+            self._by_value[(label, value)] = placeholder
+            self.entities[placeholder] = value
+        return placeholder
+
+
+def _structured_column(series: pd.Series, label: str, pattern: str,
+                       registry: PlaceholderRegistry) -> Tuple[pd.Series, pd.Series]:
+    """
+    Sostituisce in blocco i valori che combaciano per intero con il pattern.
+    Restituisce la colonna aggiornata e la maschera dei valori rimasti da
+    analizzare come testo.
+    """
+    present = series.notna()
+    stripped = series.where(present, "").astype(str).str.strip()
+    full = present & stripped.str.fullmatch(pattern).fillna(False).astype(bool)
+
+    codes, uniques = pd.factorize(stripped[full])
+    placeholders = pd.Series([registry.get(label, value) for value in uniques], dtype=object)
+    result = series.astype(object).copy()
+    if len(codes):
+        result[full] = placeholders.take(codes).to_numpy()
+    return result, present & ~full & (stripped != "")
+
+
+def _distinct_values(df: pd.DataFrame, cells: Dict[str, pd.Series]) -> List[str]:
+    """Valori distinti (come stringhe) delle celle selezionate di tutte le colonne"""
+    return list(dict.fromkeys(
+        str(value) for column, mask in cells.items() for value in df[column][mask].unique()
+    ))
+
+
+def _render(registry: PlaceholderRegistry, texts: List[str], all_spans) -> Dict[str, str]:
+    """Testo -> testo con gli span sostituiti dai placeholder globali"""
+    return {
+        text: render_spans(text, [
+            span._replace(placeholder=registry.get(span.label, text[span.start:span.end]))
+            for span in spans
+        ])
+        for text, spans in zip(texts, all_spans)
+    }
+
+
+def _replace_cells(result: pd.DataFrame, df: pd.DataFrame, cells: Dict[str, pd.Series],
+                   replacements: Dict[str, str]) -> None:
+    for column, mask in cells.items():
+        if mask.any():
+            result.loc[mask, column] = df.loc[mask, column].astype(str).map(replacements)
+
+
+def anonymize_dataframe(anonymizer: NERAnonimizer, df: pd.DataFrame,
+                        profile: Optional[Dict[str, str]] = None,
+                        batch_size: Optional[int] = None) -> Tuple[pd.DataFrame, Dict[str, str], Dict[str, str]]:
+    """
+    Anonimizza una tabella. Restituisce (tabella anonimizzata, mappa entità,
+    profilo delle colonne). Le celle di testo vengono deduplicate su tutta la
+    tabella: ogni valore distinto passa da regex e NER una sola volta.
+    """
+    profile = profile or profile_columns(df, anonymizer.regex_patterns)
+    registry = PlaceholderRegistry()
+    result = df.copy()
+
+    # Colonne strutturate: sostituzione vettoriale; il resto va al testo libero
+    text_cells: Dict[str, pd.Series] = {}
+    regex_cells: Dict[str, pd.Series] = {}
+    for column, kind in profile.items():
+        if kind == SKIP_COLUMN:
+            continue
+        if kind in (TEXT_COLUMN, REGEX_COLUMN):
+            series = df[column]
+            cells = text_cells if kind == TEXT_COLUMN else regex_cells
+            cells[column] = series.notna() & (series.astype(str).str.strip() != "")
+            result[column] = series.astype(object)
+        else:
+            pattern = anonymizer.regex_patterns[kind]
+            result[column], text_cells[column] = _structured_column(df[column], kind, pattern, registry)
+
+    # Testo libero: valori distinti di tutte le colonne, un solo batch NER
+    uniques = _distinct_values(df, text_cells)
+    replacements = _render(registry, uniques, anonymizer.detect_batch(uniques, batch_size))
+    _replace_cells(result, df, text_cells, replacements)
+
+    # Colonne senza lettere: solo le regex, una volta per valore distinto
+    uniques = _distinct_values(df, regex_cells)
+    replacements = _render(registry, uniques, [
+        resolve_spans(anonymizer.find_regex_spans(text), text) for text in uniques
+    ])
+    _replace_cells(result, df, regex_cells, replacements)
+
+    return result, registry.entities, profile
+
+
+def read_table(path: str) -> pd.DataFrame:
+    """Legge CSV o Excel con tutte le colonne come stringhe"""
+    if path.lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(path, dtype=str)
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+
+
+def write_table(df: pd.DataFrame, path: str) -> None:
+    if path.lower().endswith((".xlsx", ".xls")):
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Anonimizzazione di file CSV/Excel per colonna")
+    parser.add_argument("input", help="File CSV o Excel da anonimizzare")
+    parser.add_argument("output", help="File di output (CSV o Excel)")
+    parser.add_argument("--entities", help="File JSON in cui salvare la mappa delle entità")
+    args = parser.parse_args(argv)
+
+    df = read_table(args.input)
+    anonymized, entities, profile = anonymize_dataframe(NERAnonimizer(), df)
+    write_table(anonymized, args.output)
+
+    for column, kind in profile.items():
+        print(f"{column}: {kind}", file=sys.stderr)
+
+    if args.entities:
+        with open(args.entities, "w", encoding="utf-8") as f:
+            json.dump(entities, f, ensure_ascii=False, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
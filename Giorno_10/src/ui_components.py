@@ -6,6 +6,8 @@ import streamlit as st
 import pandas as pd
 from typing import Dict
 from config import Config
+from anonymizer import NERAnonimizer, render_spans
+from sentence_memo import get_sentence_memo
 
 def setup_page_config():
     """Configura la pagina Streamlit"""
@@ -49,6 +51,24 @@ AZURE_API_KEY_EMB=your_embedding_api_key
             st.metric("Anonimizzati", anonymized_count)
             st.metric("Confermati", confirmed_count)
             
+            anonymizer = st.session_state.get('anonymizer')
+            if anonymizer is not None and anonymizer.cache is not None:
+                cache_stats = anonymizer.cache.stats()
+                st.caption(
+                    f"Cache anonimizzazione: {cache_stats['hits']} hit, "
+                    f"{cache_stats['misses']} miss ({cache_stats['entries']} voci)"
+                )
+            
+            if Config.NER_SENTENCE_MEMO:
+                memo_stats = get_sentence_memo(Config.NER_SENTENCE_MEMO_SIZE).stats()
+                st.caption(
+                    f"Memo NER per frase: {memo_stats['hit_rate']:.0%} hit "
+                    f"({memo_stats['hits']} su {memo_stats['hits'] + memo_stats['misses']} frasi)"
+                )
+            
+            if anonymizer is not None and anonymizer.metrics.documents:
+                display_pipeline_metrics(anonymizer.metrics.snapshot())
+            
             if confirmed_count > 0:
                 if st.session_state.get('vector_store_built', False):
                     st.success("✅ Knowledge Base pronto")
@@ -63,6 +83,21 @@ AZURE_API_KEY_EMB=your_embedding_api_key
                 del st.session_state[key]
             st.rerun()
 
+def display_pipeline_metrics(snapshot: Dict):
+    """Tempi per fase della pipeline di anonimizzazione"""
+    with st.expander("⏱️ Tempi pipeline"):
+        st.caption(
+            f"{snapshot['documents']} documenti, {snapshot['chars']:,} caratteri, "
+            f"{snapshot['entities']} entità"
+        )
+        rows = [
+            {"Fase": stage, "Chiamate": values["calls"], "Totale (s)": round(values["total_s"], 3),
+             "Media (ms)": round(values["mean_ms"], 1), "Max (ms)": round(values["max_ms"], 1)}
+            for stage, values in snapshot["stages"].items()
+        ]
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
 def display_entity_editor(entities: Dict, doc_key: str):
     """Editor per entità rilevate"""
     if not entities:
@@ -98,15 +133,17 @@ def display_entity_editor(entities: Dict, doc_key: str):
     if deleted_placeholders:
         final_entities = {k: v for k, v in updated_entities_dict.items() 
                          if k not in deleted_placeholders}
-        st.session_state.anonymized_docs[doc_key]['entities'] = final_entities
+        doc = st.session_state.anonymized_docs[doc_key]
+        doc['entities'] = final_entities
         
-        # Re-anonimizza testo
-        from anonymizer import NERAnonimizer
-        anonymizer = NERAnonimizer()
-        st.session_state.anonymized_docs[doc_key]['anonymized'], _ = anonymizer.anonymize(
-            st.session_state.anonymized_docs[doc_key]['original']
-        )
-        st.session_state.vector_store_built = False
+        # Riscrive il testo dagli span salvati, senza rieseguire regex e NER
+        if 'spans' in doc:
+            doc['spans'] = [span for span in doc['spans'] 
+                            if span.placeholder not in deleted_placeholders]
+            doc['anonymized'] = render_spans(doc['original'], doc['spans'])
+        else:
+            anonymizer = NERAnonimizer()
+            doc['anonymized'], _ = anonymizer.anonymize(doc['original'])
         st.rerun()
     
     return updated_entities_dict
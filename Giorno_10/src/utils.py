@@ -7,12 +7,33 @@ import json
 import pandas as pd
 from datetime import datetime
 from anonymizer import NERAnonimizer
+from anonymization_cache import get_cache
+from ner_server import get_ner_server
+from gazetteer import get_gazetteer
+from vault import Fernet, get_vault
+from config import Config
 from ai_processor import AzureProcessor, RAGChatbot, CrewAIManager
 
 def init_session_state():
     """Inizializza stato sessione"""
     if 'anonymizer' not in st.session_state:
-        st.session_state.anonymizer = NERAnonimizer()
+        cache = None
+        # La mappa entità in cache è cifrata con la chiave del vault
+        if Config.ANONYMIZATION_CACHE and Fernet is not None:
+            cache = get_cache(
+                Config.ANONYMIZATION_CACHE_PATH, Config.VAULT_KEY_PATH,
+                Config.ANONYMIZATION_CACHE_MB * 1024 * 1024
+            )
+        # Con il server condiviso tutte le sessioni usano lo stesso modello
+        ner_loader = get_ner_server if Config.NER_SHARED_SERVER else None
+        # Il dizionario contiene i valori confermati: cifrato con la chiave del vault
+        gazetteer = (
+            get_gazetteer(Config.GAZETTEER_PATH, Config.VAULT_KEY_PATH)
+            if Config.GAZETTEER and Fernet is not None else None
+        )
+        st.session_state.anonymizer = NERAnonimizer(
+            cache=cache, ner_loader=ner_loader, gazetteer=gazetteer
+        )
     
     if 'processor' not in st.session_state:
         st.session_state.processor = AzureProcessor()
@@ -40,6 +61,13 @@ def init_session_state():
     
     if 'vector_store_built' not in st.session_state:
         st.session_state.vector_store_built = False
+    
+    if 'vault' not in st.session_state:
+        # Senza cryptography la re-identificazione non è disponibile
+        st.session_state.vault = (
+            get_vault(Config.VAULT_PATH, Config.VAULT_KEY_PATH)
+            if Config.VAULT and Fernet is not None else None
+        )
 
 def validate_file_upload(uploaded_file) -> bool:
     """Valida file caricato"""
@@ -78,7 +106,6 @@ def process_uploaded_files(uploaded_files):
         # Reset stato quando si caricano nuovi file
         st.session_state.anonymized_docs = {}
         st.session_state.processed_docs = {}
-        st.session_state.vector_store_built = False
         st.session_state.chat_history = []
         st.session_state.crewai_history = []
         return True
@@ -93,23 +120,28 @@ def run_anonymization():
     
     progress_bar = st.progress(0)
     total_files = len(st.session_state.uploaded_files)
+    filenames = list(st.session_state.uploaded_files)
     
-    for i, (filename, file_data) in enumerate(st.session_state.uploaded_files.items()):
-        progress_bar.progress((i + 1) / total_files, f"Processando {filename}...")
-        
-        # Anonimizza
-        anonymized_text, entities = st.session_state.anonymizer.anonymize(file_data['content'])
-        
+    # Anonimizza tutti i file insieme, con NER a batch
+    results = st.session_state.anonymizer.anonymize_batch(
+        [st.session_state.uploaded_files[name]['content'] for name in filenames],
+        on_progress=lambda fraction: progress_bar.progress(
+            fraction, f"Processando {total_files} file..."
+        )
+    )
+    
+    for filename, (anonymized_text, entities, spans) in zip(filenames, results):
+        file_data = st.session_state.uploaded_files[filename]
         st.session_state.anonymized_docs[filename] = {
             'original': file_data['content'],
             'anonymized': anonymized_text,
             'entities': entities,
+            'spans': spans,
             'confirmed': False
         }
     
     progress_bar.empty()
     st.success("✅ Anonimizzazione completata!")
-    st.session_state.vector_store_built = False
 
 def run_ai_analysis():
     """Esegue analisi AI sui documenti confermati"""
@@ -132,7 +164,8 @@ def run_ai_analysis():
             'anonymized_text': doc_data['anonymized'],
             'entities_count': len(doc_data['entities']),
             'analysis': analysis,
-            'entities': doc_data['entities']
+            'entities': doc_data['entities'],
+            'spans': doc_data.get('spans', [])
         }
     
     progress_bar.empty()
@@ -143,16 +176,18 @@ def build_rag_knowledge_base():
     confirmed_docs = {k: v for k, v in st.session_state.anonymized_docs.items() 
                      if v.get('confirmed', False)}
     
+    rag_chatbot = st.session_state.rag_chatbot
     if not confirmed_docs:
+        # Rimuove dal vector store i documenti non più confermati
+        if rag_chatbot.vector_store is not None:
+            rag_chatbot.build_vector_store({})
+        st.session_state.vector_store_built = False
         st.warning("Nessun documento confermato per RAG")
         return False
     
-    if not st.session_state.vector_store_built:
-        with st.spinner("Costruendo knowledge base..."):
-            st.session_state.rag_chatbot.build_vector_store(confirmed_docs)
-            st.session_state.vector_store_built = True
-            return True
-    
+    # Aggiornamento incrementale: senza modifiche non ricalcola nulla
+    rag_chatbot.build_vector_store(confirmed_docs)
+    st.session_state.vector_store_built = rag_chatbot.vector_store is not None
     return True
 
 def export_results_json(results: dict, filename_prefix: str) -> str:
@@ -179,22 +214,58 @@ def reset_document_state(filename: str):
     """Reset stato documento specifico"""
     if filename in st.session_state.uploaded_files:
         original_data = st.session_state.uploaded_files[filename]
-        anonymized_text, entities = st.session_state.anonymizer.anonymize(original_data['content'])
+        anonymized_text, entities, spans = st.session_state.anonymizer.anonymize_with_spans(
+            original_data['content']
+        )
         
         st.session_state.anonymized_docs[filename] = {
             'original': original_data['content'],
             'anonymized': anonymized_text,
             'entities': entities,
+            'spans': spans,
             'confirmed': False
         }
-        st.session_state.vector_store_built = False
 
-def add_chat_message(role: str, content: str):
-    """Aggiunge messaggio alla chat history"""
-    st.session_state.chat_history.append({
+def confirm_document(filename: str, entities: dict):
+    """Conferma un documento e aggiunge le sue entità al dizionario globale"""
+    doc = st.session_state.anonymized_docs[filename]
+    doc['confirmed'] = True
+    doc['entities'] = entities
+    
+    gazetteer = st.session_state.anonymizer.gazetteer
+    if gazetteer is not None:
+        gazetteer.add_confirmed(entities)
+    
+    vault = st.session_state.get('vault')
+    if vault is not None:
+        vault.store(filename, entities)
+
+def reidentify(texts, doc_ids=None):
+    """
+    Sostituisce i placeholder con i valori reali usando il vault. I placeholder
+    sono numerati per documento: doc_ids indica i documenti da cui proviene il
+    testo (es. le fonti di una risposta RAG), altrimenti si usano tutti i
+    documenti confermati della sessione e i placeholder ambigui restano
+    invariati. Accetta un testo o una lista di testi.
+    """
+    vault = st.session_state.get('vault')
+    if vault is None:
+        return texts
+    if doc_ids is None:
+        doc_ids = [name for name, doc in st.session_state.anonymized_docs.items() if doc.get('confirmed')]
+    if isinstance(texts, str):
+        return vault.reidentify(texts, doc_ids)
+    return vault.reidentify_batch(list(texts), doc_ids)
+
+def add_chat_message(role: str, content: str, sources=None):
+    """Aggiunge messaggio alla chat history, con i documenti fonte se noti"""
+    message = {
         "role": role,
         "content": content
-    })
+    }
+    if sources is not None:
+        message["sources"] = list(sources)
+    st.session_state.chat_history.append(message)
 
 def add_crewai_result(query: str, analysis_type: str, result: str, agents_used=None):
     """Aggiunge risultato CrewAI alla history"""
@@ -0,0 +1,158 @@
+"""
+Vault cifrato delle mappe placeholder -> valore originale e re-identificazione
+delle risposte dei modelli.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+    InvalidToken = ValueError
+
+# Qualsiasi placeholder generato dall'anonimizzatore: [PER_0], [IBAN_3], [ORG_G12]
+PLACEHOLDER_RE = re.compile(r'\[[A-Za-z]+_G?\d+\]')
+
+# Parametri massimi per query SQLite (limite di default 999 nelle versioni vecchie)
+_SQL_CHUNK = 900
+
+
+def load_key(key_path: str, generate: Optional[Callable[[], bytes]] = None) -> bytes:
+    """
+    Legge la chiave da file, generandola al primo utilizzo (chiave Fernet se
+    generate non è indicato). Il file viene creato leggibile solo dal
+    proprietario (0600).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(key_path)), exist_ok=True)
+    try:
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(key_path, 'rb') as kf:
+            return kf.read().strip()
+    key = (generate or Fernet.generate_key)()
+    with os.fdopen(fd, 'wb') as kf:
+        kf.write(key)
+    return key
+
+
+def vault_key(key_path: str) -> bytes:
+    """Chiave Fernet del vault: da VAULT_KEY oppure letta (o generata) in key_path"""
+    key = os.getenv("VAULT_KEY")
+    return key.encode() if key else load_key(key_path)
+
+
+class EntityVault:
+    """
+    Archivio su disco (SQLite) delle mappe entità, con valori cifrati Fernet.
+
+    Le righe sono indicizzate per (documento, placeholder): la
+    re-identificazione legge solo i placeholder presenti nel testo, quindi il
+    vault può contenere milioni di mappature senza caricarle in memoria.
+    """
+
+    def __init__(self, path: str, key: bytes):
+        if Fernet is None:
+            raise ImportError("Il vault richiede il pacchetto 'cryptography' (pip install cryptography)")
+        self.path = path
+        self._fernet = Fernet(key)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS mappings ("
+            " doc_id TEXT NOT NULL,"
+            " placeholder TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " PRIMARY KEY (doc_id, placeholder)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS mappings_placeholder ON mappings (placeholder)")
+        self._conn.commit()
+
+    def store(self, doc_id: str, entities: Dict[str, str]) -> None:
+        """Salva (o sostituisce) la mappa entità di un documento"""
+        rows = [
+            (doc_id, placeholder, self._fernet.encrypt(value.encode("utf-8")))
+            for placeholder, value in entities.items()
+        ]
+        with self._lock:
+            self._conn.execute("DELETE FROM mappings WHERE doc_id = ?", (doc_id,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO mappings (doc_id, placeholder, value) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def lookup(self, placeholders: Iterable[str],
+               doc_ids: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """
+        Valori originali dei placeholder indicati, cercati solo nei documenti
+        doc_ids se indicati. I placeholder sono numerati per documento: se uno
+        corrisponde a valori diversi in più documenti è ambiguo e non viene
+        restituito.
+        """
+        wanted = list(set(placeholders))
+        docs = list(dict.fromkeys(doc_ids)) if doc_ids is not None else None
+        if not wanted or docs == []:
+            return {}
+
+        # Metà dei parametri ai placeholder e metà ai documenti
+        step = _SQL_CHUNK // 2 if docs is not None else _SQL_CHUNK
+        doc_chunks = [docs[i:i + step] for i in range(0, len(docs), step)] if docs is not None else [None]
+        found: Dict[str, List[bytes]] = {}
+        with self._lock:
+            for i in range(0, len(wanted), step):
+                chunk = wanted[i:i + step]
+                marks = ",".join("?" * len(chunk))
+                for doc_chunk in doc_chunks:
+                    query = f"SELECT placeholder, value FROM mappings WHERE placeholder IN ({marks})"
+                    params = chunk
+                    if doc_chunk is not None:
+                        query += f" AND doc_id IN ({','.join('?' * len(doc_chunk))})"
+                        params = chunk + doc_chunk
+                    for placeholder, value in self._conn.execute(query, params):
+                        found.setdefault(placeholder, []).append(value)
+
+        values = {}
+        for placeholder, encrypted in found.items():
+            decrypted = {self._fernet.decrypt(value).decode("utf-8") for value in encrypted}
+            if len(decrypted) == 1:
+                values[placeholder] = decrypted.pop()
+        return values
+
+    def reidentify_batch(self, texts: List[str],
+                         doc_ids: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Sostituisce i placeholder in più testi: un passaggio regex per trovarli,
+        una sola lettura dal vault per tutti, un passaggio per sostituirli.
+        I placeholder sconosciuti o ambigui restano invariati.
+        """
+        found = {placeholder for text in texts for placeholder in PLACEHOLDER_RE.findall(text)}
+        values = self.lookup(found, doc_ids)
+        if not values:
+            return list(texts)
+
+        def replace(match):
+            return values.get(match.group(), match.group())
+
+        return [PLACEHOLDER_RE.sub(replace, text) for text in texts]
+
+    def reidentify(self, text: str, doc_ids: Optional[Iterable[str]] = None) -> str:
+        """Sostituisce i placeholder di un testo con i valori originali"""
+        return self.reidentify_batch([text], doc_ids)[0]
+
+    def count(self) -> int:
+        """Numero di mappature salvate"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM mappings").fetchone()[0]
+
+
+@lru_cache(maxsize=4)
+def get_vault(path: str, key_path: str) -> EntityVault:
+    """Vault condiviso tra le sessioni; la chiave viene da VAULT_KEY o da key_path"""
+    return EntityVault(path, vault_key(key_path))
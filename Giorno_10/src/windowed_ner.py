@@ -0,0 +1,150 @@
+"""
+NER a finestre scorrevoli per documenti più lunghi del contesto del modello.
+"""
+
+from typing import Dict, List, Optional, Union
+import numpy as np
+import torch
+from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+
+class WindowedNER:
+    """
+    NER con la stessa interfaccia della pipeline HuggingFace ("simple").
+
+    Il testo viene tokenizzato una sola volta con offset mapping e diviso in
+    finestre di max_length token che si sovrappongono di stride token. Tutte
+    le finestre (anche di più testi) passano nel modello a batch; le
+    probabilità dei token in sovrapposizione vengono mediate e le entità
+    ricostruite come span di caratteri sul testo originale.
+    """
+    
+    def __init__(self, tokenizer, model=None, stride: int = 128,
+                 max_length: Optional[int] = None, batch_size: int = 16,
+                 id2label: Optional[Dict[int, str]] = None):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.batch_size = batch_size
+        self.id2label = id2label or model.config.id2label
+        
+        # Ogni finestra è racchiusa tra [CLS] e [SEP]
+        max_length = max_length or min(tokenizer.model_max_length, 512)
+        self.window = max_length - 2
+        if not 0 <= stride < self.window:
+            raise ValueError(f"Stride deve essere tra 0 e {self.window - 1}")
+        self.stride = stride
+        
+        if self.model is not None:
+            self.model.eval()
+    
+    @classmethod
+    def from_pretrained(cls, model_name: str, **kwargs) -> "WindowedNER":
+        """Carica tokenizer e modello da HuggingFace"""
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForTokenClassification.from_pretrained(model_name)
+        return cls(tokenizer, model, **kwargs)
+    
+    def _forward(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Logit del modello per un batch di finestre (batch, seq, label)"""
+        with torch.no_grad():
+            output = self.model(
+                input_ids=torch.from_numpy(input_ids),
+                attention_mask=torch.from_numpy(attention_mask)
+            )
+        return output.logits.cpu().numpy()
+    
+    def _windows(self, n_tokens: int) -> List[int]:
+        """Posizioni di inizio delle finestre sui token del testo"""
+        step = self.window - self.stride
+        starts = list(range(0, max(n_tokens - self.stride, 1), step))
+        return starts
+    
+    def _build_window(self, ids: List[int]) -> List[int]:
+        """Aggiunge i token speciali alla finestra"""
+        return [self.tokenizer.cls_token_id] + ids + [self.tokenizer.sep_token_id]
+    
+    def __call__(self, inputs: Union[str, List[str]], batch_size: Optional[int] = None,
+                 **kwargs) -> Union[List[Dict], List[List[Dict]]]:
+        if isinstance(inputs, str):
+            return self._predict([inputs], batch_size)[0]
+        return self._predict(list(inputs), batch_size)
+    
+    def _predict(self, texts: List[str], batch_size: Optional[int]) -> List[List[Dict]]:
+        batch_size = batch_size or self.batch_size
+        encodings = [
+            self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+            for text in texts
+        ]
+        
+        # Finestre di tutti i testi: (indice testo, inizio finestra, input_ids)
+        windows = []
+        for text_index, encoding in enumerate(encodings):
+            ids = encoding['input_ids']
+            if not ids:
+                continue
+            for start in self._windows(len(ids)):
+                windows.append((text_index, start, self._build_window(ids[start:start + self.window])))
+        
+        n_labels = len(self.id2label)
+        prob_sums = [np.zeros((len(enc['input_ids']), n_labels), dtype=np.float32) for enc in encodings]
+        counts = [np.zeros(len(enc['input_ids']), dtype=np.float32) for enc in encodings]
+        
+        pad_id = self.tokenizer.pad_token_id or 0
+        for batch_start in range(0, len(windows), batch_size):
+            batch = windows[batch_start:batch_start + batch_size]
+            seq_len = max(len(full) for _, _, full in batch)
+            input_ids = np.full((len(batch), seq_len), pad_id, dtype=np.int64)
+            attention_mask = np.zeros((len(batch), seq_len), dtype=np.int64)
+            for row, (_, _, full) in enumerate(batch):
+                input_ids[row, :len(full)] = full
+                attention_mask[row, :len(full)] = 1
+            
+            logits = self._forward(input_ids, attention_mask)
+            probs = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            probs /= probs.sum(axis=-1, keepdims=True)
+            
+            for row, (text_index, start, full) in enumerate(batch):
+                n_tokens = len(full) - 2
+                prob_sums[text_index][start:start + n_tokens] += probs[row, 1:1 + n_tokens]
+                counts[text_index][start:start + n_tokens] += 1
+        
+        results = []
+        for text, encoding, prob_sum, count in zip(texts, encodings, prob_sums, counts):
+            if not len(count):
+                results.append([])
+                continue
+            token_probs = prob_sum / np.maximum(count, 1)[:, None]
+            results.append(self._aggregate(text, encoding, token_probs))
+        return results
+    
+    def _aggregate(self, text: str, encoding, token_probs: np.ndarray) -> List[Dict]:
+        """Raggruppa i token in entità (equivalente a aggregation_strategy='simple')"""
+        label_ids = token_probs.argmax(axis=-1)
+        scores = token_probs.max(axis=-1)
+        offsets = encoding['offset_mapping']
+        word_ids = encoding.word_ids()
+        
+        entities = []
+        current = None
+        for i, label_id in enumerate(label_ids):
+            tag = self.id2label[int(label_id)]
+            if tag == 'O':
+                current = None
+                continue
+            prefix, _, group = tag.partition('-')
+            if not group:
+                prefix, group = 'I', tag
+            
+            same_word = i > 0 and word_ids[i] is not None and word_ids[i] == word_ids[i - 1]
+            if current and current['entity_group'] == group and (prefix == 'I' or same_word):
+                current['end'] = offsets[i][1]
+                current['scores'].append(float(scores[i]))
+            else:
+                current = {'entity_group': group, 'start': offsets[i][0],
+                           'end': offsets[i][1], 'scores': [float(scores[i])]}
+                entities.append(current)
+        
+        for entity in entities:
+            entity['score'] = float(np.mean(entity.pop('scores')))
+            entity['word'] = text[entity['start']:entity['end']]
+        return entities
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Version of the masking logic: bump it whenever entity extraction or span
+# resolution changes, so results cached by older code are no longer returned
+LOGIC_VERSION = 4
+
+def make_key(text, model_name, patterns):
+    """
+    Build a content-addressed cache key.
+
+    Args:
+        text (str): The original text
+        model_name (str): Name of the NER model used
+        patterns (dict): Regex patterns used, by label
+
+    Returns:
+        str: SHA-256 hex digest of logic version, model, patterns and text
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([LOGIC_VERSION, model_name, sorted(patterns.items())]).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+class AnonymizationCache:
+    """
+    On-disk (SQLite) cache of anonymized texts with size-based LRU eviction.
+
+    Safe to use from several threads and from forked worker processes:
+    each process opens its own connection.
+    """
+
+    def __init__(self, path, max_bytes=100 * 1024 * 1024):
+        """
+        Args:
+            path (str): Path of the SQLite database file
+            max_bytes (int): Maximum total size of the cached texts
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _connect(self):
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)")
+            # Running totals kept by triggers, so put() never sums the whole table
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS totals ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO totals (id, entries, bytes) "
+                "SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN "
+                "UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN "
+                "UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN "
+                "UPDATE totals SET bytes = bytes + NEW.size - OLD.size; END"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        """
+        Look up an anonymized text.
+
+        Args:
+            key (str): Key built with make_key
+
+        Returns:
+            str: The cached anonymized text, or None on a miss
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        """
+        Store an anonymized text, evicting the least recently used entries if needed.
+
+        Args:
+            key (str): Key built with make_key
+            value (str): The anonymized text
+        """
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            # Upsert rather than INSERT OR REPLACE, which does not fire the delete trigger
+            conn.execute(
+                "INSERT INTO cache (key, value, size, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+                "size = excluded.size, last_used = excluded.last_used",
+                (key, value, size, time.time())
+            )
+            total = conn.execute("SELECT bytes FROM totals").fetchone()[0]
+            if total > self.max_bytes:
+                stale = []
+                for old_key, old_size in conn.execute("SELECT key, size FROM cache ORDER BY last_used"):
+                    stale.append((old_key,))
+                    total -= old_size
+                    if total <= self.max_bytes:
+                        break
+                conn.executemany("DELETE FROM cache WHERE key = ?", stale)
+                logger.info(f"Anonymization cache: evicted {len(stale)} entries")
+            conn.commit()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit and miss counters, number of entries and total size in bytes
+        """
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT entries, bytes FROM totals"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
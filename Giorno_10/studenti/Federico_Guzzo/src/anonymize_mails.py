@@ -1,12 +1,21 @@
 import os
 import re
-from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
+from transformers import AutoTokenizer, AutoModelForTokenClassification, PreTrainedTokenizerFast, pipeline
+import numpy as np
+import torch
 from dotenv import load_dotenv
 import openai
 import shutil
 import logging
 from pathlib import Path
 import time
+import gc
+import multiprocessing
+import heapq
+from collections import defaultdict
+from anonymization_cache import AnonymizationCache, make_key
+from mailbox_watcher import MailboxWatcher, file_sha256
+from ner_offsets import DEFAULT_STRIDE, align_entities, ner_entities as _ner_entities
 
 import os
 import certifi
@@ -22,8 +31,10 @@ os.environ['CURL_CA_BUNDLE'] = certifi.where()
 
 from transformers import pipeline
 
+NER_MODEL_NAME = "Davlan/bert-base-multilingual-cased-ner-hrl"
+
 ner_pipeline = pipeline("ner", 
-                   model="Davlan/bert-base-multilingual-cased-ner-hrl",
+                   model=NER_MODEL_NAME,
                    aggregation_strategy="simple"
                    )
 # Path to your local model folder
@@ -38,6 +49,27 @@ ner_pipeline = pipeline("ner",
  
 # Load environment variables
 load_dotenv()
+
+# Files read and sent to NER together by each worker
+FILES_PER_NER_BATCH = int(os.getenv("FILES_PER_NER_BATCH", "8"))
+
+# Regex patterns used by anonymize_text (also part of the cache key)
+REGEX_PATTERNS = {
+    "IBAN": r'\b[A-Z]{2}\d{2}[A-Z0-9]{1,30}\b',
+    "IBAN_SPACED": r'\b[A-Z]{2}\d{2}(?:\s?[A-Z0-9]{1,4}){1,7}\b',
+    "FISCALCODE": r'\b([A-Z]{6}\d{2}[A-Z]\d{2}[A-Z]\d{3}[A-Z])\b',
+    "CELLNUMBER": r'\b(?:\+39[\s\.]?)?3[\d\s\.]{8,12}\b',
+    "LANDLINE": r'\b0\d{1,3}([\s\.]?\d{2,4}){1,3}\b',
+    "EMAIL": r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+',
+}
+
+# Persistent cache of anonymized texts (set ANONYMIZATION_CACHE=false to disable)
+anonymization_cache = None
+if os.getenv("ANONYMIZATION_CACHE", "true").lower() == "true":
+    anonymization_cache = AnonymizationCache(
+        os.getenv("ANONYMIZATION_CACHE_PATH", os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'anonymization.sqlite')),
+        max_bytes=int(os.getenv("ANONYMIZATION_CACHE_MB", "100")) * 1024 * 1024
+    )
  
 # Chat completion model credentials
 azure_chat_api_key = os.getenv("AZURE_OPENAI_API_KEY")
@@ -71,6 +103,20 @@ Documento:
 '''
 """
 
+def ner_entities(texts, batch_size=8):
+    """
+    Run NER on a batch of texts with exact character offsets (see ner_offsets).
+    
+    Args:
+        texts (list): Texts to analyze
+        batch_size (int): Windows per forward pass
+        
+    Returns:
+        list: For each text, entities as dicts (entity_group, score, word, start, end)
+    """
+    return _ner_entities(ner_pipeline, texts, batch_size=batch_size,
+                         stride=int(os.getenv("NER_WINDOW_STRIDE", DEFAULT_STRIDE)))
+
 def anonymize_text(text):
     """
     Anonymize sensitive information in a single text.
@@ -81,30 +127,51 @@ def anonymize_text(text):
     Returns:
         str: Anonymized text
     """
-    iban_pattern = r'\b[A-Z]{2}\d{2}[A-Z0-9]{1,30}\b'
-    iban_pattern1 = r'\b[A-Z]{2}\d{2}(?:\s?[A-Z0-9]{1,4}){1,7}\b'
-    fiscal_code_pattern = r'\b([A-Z]{6}\d{2}[A-Z]\d{2}[A-Z]\d{3}[A-Z])\b'
-    cell_number_pattern = r'\b(?:\+39[\s\.]?)?3[\d\s\.]{8,12}\b' 
-    landline_pattern = r'\b0\d{1,3}([\s\.]?\d{2,4}){1,3}\b' # Italian cell number pattern
-    email_pattern = r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+'
+    return anonymize_texts([text])[0]
+
+def anonymize_texts(texts):
+    """
+    Anonymize a batch of texts, running NER once on all of them.
     
-    # Get NER results with simple aggregation strategy
-    model_entities = ner_pipeline(text)
+    Results are looked up in the persistent cache first, keyed on the text
+    content, the NER model and the regex patterns; only the misses go to NER.
     
-    # Manually find start and end positions for model results
-    for entity in model_entities:
-        if 'start' not in entity or entity['start'] is None:
-            # Find the entity word in the original text
-            entity_text = entity['word']
-            # Remove leading ▁ if present (XLM-RoBERTa tokenizer specific)
-            clean_text = entity_text.replace('▁', ' ').strip()
-            # Find position in original text
-            position = text.find(clean_text)
-            if position != -1:
-                entity['start'] = position
-                entity['end'] = position + len(clean_text)
-                # Update word to match the text in the document
-                entity['word'] = clean_text
+    Args:
+        texts (list): The texts to anonymize
+        
+    Returns:
+        list: Anonymized texts, in the same order
+    """
+    if anonymization_cache is None:
+        return _anonymize_texts(texts)
+    
+    keys = [make_key(text, NER_MODEL_NAME, REGEX_PATTERNS) for text in texts]
+    results = [anonymization_cache.get(key) for key in keys]
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        for i, anonymized_text in zip(misses, _anonymize_texts([texts[i] for i in misses])):
+            anonymization_cache.put(keys[i], anonymized_text)
+            results[i] = anonymized_text
+    return results
+
+def _anonymize_texts(texts):
+    """Run regex and NER anonymization on a batch of texts, without the cache."""
+    # Get NER results with exact character offsets, one batch for all texts
+    all_entities = ner_entities(list(texts))
+    return [_mask_text(text, model_entities) for text, model_entities in zip(texts, all_entities)]
+
+def _anonymize_text(text):
+    """Run regex and NER anonymization on a text, without the cache."""
+    return _anonymize_texts([text])[0]
+
+def _mask_text(text, model_entities):
+    """Mask the regex matches and the NER entities found in a text."""
+    iban_pattern = REGEX_PATTERNS["IBAN"]
+    iban_pattern1 = REGEX_PATTERNS["IBAN_SPACED"]
+    fiscal_code_pattern = REGEX_PATTERNS["FISCALCODE"]
+    cell_number_pattern = REGEX_PATTERNS["CELLNUMBER"]
+    landline_pattern = REGEX_PATTERNS["LANDLINE"]
+    email_pattern = REGEX_PATTERNS["EMAIL"]
     
     # Convert model entities to the same format as regex matches
     results = []
@@ -191,27 +258,9 @@ def anonymize_text(text):
             "end": match.end()
         })
     
-    # Insert regex matches at the beginning
-    results = iban_matches + iban_matches1 + fiscal_code_matches + cell_number_matches + phone_number_matches + email_matches + results
-    
-    # Reconstruct entities
-    entities = []
-    current = None
-    for ent in results:
-        if ent["entity"].startswith("B-"):
-            if current:
-                entities.append(current)
-            current = {
-                "entity": ent["entity"][2:],
-                "tokens": [ent["word"]],
-                "start": ent["start"],
-                "end": ent["end"]
-            }
-        elif ent["entity"].startswith("I-") and current:
-            current["tokens"].append(ent["word"])
-            current["end"] = ent["end"]
-    if current:
-        entities.append(current)
+    # Regex matches take precedence over NER where they overlap
+    regex_matches = iban_matches + iban_matches1 + fiscal_code_matches + cell_number_matches + phone_number_matches + email_matches
+    entities = resolve_spans([regex_matches, results], text)
     
     # Map for anonymization
     label_map = {
@@ -224,15 +273,24 @@ def anonymize_text(text):
         "CELLNUMBER": "Cellulare",
     }
     
+    # Build the output in a single pass over the sorted, non-overlapping entities
     entity_counters = {}
-    replacements = []
+    pieces = []
+    cursor = 0
     for ent in entities:
         label = ent["entity"]
         mapped = label_map.get(label, label)
         entity_counters[mapped] = entity_counters.get(mapped, 0) + 1
  
+        # Whitespace caught at the edges of a match stays in the output
+        start, end = ent["start"], ent["end"]
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        
         # Custom anonymization for IBAN and FISCALCODE
-        entity_text = " ".join(ent["tokens"]).strip()
+        entity_text = text[start:end]
         if label == "IBAN":
             # Mask all but first 4 chars
             masked = entity_text[:4] + "*" * (len(entity_text) - 4)
@@ -246,31 +304,116 @@ def anonymize_text(text):
             placeholder = f"[{masked}]"
         else:
             placeholder = f"[{mapped}_{entity_counters[mapped]}]"
- 
-        replacements.append((entity_text, placeholder, ent))
+        
+        pieces.append(text[cursor:start])
+        pieces.append(placeholder)
+        cursor = end
+    
+    pieces.append(text[cursor:])
+    return "".join(pieces)
+
+def _span_rank(span):
+    """Sort key for overlapping spans: earlier group, then longer, then higher score."""
+    return (span["priority"], span["start"] - span["end"], -span["score"])
+
+def _merge_same_label(spans):
+    """Merge overlapping spans that share a label into one span covering both."""
+    merged = []
+    open_by_label = {}
+    for span in sorted(spans, key=lambda span: (span["start"], -span["end"])):
+        last = open_by_label.get(span["entity"])
+        if last is not None and span["start"] < last["end"]:
+            last["end"] = max(last["end"], span["end"])
+            last["score"] = max(last["score"], span["score"])
+            last["priority"] = min(last["priority"], span["priority"])
+        else:
+            open_by_label[span["entity"]] = span
+            merged.append(span)
+    return merged
+
+def _owned_pieces(spans):
+    """
+    Pieces of each span (strongest first) that no stronger span covers.
     
-    # Sort replacements by start position in reverse order (to avoid position shifts)
-    replacements.sort(key=lambda x: x[2]["start"], reverse=True)
+    Sweeps the span boundaries left to right with a heap of the open spans,
+    so every stretch of text goes to the strongest span covering it in
+    O(n log n) overall.
+    """
+    pieces = [[] for _ in spans]
+    by_start = sorted(range(len(spans)), key=lambda rank: spans[rank]["start"])
+    bounds = sorted({pos for span in spans for pos in (span["start"], span["end"])})
+    heap = []
+    i = 0
+    for left, right in zip(bounds, bounds[1:]):
+        while i < len(by_start) and spans[by_start[i]]["start"] <= left:
+            heapq.heappush(heap, (by_start[i], spans[by_start[i]]["end"]))
+            i += 1
+        while heap and heap[0][1] <= left:
+            heapq.heappop(heap)
+        if heap:
+            owned = pieces[heap[0][0]]
+            if owned and owned[-1][1] == left:
+                owned[-1] = (owned[-1][0], right)
+            else:
+                owned.append((left, right))
+    return pieces
+
+def _trimmed(span, pieces, text):
+    """Entities for the given pieces of span, trimmed when they are only part of it."""
+    result = []
+    for start, end in pieces:
+        if text is not None and (start, end) != (span["start"], span["end"]):
+            # Spaces and punctuation left between the winner and the rest stay in the text
+            while start < end and not text[start].isalnum():
+                start += 1
+            while end > start and not text[end - 1].isalnum():
+                end -= 1
+        if start < end:
+            result.append(dict(span, start=start, end=end))
+    return result
+
+def resolve_spans(groups, text=None):
+    """
+    Resolve overlapping matches into non-overlapping entities.
     
-    # Replace entities in text
-    anonymized_chars = list(text)
-    for entity_text, placeholder, entity in replacements:
-        start = entity["start"]
-        end = entity["end"]
-        # Replace the characters at the specified positions
-        anonymized_chars[start:end] = placeholder
+    Overlapping matches with the same label are first merged into one span
+    covering both. The remaining spans are accepted from the strongest to the
+    weakest: the earlier group wins, then the longer span, then the higher
+    score. A span that overlaps a stronger one keeps the parts it alone
+    covers, so the text of a partly overlapped match is still masked.
     
-    anonymized_text = ''.join(anonymized_chars)
+    Args:
+        groups (list): Lists of NER-like dicts ("B-LABEL" entity, score, start, end),
+            highest priority first
+        text (str): The text the matches refer to; when given, the leftover
+            pieces of overlapped spans are trimmed of spaces and punctuation
+        
+    Returns:
+        list: Non-overlapping entities (entity, score, start, end, priority), sorted by start
+    """
+    spans = _merge_same_label(
+        {"entity": match["entity"][2:], "score": match["score"],
+         "start": match["start"], "end": match["end"], "priority": priority}
+        for priority, matches in enumerate(groups)
+        for match in matches if match["end"] > match["start"]
+    )
     
-    return anonymized_text
+    spans.sort(key=_span_rank)
+    accepted = [
+        piece
+        for span, pieces in zip(spans, _owned_pieces(spans))
+        for piece in _trimmed(span, pieces, text)
+    ]
+    return sorted(accepted, key=lambda span: span["start"])
  
-def anonymize_documents(input_dir, output_dir):
+def anonymize_documents(input_dir, output_dir, workers=1):
     """
     Anonymize all documents in the input directory and save them to output directory.
     
     Args:
         input_dir (str): Path to the directory with documents to anonymize
         output_dir (str): Path to the directory where anonymized documents will be saved
+        workers (int): Number of worker processes (1 = process files in this process)
     
     Returns:
         list: List of paths to the anonymized files
@@ -278,6 +421,20 @@ def anonymize_documents(input_dir, output_dir):
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
     
+    if workers != 1:
+        pending = []
+        anonymized_files = []
+        for filename in os.listdir(input_dir):
+            input_file_path = os.path.join(input_dir, filename)
+            output_file_path = os.path.join(output_dir, filename)
+            if os.path.isdir(input_file_path) or not filename.endswith('.txt'):
+                continue
+            if os.path.exists(output_file_path):
+                anonymized_files.append(output_file_path)
+            else:
+                pending.append(input_file_path)
+        return anonymized_files + anonymize_files_parallel(pending, output_dir, workers)
+    
     anonymized_files = []
     
     # Process each file in the input directory
@@ -314,6 +471,168 @@ def anonymize_documents(input_dir, output_dir):
     
     return anonymized_files
 
+def balance_batches(file_paths, n_batches):
+    """
+    Split files into batches with roughly the same total size in bytes.
+    
+    Files are assigned from the largest to the smallest, each one to the
+    batch that is currently the lightest.
+    
+    Args:
+        file_paths (list): Paths of the files to split
+        n_batches (int): Number of batches to create
+        
+    Returns:
+        list: List of non-empty batches (lists of paths)
+    """
+    batches = [[] for _ in range(max(1, n_batches))]
+    loads = [0] * len(batches)
+    
+    sized = sorted(((os.path.getsize(path), path) for path in file_paths), reverse=True)
+    for size, path in sized:
+        lightest = loads.index(min(loads))
+        batches[lightest].append(path)
+        loads[lightest] += size
+    
+    return [batch for batch in batches if batch]
+
+def _init_worker():
+    """Limit torch threads in each worker to avoid CPU oversubscription."""
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+def _anonymize_batch(job):
+    """
+    Worker: anonymize a batch of files and write each result as soon as it is ready.
+    
+    The NER model is the module-level ner_pipeline inherited from the parent
+    process through fork, so it is never loaded again in the worker.
+    
+    Args:
+        job (tuple): (list of input paths, output directory)
+        
+    Returns:
+        dict: Worker stats (pid, files, bytes, seconds, outputs, errors)
+    """
+    file_paths, output_dir = job
+    stats = {"pid": os.getpid(), "files": 0, "bytes": 0, "seconds": 0.0, "outputs": [], "errors": []}
+    start = time.perf_counter()
+    
+    # Files go through NER a group at a time, in a single batch per group
+    for i in range(0, len(file_paths), FILES_PER_NER_BATCH):
+        texts = {}
+        for input_file_path in file_paths[i:i + FILES_PER_NER_BATCH]:
+            try:
+                with open(input_file_path, "r", encoding="utf-8") as f:
+                    texts[input_file_path] = f.read()
+            except Exception as e:
+                stats["errors"].append(f"{os.path.basename(input_file_path)}: {e}")
+        
+        try:
+            anonymized_texts = anonymize_texts(list(texts.values()))
+        except Exception:
+            # Retry one file at a time to report the file that fails
+            anonymized_texts = []
+            for input_file_path, text in list(texts.items()):
+                try:
+                    anonymized_texts.append(anonymize_text(text))
+                except Exception as e:
+                    stats["errors"].append(f"{os.path.basename(input_file_path)}: {e}")
+                    del texts[input_file_path]
+        
+        for (input_file_path, text), anonymized_text in zip(texts.items(), anonymized_texts):
+            filename = os.path.basename(input_file_path)
+            output_file_path = os.path.join(output_dir, filename)
+            try:
+                with open(output_file_path, "w", encoding="utf-8") as f:
+                    f.write(anonymized_text)
+                
+                stats["files"] += 1
+                stats["bytes"] += len(text.encode("utf-8"))
+                stats["outputs"].append(output_file_path)
+            except Exception as e:
+                stats["errors"].append(f"{filename}: {e}")
+    
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def anonymize_files_parallel(file_paths, output_dir, workers=None, batches_per_worker=4):
+    """
+    Anonymize files with a pool of forked worker processes.
+    
+    The model is loaded once in the parent and shared with the workers via
+    copy-on-write. Files are sent out in size-balanced batches and each
+    worker writes its results to the output directory as it goes.
+    
+    Args:
+        file_paths (list): Paths of the files to anonymize
+        output_dir (str): Directory where anonymized files are written
+        workers (int): Number of worker processes (default: CPU count)
+        batches_per_worker (int): Batches per worker, for load balancing
+        
+    Returns:
+        list: List of paths to the anonymized files
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if not file_paths:
+        return []
+    
+    workers = workers or os.cpu_count() or 1
+    
+    # Copy-on-write sharing needs fork (not available on Windows)
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        if workers > 1:
+            logger.warning("Fork not available on this platform, falling back to a single process")
+        stats = _anonymize_batch((list(file_paths), output_dir))
+        _log_worker_stats([stats])
+        return stats["outputs"]
+    
+    batches = balance_batches(file_paths, workers * batches_per_worker)
+    jobs = [(batch, output_dir) for batch in batches]
+    
+    # Move the loaded model out of the GC generations so the workers
+    # do not touch (and copy) its pages while collecting garbage
+    gc.collect()
+    gc.freeze()
+    
+    anonymized_files = []
+    all_stats = []
+    context = multiprocessing.get_context("fork")
+    try:
+        with context.Pool(processes=workers, initializer=_init_worker) as pool:
+            for stats in pool.imap_unordered(_anonymize_batch, jobs):
+                anonymized_files.extend(stats["outputs"])
+                all_stats.append(stats)
+                for error in stats["errors"]:
+                    logger.error(f"Error processing {error}")
+                logger.info(f"Anonymized {len(anonymized_files)}/{len(file_paths)} file(s)")
+    finally:
+        gc.unfreeze()
+    
+    _log_worker_stats(all_stats)
+    return anonymized_files
+
+def _log_worker_stats(all_stats):
+    """Log files, bytes and throughput for each worker process."""
+    per_worker = defaultdict(lambda: {"files": 0, "bytes": 0, "seconds": 0.0})
+    for stats in all_stats:
+        worker = per_worker[stats["pid"]]
+        worker["files"] += stats["files"]
+        worker["bytes"] += stats["bytes"]
+        worker["seconds"] += stats["seconds"]
+    
+    for pid, worker in sorted(per_worker.items()):
+        seconds = worker["seconds"] or 1e-9
+        logger.info(
+            f"Worker {pid}: {worker['files']} file(s), {worker['bytes'] / 1024:.1f} KB, "
+            f"{worker['files'] / seconds:.2f} files/s, {worker['bytes'] / 1024 / seconds:.1f} KB/s"
+        )
+    
+    return dict(per_worker)
+
 def get_chat_response(prompt):
     """Get response from the chat model."""
     response = client.chat.completions.create(
@@ -344,56 +663,73 @@ def classify_document(file_path):
     response = get_chat_response(prompt)
     return response
 
-def watch_and_anonymize(documents_dir, anonymized_dir, check_interval=60):
+def anonymize_file(input_file_path, output_dir):
+    """
+    Anonymize a single document and write it to the output directory.
+    
+    The result is written to a temporary file and renamed, so readers of the
+    output directory never see a partially written document.
+    
+    Args:
+        input_file_path (str): Path to the document
+        output_dir (str): Directory where the anonymized document is written
+        
+    Returns:
+        str: Path to the anonymized file
+    """
+    with open(input_file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    
+    anonymized_text = anonymize_text(text)
+    
+    output_path = os.path.join(output_dir, os.path.basename(input_file_path))
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(anonymized_text)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def watch_and_anonymize(documents_dir, anonymized_dir, check_interval=1, workers=2, manifest_path=None):
     """
     Watch a directory for new documents and anonymize them automatically.
     
+    New files are picked up from filesystem events (watchdog/inotify) as soon
+    as they are completely written and anonymized by a bounded pool of worker
+    threads. Processed files are recorded in a manifest (path, size, mtime,
+    hash), so after a restart only new or changed files are processed.
+    
     Args:
         documents_dir (str): Directory to watch for new documents
         anonymized_dir (str): Directory to store anonymized documents
-        check_interval (int): How often to check for new files (in seconds)
+        check_interval (float): Scan interval in seconds, used only when watchdog is not installed
+        workers (int): Number of worker threads
+        manifest_path (str): Path of the manifest (default: WATCHER_MANIFEST_PATH or data/cache)
     """
+    os.makedirs(anonymized_dir, exist_ok=True)
+    manifest_path = manifest_path or os.getenv(
+        "WATCHER_MANIFEST_PATH",
+        os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'watcher_manifest.jsonl')
+    )
+    
     logger.info(f"Starting automatic anonymization watcher on {documents_dir}")
-    processed_files = set()
+    watcher = MailboxWatcher(
+        documents_dir,
+        lambda path: anonymize_file(path, anonymized_dir),
+        manifest_path,
+        workers=workers,
+        poll_interval=check_interval,
+    )
     
-    while True:
-        # Get list of files in the documents directory
-        try:
-            current_files = set(os.path.join(documents_dir, f) for f in os.listdir(documents_dir) 
-                              if os.path.isfile(os.path.join(documents_dir, f)) and f.endswith('.txt'))
-            
-            # Find new files
-            new_files = current_files - processed_files
-            
-            if new_files:
-                logger.info(f"Found {len(new_files)} new document(s) to process")
-                for file_path in new_files:
-                    try:
-                        # Get just the filename
-                        filename = os.path.basename(file_path)
-                        
-                        # Read the content
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            text = f.read()
-                            
-                        # Anonymize the content
-                        anonymized_text = anonymize_text(text)
-                        
-                        # Write the anonymized content
-                        output_path = os.path.join(anonymized_dir, filename)
-                        with open(output_path, "w", encoding="utf-8") as f:
-                            f.write(anonymized_text)
-                            
-                        logger.info(f"Anonymized: {filename}")
-                        processed_files.add(file_path)
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing {file_path}: {e}")
-            
-        except Exception as e:
-            logger.error(f"Error in watcher: {e}")
-            
-        time.sleep(check_interval)
+    # Documents anonymized before the manifest existed (e.g. by anonymize_documents)
+    if not len(watcher.manifest):
+        with os.scandir(documents_dir) as entries:
+            for entry in entries:
+                output_path = os.path.join(anonymized_dir, entry.name)
+                if (entry.is_file() and entry.name.endswith('.txt') and os.path.exists(output_path)
+                        and os.path.getmtime(output_path) >= entry.stat().st_mtime):
+                    watcher.manifest.record(entry.path, entry.stat(), file_sha256(entry.path))
+    
+    watcher.run_forever()
 
 def main():
     # Base directory of the project
@@ -14,7 +14,7 @@ import threading
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def run_anonymization(watch=False, interval=60):
+def run_anonymization(watch=False, interval=1, workers=1, watch_workers=2):
     """Run the anonymization process and optionally start watcher"""
     # Base directory of the project
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -29,28 +29,29 @@ def run_anonymization(watch=False, interval=60):
     
     # Process existing documents
     logger.info(f"Processing documents from {documents_dir}")
-    anonymized_files = anonymize_documents(documents_dir, anonymized_dir)
+    anonymized_files = anonymize_documents(documents_dir, anonymized_dir, workers)
     logger.info(f"Processed {len(anonymized_files)} document(s)")
     
     # Start watching if requested
     if watch:
         logger.info(f"Starting watcher to monitor {documents_dir} for new documents")
-        logger.info(f"Check interval: {interval} seconds")
         logger.info("Press Ctrl+C to stop")
         
         try:
-            watch_and_anonymize(documents_dir, anonymized_dir, interval)
+            watch_and_anonymize(documents_dir, anonymized_dir, interval, watch_workers)
         except KeyboardInterrupt:
             logger.info("Watcher stopped by user")
         
 def main():
     parser = argparse.ArgumentParser(description="Document Anonymization Utility")
     parser.add_argument('--watch', action='store_true', help='Watch for new documents and anonymize them')
-    parser.add_argument('--interval', type=int, default=60, help='Check interval in seconds (default: 60)')
+    parser.add_argument('--interval', type=float, default=1, help='Scan interval in seconds when watchdog is not installed (default: 1)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for the initial run (0 = one per CPU, default: 1)')
+    parser.add_argument('--watch-workers', type=int, default=2, help='Worker threads of the watcher (default: 2)')
     
     args = parser.parse_args()
     
-    run_anonymization(args.watch, args.interval)
+    run_anonymization(args.watch, args.interval, args.workers or None, args.watch_workers)
 
 if __name__ == "__main__":
     main()
@@ -68,7 +68,7 @@ def start_anonymization_service():
     # Start the watcher thread
     watcher_thread = threading.Thread(
         target=watch_and_anonymize,
-        args=(documents_dir, anonymized_dir, 60),  # Check every 60 seconds
+        args=(documents_dir, anonymized_dir),
         daemon=True
     )
     watcher_thread.start()
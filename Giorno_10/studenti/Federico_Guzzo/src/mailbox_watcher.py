@@ -0,0 +1,360 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+# The manifest is rewritten with one line per file once it holds more than
+# COMPACT_RATIO lines per entry (and at least COMPACT_MIN_LINES lines)
+COMPACT_RATIO = 4
+COMPACT_MIN_LINES = 1000
+
+def file_sha256(path):
+    """
+    Args:
+        path (str): Path of the file to hash
+
+    Returns:
+        str: SHA-256 hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class Manifest:
+    """
+    Append-only record (JSON lines) of the files already processed.
+
+    Each line holds path, size, mtime and SHA-256 of a processed file; the
+    last line for a path wins. Appending keeps each update O(1) and a line
+    cut short by a crash is simply ignored on the next load. When most lines
+    are superseded the file is compacted to one line per file, on load or
+    after an update.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path of the manifest file
+        """
+        self.path = path
+        self._entries = {}
+        self._lines = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._entries[entry["path"]] = entry
+            with self._lock:
+                self._compact_if_needed()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, file_path):
+        """
+        Returns:
+            dict: The last entry recorded for the file, or None
+        """
+        with self._lock:
+            return self._entries.get(os.path.abspath(file_path))
+
+    def is_processed(self, file_path, stat):
+        """
+        Check whether a file was already processed with its current content.
+
+        Size and mtime are compared first; the content hash is computed only
+        when they differ, so a file that was merely touched is not redone.
+
+        Args:
+            file_path (str): Path of the file
+            stat (os.stat_result): Current stat of the file
+
+        Returns:
+            bool: True if the current content was already processed
+        """
+        entry = self.get(file_path)
+        if entry is None or entry["size"] != stat.st_size:
+            return False
+        if entry["mtime"] == stat.st_mtime:
+            return True
+        if entry["sha256"] == file_sha256(file_path):
+            self.record(file_path, stat, entry["sha256"])
+            return True
+        return False
+
+    def record(self, file_path, stat, sha256):
+        """
+        Mark a file as processed.
+
+        Args:
+            file_path (str): Path of the file
+            stat (os.stat_result): Stat of the file when it was read
+            sha256 (str): SHA-256 of the content that was processed
+        """
+        entry = {
+            "path": os.path.abspath(file_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": sha256,
+        }
+        with self._lock:
+            self._entries[entry["path"]] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._lines += 1
+            self._compact_if_needed()
+
+    def compact(self):
+        """Rewrite the manifest with only the last line of each file."""
+        with self._lock:
+            self._compact()
+
+    def _compact_if_needed(self):
+        if self._lines >= max(COMPACT_MIN_LINES, COMPACT_RATIO * len(self._entries)):
+            self._compact()
+
+    def _compact(self):
+        # Written aside and swapped in, so a crash leaves the old or the new file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+        logger.info(f"Compacted manifest {self.path}: {self._lines} lines -> {len(self._entries)}")
+        self._lines = len(self._entries)
+
+class _EventHandler(FileSystemEventHandler):
+    """Forward watchdog events for matching files to the watcher."""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path, ready=True)
+
+    def on_closed(self, event):
+        # inotify IN_CLOSE_WRITE: the writer is done, no need to wait
+        if not event.is_directory:
+            self.watcher.notify(event.src_path, ready=True)
+
+class MailboxWatcher:
+    """
+    Event-driven directory watcher that hands finished files to a worker pool.
+
+    Files are reported by watchdog (inotify on Linux), or by a stat scan of
+    the directory when watchdog is not installed. A file is processed once it
+    has been closed by its writer, or once its size and mtime have stayed the
+    same for settle_seconds. At most max_pending files are queued or running
+    at the same time; the rest wait in the pending set. Processed files are
+    recorded in the manifest, so a restart resumes where it stopped.
+    """
+
+    def __init__(self, documents_dir, process, manifest_path, suffix=".txt", workers=2,
+                 settle_seconds=0.25, poll_interval=1.0, max_pending=None):
+        """
+        Args:
+            documents_dir (str): Directory to watch
+            process (callable): Function called with the path of each ready file
+            manifest_path (str): Path of the manifest of processed files
+            suffix (str): Only files with this suffix are processed
+            workers (int): Number of worker threads
+            settle_seconds (float): Quiet time after the last write before a file is ready
+            poll_interval (float): Scan interval when watchdog is not available
+            max_pending (int): Maximum files queued or running (default: 2 * workers)
+        """
+        self.documents_dir = documents_dir
+        self.process = process
+        self.suffix = suffix
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.max_pending = max_pending or 2 * workers
+        self.manifest = Manifest(manifest_path)
+        self.stats = {"processed": 0, "skipped": 0, "errors": 0, "latency_total": 0.0}
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="anonymizer")
+        self._pending = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    def notify(self, file_path, ready=False, stat=None):
+        """
+        Report a new or changed file.
+
+        Args:
+            file_path (str): Path of the file
+            ready (bool): True if the writer is known to be done with it
+            stat (os.stat_result): Current stat, if known; an unchanged stat
+                does not restart the settle time
+        """
+        if not file_path.endswith(self.suffix):
+            return
+        file_path = os.path.abspath(file_path)
+        signature = (stat.st_size, stat.st_mtime) if stat is not None else None
+        now = time.monotonic()
+        with self._lock:
+            # (time of the last change or None if ready, time of the first event, size and mtime)
+            last_change, first_seen, previous = self._pending.get(file_path, (now, now, None))
+            if ready:
+                last_change = None
+            elif signature is None or signature != previous:
+                last_change = now
+            self._pending[file_path] = (last_change, first_seen, signature)
+        self._wakeup.set()
+
+    def scan(self):
+        """Report every matching file not processed yet (catch-up after a restart)."""
+        with os.scandir(self.documents_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(self.suffix):
+                    stat = entry.stat()
+                    if not self.manifest.is_processed(entry.path, stat):
+                        self.notify(entry.path, stat=stat)
+
+    def start(self):
+        """Start the watcher threads and queue the files not processed yet."""
+        os.makedirs(self.documents_dir, exist_ok=True)
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.documents_dir, recursive=False)
+            self._observer.start()
+        else:
+            logger.warning("watchdog not installed, scanning the directory every "
+                           f"{self.poll_interval} second(s)")
+            self._start_thread(self._poll_loop)
+        self._start_thread(self._dispatch_loop)
+        self.scan()
+
+    def stop(self):
+        """Stop watching and wait for the files being processed."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for thread in self._threads:
+            thread.join()
+        self._pool.shutdown(wait=True)
+
+    def run_forever(self):
+        """Start the watcher and block until interrupted."""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                self._stop.wait(1)
+        finally:
+            self.stop()
+
+    def wait_idle(self, timeout=None):
+        """
+        Block until no file is pending or being processed.
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._pending and not self._in_flight:
+                    return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+
+    def _start_thread(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.scan()
+            except OSError as e:
+                logger.error(f"Error scanning {self.documents_dir}: {e}")
+
+    def _dispatch_loop(self):
+        """Submit the files that are ready, re-checking the others until they settle."""
+        tick = self.settle_seconds / 2 or 0.05
+        while not self._stop.is_set():
+            self._wakeup.wait(tick)
+            self._wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                candidates = [
+                    (path, first_seen) for path, (last_change, first_seen, _) in self._pending.items()
+                    if path not in self._in_flight
+                    and (last_change is None or now - last_change >= self.settle_seconds)
+                ]
+                for path, first_seen in candidates:
+                    if len(self._in_flight) >= self.max_pending:
+                        break
+                    del self._pending[path]
+                    self._in_flight.add(path)
+                    self._pool.submit(self._run, path, first_seen)
+
+    def _count(self, key, latency=0.0):
+        with self._lock:
+            self.stats[key] += 1
+            self.stats["latency_total"] += latency
+
+    def _run(self, file_path, first_seen):
+        try:
+            if not os.path.exists(file_path):
+                return
+            stat = os.stat(file_path)
+            if self.manifest.is_processed(file_path, stat):
+                self._count("skipped")
+                return
+
+            sha256 = file_sha256(file_path)
+            self.process(file_path)
+
+            # Changed while we were reading it: process it again when it settles
+            if os.stat(file_path).st_mtime != stat.st_mtime:
+                self.notify(file_path)
+                return
+
+            self.manifest.record(file_path, stat, sha256)
+            latency = time.monotonic() - first_seen
+            self._count("processed", latency)
+            logger.info(f"Anonymized: {os.path.basename(file_path)} ({latency * 1000:.0f} ms after arrival)")
+        except Exception as e:
+            self._count("errors")
+            logger.error(f"Error processing {file_path}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(file_path)
+            self._wakeup.set()
@@ -1,12 +1,23 @@
 import sys
 import os
+import random
+import re
+import tempfile
+import time
+import types
 import unittest
 from unittest.mock import patch, MagicMock
 
 # Add the src directory to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
-from anonymize_mails import anonymize_text, anonymize_documents
+import anonymize_mails
+from anonymize_mails import anonymize_text, anonymize_documents, balance_batches, anonymize_files_parallel, resolve_spans
+import ner_offsets
+import anonymization_cache
+from anonymization_cache import AnonymizationCache, make_key
+import mailbox_watcher
+from mailbox_watcher import MailboxWatcher, Manifest
 
 class TestAnonymization(unittest.TestCase):
     """Test the document anonymization functionality"""
@@ -77,5 +88,423 @@ class TestAnonymization(unittest.TestCase):
         self.assertTrue(any('[Nome_' in call for call in write_calls))
         self.assertTrue(any('[Email_' in call for call in write_calls))
 
+    def test_repeated_names_aligned_in_order(self):
+        """Test that entities without offsets get the position of their own occurrence"""
+        text = "Mario scrive a Luca. Poi Mario chiama Luca e Mario."
+        entities = [
+            {"entity_group": "PER", "score": 0.9, "word": word}
+            for word in ("Mario", "Luca", "Mario", "Luca", "Mario")
+        ]
+
+        aligned = anonymize_mails.align_entities(text, entities)
+
+        self.assertEqual([e["start"] for e in aligned], [0, 15, 25, 38, 45])
+        self.assertTrue(all(text[e["start"]:e["end"]] == e["word"] for e in aligned))
+
+    def test_slow_tokenizer_masks_every_occurrence(self):
+        """Test that every occurrence of a repeated name is masked without offsets"""
+        pipe = MagicMock(return_value=[
+            {"entity_group": "PER", "score": 0.9, "word": "▁Mario"},
+            {"entity_group": "PER", "score": 0.9, "word": "▁Mario"},
+        ])
+        with patch.object(anonymize_mails, 'ner_pipeline', pipe):
+            anonymized = anonymize_mails._anonymize_text("Mario e ancora Mario")
+
+        self.assertEqual(anonymized, "[Nome_1] e ancora [Nome_2]")
+
+class TestNerWindows(unittest.TestCase):
+    """Test NER on texts longer than the model context"""
+
+    def setUp(self):
+        import torch
+        from tokenizers import Tokenizer, models, pre_tokenizers, processors
+        from transformers import PreTrainedTokenizerFast
+
+        vocab = {"[PAD]": 0, "[CLS]": 1, "[SEP]": 2, "[UNK]": 3, "Mario": 4, "Rossi": 5}
+        tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+        tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+        tokenizer.post_processor = processors.TemplateProcessing(
+            single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 1), ("[SEP]", 2)])
+        fast = PreTrainedTokenizerFast(
+            tokenizer_object=tokenizer, pad_token="[PAD]", cls_token="[CLS]",
+            sep_token="[SEP]", unk_token="[UNK]", model_max_length=16)
+
+        def model(input_ids, **kwargs):
+            # Names are recognized only with two tokens of context on both sides
+            real = (input_ids > 2).sum(1, keepdim=True)
+            position = torch.arange(input_ids.shape[1])
+            context = (position >= 3) & (position <= real - 2)
+            logits = torch.zeros(*input_ids.shape, 3)
+            logits[..., 0] = 1
+            logits[..., 1] += 5 * ((input_ids == 4) & context)
+            logits[..., 2] += 5 * ((input_ids == 5) & context)
+            return types.SimpleNamespace(logits=logits)
+
+        model.config = types.SimpleNamespace(
+            id2label={0: "O", 1: "B-PER", 2: "I-PER"}, max_position_embeddings=16)
+        self.pipe = types.SimpleNamespace(tokenizer=fast, model=model)
+
+    def test_entity_across_window_edge(self):
+        """Test that a name found at every position of a long text is reported once, whole"""
+        for position in range(2, 40):
+            text = "x " * position + "Mario Rossi" + " x" * 30
+
+            (entities,) = ner_offsets.ner_entities(self.pipe, [text], stride=8)
+
+            self.assertEqual(
+                [(e["entity_group"], e["word"], e["start"]) for e in entities],
+                [("PER", "Mario Rossi", 2 * position)]
+            )
+
+    def test_without_stride_edges_lose_context(self):
+        """Test that windows without shared tokens miss names at their edges"""
+        missed = 0
+        for position in range(2, 40):
+            text = "x " * position + "Mario Rossi" + " x" * 30
+            (entities,) = ner_offsets.ner_entities(self.pipe, [text], stride=0)
+            missed += [e["word"] for e in entities] != ["Mario Rossi"]
+
+        self.assertGreater(missed, 0)
+
+class TestSpanResolver(unittest.TestCase):
+    """Test the overlap resolution of regex and NER matches"""
+
+    @staticmethod
+    def _match(label, start, end, score=1.0):
+        return {"entity": f"B-{label}", "score": score, "start": start, "end": end}
+
+    def test_overlap_policy(self):
+        """Test merge of same labels and precedence of regex, length and score"""
+        regex = [self._match("IBAN", 0, 10), self._match("IBAN", 5, 20), self._match("EMAIL", 30, 40)]
+        ner = [self._match("PER", 35, 50, 0.99), self._match("LOC", 60, 65, 0.5), self._match("ORG", 62, 70, 0.9)]
+
+        resolved = [(s["entity"], s["start"], s["end"]) for s in resolve_spans([regex, ner])]
+
+        self.assertEqual(resolved, [("IBAN", 0, 20), ("EMAIL", 30, 40), ("PER", 40, 50), ("LOC", 60, 62), ("ORG", 62, 70)])
+
+    def test_partial_overlap_keeps_remainder(self):
+        """Test that the part of a loser outside the winner is kept, on either side"""
+        email_first = resolve_spans([[self._match("EMAIL", 20, 40)], [self._match("PER", 0, 25)]])
+        cell_first = resolve_spans([[self._match("CELLNUMBER", 4, 19)], [self._match("PER", 0, 8)]])
+        inside = resolve_spans([[self._match("EMAIL", 10, 20)], [self._match("ORG", 0, 30)]])
+
+        self.assertEqual([(s["entity"], s["start"], s["end"]) for s in email_first], [("PER", 0, 20), ("EMAIL", 20, 40)])
+        self.assertEqual([(s["entity"], s["start"], s["end"]) for s in cell_first], [("PER", 0, 4), ("CELLNUMBER", 4, 19)])
+        self.assertEqual([(s["entity"], s["start"], s["end"]) for s in inside], [("ORG", 0, 10), ("EMAIL", 10, 20), ("ORG", 20, 30)])
+
+    def test_remainder_trimmed_to_text(self):
+        """Test that leftover pieces drop the spaces and punctuation at their edges"""
+        text = "Mario Rossi, mario@example.com"
+        resolved = resolve_spans([[self._match("EMAIL", 13, 30)], [self._match("PER", 0, 16)]], text)
+
+        self.assertEqual([(s["entity"], text[s["start"]:s["end"]]) for s in resolved],
+                         [("PER", "Mario Rossi"), ("EMAIL", "mario@example.com")])
+
+    def test_fuzz_resolver(self):
+        """Test on random dense spans that the result is sorted, disjoint and made of input bounds"""
+        rng = random.Random(0)
+        labels = ["IBAN", "EMAIL", "CELLNUMBER", "PER", "ORG"]
+        for _ in range(300):
+            groups = [[], []]
+            for _ in range(rng.randint(0, 40)):
+                start = rng.randint(0, 200)
+                groups[rng.randint(0, 1)].append(
+                    self._match(rng.choice(labels), start, start + rng.randint(1, 25), rng.random())
+                )
+            resolved = resolve_spans(groups)
+
+            for before, after in zip(resolved, resolved[1:]):
+                self.assertLessEqual(before["end"], after["start"])
+            inputs = [m for group in groups for m in group]
+            bounds = {m["start"] for m in inputs} | {m["end"] for m in inputs}
+            for span in resolved:
+                self.assertIn(span["start"], bounds)
+                self.assertIn(span["end"], bounds)
+            # Every character of every match stays covered
+            covered = {i for span in resolved for i in range(span["start"], span["end"])}
+            for m in inputs:
+                self.assertTrue(set(range(m["start"], m["end"])) <= covered)
+            # A match that overlaps nothing else is always kept as it is
+            for m in inputs:
+                alone = all(o is m or o["end"] <= m["start"] or o["start"] >= m["end"] for o in inputs)
+                if alone:
+                    self.assertIn((m["start"], m["end"]), [(s["start"], s["end"]) for s in resolved])
+
+    def test_fuzz_dense_pii_never_leaks(self):
+        """Test that no character of a PII value survives shifted partial overlaps"""
+        rng = random.Random(1)
+        values = {
+            "iban": lambda: "IT60X" + "".join(rng.choice("0123456789") for _ in range(22)),
+            "cf": lambda: "RSSMRA80A01H501" + rng.choice("ABCDEFGHIJ"),
+            "email": lambda: f"user{rng.randint(0, 999)}@example.com",
+            "cell": lambda: "3" + "".join(rng.choice("0123456789") for _ in range(9)),
+            "name": lambda: rng.choice(["Mario Rossi", "Anna Neri", "Luca Bianchi"]),
+        }
+        # Filler words share no character with the PII values
+        fillers = ["è", "ù", "àì", "ìè"]
+        for _ in range(300):
+            parts, bounds = [], []
+            position = 0
+            for _ in range(rng.randint(5, 40)):
+                kind = rng.choice(list(values) + ["filler"])
+                token = rng.choice(fillers) if kind == "filler" else values[kind]()
+                if kind != "filler":
+                    bounds.append((kind, position, position + len(token)))
+                parts.append(token)
+                position += len(token) + 1
+            text = " ".join(parts)
+
+            names = []
+            for kind, start, end in bounds:
+                if kind == "name":
+                    names.append((start, end, "PER"))
+                # NER also tags shifted pieces of the values: a prefix, a suffix,
+                # a window across the previous or next word, or the middle
+                for _ in range(rng.randint(0, 2)):
+                    a = rng.randint(max(0, start - 6), end - 1)
+                    b = rng.randint(max(a + 1, start + 1), min(len(text), end + 6))
+                    names.append((a, b, rng.choice(["PER", "ORG", "LOC"])))
+            entities = sorted(
+                ({"entity_group": label, "score": rng.random(), "word": text[a:b], "start": a, "end": b}
+                 for a, b, label in names),
+                key=lambda e: e["start"]
+            )
+
+            with patch.object(anonymize_mails, 'ner_entities', return_value=[entities]):
+                anonymized = anonymize_mails._anonymize_text(text)
+
+            outside = re.sub(r"\[[^\[\]]*\]", "", anonymized)
+            self.assertLessEqual(set(outside), set("".join(fillers) + " "), (text, anonymized))
+
+class TestParallelAnonymization(unittest.TestCase):
+    """Test the process-pool directory anonymizer"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp.name, 'documents')
+        self.output_dir = os.path.join(self.tmp.name, 'anonymized')
+        os.makedirs(self.input_dir)
+        self.paths = []
+        for i in range(10):
+            path = os.path.join(self.input_dir, f'doc{i}.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f'Mail {i} from secret{i}@example.com' + ' x' * (i * 50))
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_balance_batches(self):
+        """Test that batches cover every file once and have similar sizes"""
+        batches = balance_batches(self.paths, 3)
+        self.assertEqual(len(batches), 3)
+        self.assertEqual(sorted(p for batch in batches for p in batch), sorted(self.paths))
+        loads = [sum(os.path.getsize(p) for p in batch) for batch in batches]
+        self.assertLessEqual(max(loads) - min(loads), max(os.path.getsize(p) for p in self.paths))
+
+    def test_balance_batches_more_batches_than_files(self):
+        """Test that empty batches are dropped"""
+        self.assertEqual(len(balance_batches(self.paths[:2], 8)), 2)
+
+    @patch.object(anonymize_mails, 'anonymize_text', side_effect=lambda text: text.replace('secret', '[Email]'))
+    def test_parallel_matches_sequential(self, _):
+        """Test that the worker pool writes the same output as a single process"""
+        sequential_dir = os.path.join(self.tmp.name, 'sequential')
+        anonymize_files_parallel(self.paths, sequential_dir, workers=1)
+        result = anonymize_files_parallel(self.paths, self.output_dir, workers=2, batches_per_worker=2)
+
+        self.assertEqual(sorted(os.path.basename(p) for p in result), sorted(os.listdir(sequential_dir)))
+        for filename in os.listdir(sequential_dir):
+            with open(os.path.join(sequential_dir, filename), encoding='utf-8') as f:
+                expected = f.read()
+            with open(os.path.join(self.output_dir, filename), encoding='utf-8') as f:
+                self.assertEqual(f.read(), expected)
+            self.assertNotIn('secret', expected)
+
+    @patch.object(anonymize_mails, 'anonymize_text', side_effect=lambda text: text.upper())
+    def test_anonymize_documents_with_workers_skips_existing(self, _):
+        """Test that already anonymized files are not processed again"""
+        os.makedirs(self.output_dir)
+        with open(os.path.join(self.output_dir, 'doc0.txt'), 'w', encoding='utf-8') as f:
+            f.write('already done')
+
+        result = anonymize_documents(self.input_dir, self.output_dir, workers=2)
+
+        self.assertEqual(len(result), len(self.paths))
+        with open(os.path.join(self.output_dir, 'doc0.txt'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'already done')
+
+class TestAnonymizationCache(unittest.TestCase):
+    """Test the persistent anonymization cache"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = AnonymizationCache(os.path.join(self.tmp.name, 'cache.sqlite'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_second_call_skips_anonymization(self):
+        """Test that a cached text is not processed again"""
+        with patch.object(anonymize_mails, 'anonymization_cache', self.cache), \
+             patch.object(anonymize_mails, '_anonymize_texts', return_value=['[Nome_1] wrote']) as mock_anonymize:
+            first = anonymize_text('John wrote')
+            second = anonymize_text('John wrote')
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_anonymize.call_count, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_batch_runs_ner_once_on_misses(self):
+        """Test that a batch sends only the uncached texts to NER, in one call"""
+        self.cache.put(make_key('cached', anonymize_mails.NER_MODEL_NAME, anonymize_mails.REGEX_PATTERNS), 'cached')
+        with patch.object(anonymize_mails, 'anonymization_cache', self.cache), \
+             patch.object(anonymize_mails, 'ner_entities', return_value=[[], []]) as mock_ner:
+            results = anonymize_mails.anonymize_texts(['one', 'cached', 'two'])
+
+        self.assertEqual(results, ['one', 'cached', 'two'])
+        mock_ner.assert_called_once_with(['one', 'two'])
+
+    def test_cache_survives_restart(self):
+        """Test that entries are read back from disk by a new instance"""
+        self.cache.put('key', 'anonymized')
+
+        self.assertEqual(AnonymizationCache(self.cache.path).get('key'), 'anonymized')
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are evicted past the size limit"""
+        cache = AnonymizationCache(os.path.join(self.tmp.name, 'small.sqlite'), max_bytes=250)
+        cache.put('a', 'a' * 100)
+        cache.put('b', 'b' * 100)
+        cache.get('a')
+        cache.put('c', 'c' * 100)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'a' * 100)
+        self.assertLessEqual(cache.stats()['bytes'], 250)
+
+    def test_key_changes_with_logic_version(self):
+        """Test that results cached by an older masking logic are not reused"""
+        key = make_key('John wrote', 'model', {'EMAIL': r'\S+@\S+'})
+
+        with patch.object(anonymization_cache, 'LOGIC_VERSION', anonymization_cache.LOGIC_VERSION + 1):
+            self.assertNotEqual(make_key('John wrote', 'model', {'EMAIL': r'\S+@\S+'}), key)
+
+    def test_running_totals(self):
+        """Test that the trigger-maintained totals match the table after overwrites"""
+        self.cache.put('a', 'x' * 10)
+        self.cache.put('b', 'y' * 20)
+        self.cache.put('a', 'z' * 5)
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['entries'], stats['bytes']), (2, 25))
+
+class TestMailboxWatcher(unittest.TestCase):
+    """Test the event-driven mailbox watcher"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp.name, 'documents')
+        self.manifest_path = os.path.join(self.tmp.name, 'manifest.jsonl')
+        os.makedirs(self.input_dir)
+        self.processed = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.input_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def _watcher(self, **kwargs):
+        watcher = MailboxWatcher(self.input_dir, self.processed.append, self.manifest_path, **kwargs)
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        return watcher
+
+    def test_new_file_processed_within_a_second(self):
+        """Test that a new mail is anonymized in under a second"""
+        watcher = self._watcher()
+        start = time.monotonic()
+        path = self._write('new.txt', 'Mail from mario@example.com')
+
+        while not self.processed and time.monotonic() - start < 5:
+            time.sleep(0.01)
+
+        self.assertEqual(self.processed, [path])
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertTrue(watcher.wait_idle(timeout=5))
+        self.assertIsNotNone(watcher.manifest.get(path))
+
+    def test_restart_does_not_repeat_work(self):
+        """Test that processed files are skipped after a restart, changed files are redone"""
+        done = self._write('done.txt', 'already processed')
+        changed = self._write('changed.txt', 'old content')
+        manifest = Manifest(self.manifest_path)
+        for path in (done, changed):
+            manifest.record(path, os.stat(path), mailbox_watcher.file_sha256(path))
+        self._write('changed.txt', 'new content, longer')
+        new = self._write('new.txt', 'never seen')
+
+        watcher = self._watcher()
+        self.assertTrue(watcher.wait_idle(timeout=5))
+
+        self.assertEqual(sorted(self.processed), sorted([changed, new]))
+
+    def test_touched_file_not_reprocessed(self):
+        """Test that a new mtime with the same content does not trigger work"""
+        path = self._write('mail.txt', 'same content')
+        Manifest(self.manifest_path).record(path, os.stat(path), mailbox_watcher.file_sha256(path))
+        os.utime(path, (time.time() + 10, time.time() + 10))
+
+        watcher = self._watcher()
+        self.assertTrue(watcher.wait_idle(timeout=5))
+
+        self.assertEqual(self.processed, [])
+
+    def test_manifest_compacted(self):
+        """Test that superseded manifest lines are dropped on load and after updates"""
+        paths = [self._write(f'mail{i}.txt', f'content {i}') for i in range(3)]
+        manifest = Manifest(self.manifest_path)
+        with patch.object(mailbox_watcher, 'COMPACT_MIN_LINES', 10**6):
+            for _ in range(5):
+                for path in paths:
+                    manifest.record(path, os.stat(path), mailbox_watcher.file_sha256(path))
+        with open(self.manifest_path, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 15)
+
+        with patch.object(mailbox_watcher, 'COMPACT_MIN_LINES', 4):
+            reloaded = Manifest(self.manifest_path)
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), 3)
+            # 3 + 9 lines reach COMPACT_RATIO * 3 entries: compacted back to 3, then one more
+            for _ in range(10):
+                reloaded.record(paths[0], os.stat(paths[0]), mailbox_watcher.file_sha256(paths[0]))
+
+        with open(self.manifest_path, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 4)
+        self.assertEqual(Manifest(self.manifest_path)._entries, reloaded._entries)
+        self.assertEqual(len(reloaded), 3)
+
+    @patch.object(mailbox_watcher, 'Observer', None)
+    def test_partial_write_debounced_with_polling(self):
+        """Test that a file still being written is processed once, when complete"""
+        watcher = self._watcher(settle_seconds=0.3, poll_interval=0.05)
+        path = os.path.join(self.input_dir, 'slow.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            for i in range(5):
+                f.write(f'part {i} ')
+                f.flush()
+                time.sleep(0.1)
+        time.sleep(0.1)
+        self.assertTrue(watcher.wait_idle(timeout=5))
+
+        self.assertEqual(self.processed, [path])
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(watcher.manifest.get(path)['size'], len(f.read()))
+
 if __name__ == "__main__":
     unittest.main()
@@ -4,10 +4,13 @@ import streamlit as st
 
 from src.rag_app_daniel_craciun.pipeline import RAGPipeline
 from src.rag_app_daniel_craciun.ai_client import AIProjectClientDefinition  # <-- Import AIClient
+from src.rag_app_daniel_craciun.embedding_cache import get_embedding_cache
 
 load_dotenv()
 
 DEFAULT_FOLDER_PATH = os.getenv("DEFAULT_FOLDER_PATH", "./data")
+# Cache degli embedding: una nuova chat sulla stessa cartella non ricalcola i chunk già visti
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./.cache/embeddings.sqlite")
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"  # solo per evitare warning su Windows
 
 
@@ -33,7 +36,9 @@ def main() -> None:
         try:
             # CREA L'OGGETTO AIClient (aggiungi eventuali parametri richiesti dal tuo costruttore)
             ai_client = AIProjectClientDefinition()  # <-- Passa qui eventuali config/segreti se servono
-            new_pipeline = RAGPipeline(folder_path, ai_client)  # <-- Passa ai_client come primo argomento
+            new_pipeline = RAGPipeline(  # <-- Passa ai_client come primo argomento
+                folder_path, ai_client, embedding_cache=get_embedding_cache(EMBEDDING_CACHE_PATH)
+            )
         except Exception as e:
             st.sidebar.error(f"Errore creazione pipeline: {e}")
             return
@@ -61,15 +66,16 @@ def main() -> None:
         chat = st.session_state.chats[st.session_state.active_chat_id]
         pipeline = chat["pipeline"]
 
+        # Removed files drop their vectors; new or edited files are indexed incrementally
+        rimossi = chat["uploaded_file_names"] - {file.name for file in uploaded_files or []}
+        if rimossi:
+            pipeline.remove_documents(rimossi)
+            chat["uploaded_file_names"] -= rimossi
         if uploaded_files:
-            nuovi_file = []
-            for file in uploaded_files:
-                if file.name not in chat["uploaded_file_names"]:
-                    nuovi_file.append(file)
-                    chat["uploaded_file_names"].add(file.name)
-            if nuovi_file:
-                pipeline.add_uploaded_files(nuovi_file)
-                st.sidebar.success(f"{len(nuovi_file)} nuovi file aggiunti.")
+            aggiornati = pipeline.add_uploaded_files(uploaded_files)
+            chat["uploaded_file_names"].update(file.name for file in uploaded_files)
+            if aggiornati:
+                st.sidebar.success(f"{aggiornati} nuovi file aggiunti.")
             else:
                 st.sidebar.info("Nessun nuovo file da aggiungere.")
 
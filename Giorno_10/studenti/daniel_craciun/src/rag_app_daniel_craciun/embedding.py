@@ -1,15 +1,21 @@
-from typing import List
+import os
+from typing import List, Optional
 from langchain.embeddings.base import Embeddings
 from .ai_client import AIProjectClientDefinition
+from .embedding_client import EmbeddingClient
 
 class GenericEmbeddingModel:
     def __init__(
         self,
         ai_client: AIProjectClientDefinition,
         model_name: str = None,
+        tokens_per_minute: Optional[int] = None,
     ):
         self.client = ai_client.client
         self.model_name = model_name or "text-embedding-ada-002"
+        # TPM quota of the Azure deployment (EMBEDDING_TPM, unlimited if unset)
+        tokens_per_minute = tokens_per_minute or int(os.getenv("EMBEDDING_TPM", "0")) or None
+        self.batch_client = EmbeddingClient(self.client, self.model_name, tokens_per_minute=tokens_per_minute)
 
     def embed_text(self, text: str) -> list[float]:
         response = self.client.embeddings.create(
@@ -18,6 +24,10 @@ class GenericEmbeddingModel:
         )
         return response.data[0].embedding
 
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embeds many texts with batched, concurrent, rate-limited requests."""
+        return self.batch_client.embed(texts)
+
 class LangchainEmbeddingWrapper(Embeddings):
     """Adapter for using a generic embedding model with LangChain."""
 
@@ -25,7 +35,7 @@ class LangchainEmbeddingWrapper(Embeddings):
         self.embedding_model = embedding_model
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        return [self.embedding_model.embed_text(text) for text in texts]
+        return self.embedding_model.embed_texts(texts)
 
     def embed_query(self, text: str) -> List[float]:
         return self.embedding_model.embed_text(text)
@@ -0,0 +1,186 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Azure limits for text-embedding-ada-002: 8191 tokens per input; some API
+# versions accept at most 16 inputs per request
+MAX_INPUT_TOKENS = 8191
+MAX_BATCH_INPUTS = 16
+MAX_BATCH_TOKENS = 32000
+
+
+class TokenBudget:
+    """Tokens-per-minute bucket shared by all in-flight requests."""
+
+    def __init__(self, tokens_per_minute: int) -> None:
+        self.capacity = tokens_per_minute
+        self.available = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def acquire(self, tokens: int) -> None:
+        tokens = min(tokens, self.capacity)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                self._cond.wait((tokens - self.available) / self.rate)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by the server (Retry-After / retry-after-ms headers), if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("RateLimitError", "APIConnectionError", "APITimeoutError", "Timeout")
+
+
+class EmbeddingClient:
+    """
+    Batched, concurrent embeddings over an OpenAI-compatible client.
+
+    Inputs are packed into requests bounded by token count and input count,
+    up to max_concurrency requests are in flight, a tokens-per-minute budget
+    is enforced before each request, and 429/5xx responses are retried after
+    the server's Retry-After (or exponential backoff). While one request is
+    throttled, the others wait too. Vectors come back in input order.
+
+    Retries happen only here: the OpenAI client's own retries are turned off,
+    otherwise each attempt would hide up to max_retries more inside the SDK.
+    Inputs over MAX_INPUT_TOKENS are truncated.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        max_batch_inputs: int = MAX_BATCH_INPUTS,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_concurrency: int = 4,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 6,
+        encoding_name: str = "cl100k_base",
+    ) -> None:
+        # with_options returns a copy, the caller's client is left unchanged
+        self.client = client.with_options(max_retries=0) if hasattr(client, "with_options") else client
+        self.model = model
+        self.max_batch_inputs = max_batch_inputs
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.encoding = tiktoken.get_encoding(encoding_name) if tiktoken is not None else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.truncated = 0
+
+    def truncate(self, text: str) -> Tuple[str, int]:
+        """Text cut to MAX_INPUT_TOKENS tokens, and the token count to send."""
+        if self.encoding is None:
+            # Without a tokenizer tokens are estimated (about 4 characters each);
+            # the cut assumes 2 characters per token to stay under the limit
+            if len(text) > MAX_INPUT_TOKENS * 2:
+                text = text[:MAX_INPUT_TOKENS * 2]
+                self.truncated += 1
+            return text, len(text) // 4 + 1
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) > MAX_INPUT_TOKENS:
+            tokens = tokens[:MAX_INPUT_TOKENS]
+            text = self.encoding.decode(tokens)
+            self.truncated += 1
+        return text, len(tokens)
+
+    def pack(self, counts: Sequence[int]) -> List[List[int]]:
+        """Indexes of the inputs (given their token counts) grouped into requests, in order."""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        tokens = 0
+        for i, n in enumerate(counts):
+            if current and (len(current) >= self.max_batch_inputs or tokens + n > self.max_batch_tokens):
+                batches.append(current)
+                current, tokens = [], 0
+            current.append(i)
+            tokens += n
+        if current:
+            batches.append(current)
+        return batches
+
+    def _wait_pause(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _request(self, batch: List[str], tokens: int) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self._wait_pause()
+            if self.budget is not None:
+                self.budget.acquire(tokens)
+            try:
+                with self._lock:
+                    self.requests += 1
+                response = self.client.embeddings.create(input=batch, model=self.model)
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+            except Exception as error:
+                if attempt == self.max_retries or not is_retryable(error):
+                    raise
+                delay = retry_after(error)
+                if delay is None:
+                    delay = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                with self._lock:
+                    self.retries += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                attempt += 1
+
+    def embed(self, texts: Sequence[str],
+              on_progress: Optional[Callable[[int, int], None]] = None) -> List[List[float]]:
+        prepared = [self.truncate(text) for text in texts]
+        texts = [text for text, _ in prepared]
+        counts = [count for _, count in prepared]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        done = 0
+
+        def run(indexes: List[int]) -> List[int]:
+            tokens = sum(counts[i] for i in indexes)
+            for i, vector in zip(indexes, self._request([texts[i] for i in indexes], tokens)):
+                results[i] = vector
+            return indexes
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as pool:
+            for indexes in pool.map(run, self.pack(counts)):
+                done += len(indexes)
+                if on_progress:
+                    on_progress(done, len(texts))
+        return results
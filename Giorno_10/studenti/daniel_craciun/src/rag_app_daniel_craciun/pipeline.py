@@ -1,7 +1,11 @@
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
 from .loader import GenericFileLoader
 from .embedding import GenericEmbeddingModel, LangchainEmbeddingWrapper
+from .embedding_cache import CachedEmbeddings, EmbeddingCache
 from .anonymizer import TextAnonymizer
 from .chat_model import ChatCompletionModel
 from .ai_client import AIProjectClientDefinition
@@ -15,14 +19,21 @@ class RAGPipeline:
         loader: GenericFileLoader = None,
         embedding_model: GenericEmbeddingModel = None,
         chat_model: ChatCompletionModel = None,
+        embedding_cache: EmbeddingCache = None,
     ) -> None:
         self.anonymizer = anonymizer or TextAnonymizer()
-        self.documents = []
+        self.documents: List[Document] = []
+        # file name -> (content digest, vector ids in the index)
+        self.document_ids: Dict[str, Tuple[str, List[str]]] = {}
         self.folder_path = folder_path
         self.loader = loader or GenericFileLoader(folder_path)
         self.load_documents_from_folder()
         self.embedding_model = embedding_model or GenericEmbeddingModel(ai_client)
         self.embedding_wrapper = LangchainEmbeddingWrapper(self.embedding_model)
+        if embedding_cache is not None:
+            self.embedding_wrapper = CachedEmbeddings(
+                self.embedding_wrapper, self.embedding_model.model_name, embedding_cache
+            )
         self.vectorstore = None
         self.chat_model = chat_model or ChatCompletionModel(ai_client)
         self._build_vectorstore()
@@ -34,25 +45,64 @@ class RAGPipeline:
                 Document(page_content=doc["content"], metadata={"file_name": doc["file_name"]})
             )
 
-    def add_uploaded_files(self, uploaded_files) -> None:
+    def add_uploaded_files(self, uploaded_files) -> int:
+        """Indexes new or changed files only; returns how many were (re)indexed."""
+        documents = []
         for uploaded_file in uploaded_files:
             try:
                 content = uploaded_file.getvalue().decode("utf-8")
-                self.documents.append(
+                documents.append(
                     Document(page_content=content, metadata={"file_name": uploaded_file.name})
                 )
             except Exception as e:
                 print(f"Error loading file {uploaded_file.name}: {e}")
-        self._build_vectorstore()
+        return self._update_vectorstore(documents)
 
-    def _build_vectorstore(self) -> None:
-        if self.documents:
-            self.vectorstore = FAISS.from_documents(self.documents, embedding=self.embedding_wrapper)
-            self.retriever = self.vectorstore.as_retriever()
-        else:
+    def remove_documents(self, file_names: Iterable[str]) -> None:
+        file_names = set(file_names)
+        stale = [vid for name in file_names for vid in self.document_ids.pop(name, ("", []))[1]]
+        self.documents = [doc for doc in self.documents if doc.metadata["file_name"] not in file_names]
+        if stale and self.vectorstore is not None:
+            self.vectorstore.delete(stale)
+        if not self.document_ids:
             self.vectorstore = None
             self.retriever = None
 
+    @staticmethod
+    def _digest(content: str) -> str:
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _update_vectorstore(self, documents: List[Document]) -> int:
+        """Adds documents not yet indexed and replaces the vectors of edited ones (matched by file name)."""
+        changed: Dict[str, Tuple[Document, str]] = {}
+        for doc in documents:
+            name = doc.metadata["file_name"]
+            digest = self._digest(doc.page_content)
+            indexed = self.document_ids.get(name)
+            if indexed is None or indexed[0] != digest:
+                changed[name] = (doc, digest)
+        if not changed:
+            return 0
+
+        self.remove_documents([name for name in changed if name in self.document_ids])
+        docs = [doc for doc, _ in changed.values()]
+        ids = [f"{name}:{digest[:12]}" for name, (_, digest) in changed.items()]
+        if self.vectorstore is None:
+            self.vectorstore = FAISS.from_documents(docs, embedding=self.embedding_wrapper, ids=ids)
+            self.retriever = self.vectorstore.as_retriever()
+        else:
+            self.vectorstore.add_documents(docs, ids=ids)
+        for (name, (doc, digest)), vid in zip(changed.items(), ids):
+            self.document_ids[name] = (digest, [vid])
+        self.documents = [doc for doc in self.documents if doc.metadata["file_name"] not in changed] + docs
+        return len(changed)
+
+    def _build_vectorstore(self) -> None:
+        self.vectorstore = None
+        self.retriever = None
+        self.document_ids = {}
+        self._update_vectorstore(self.documents)
+
     def answer_query(self, query: str) -> str:
         if not self.retriever:
             return "No documents loaded for search."
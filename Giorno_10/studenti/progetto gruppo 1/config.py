@@ -8,4 +8,6 @@ FOLDER_PATH = parent_dir / "data" / "dataset"
 ANON_FILE_PATH = parent_dir / "data" / "file_anon" 
 RESULTS_PATH = parent_dir / "data" / "results"
 ENV_PATH = parent_dir / ".env"
-HISTORY_PATH = parent_dir / "history"
\ No newline at end of file
+HISTORY_PATH = parent_dir / "history"
+EMBEDDING_CACHE_PATH = parent_dir / ".cache" / "embeddings.sqlite"
+INDEX_PATH = parent_dir / ".cache" / "faiss_index"
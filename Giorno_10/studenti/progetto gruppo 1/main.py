@@ -4,6 +4,8 @@ from pathlib import Path
 import os, sys
 from config import *
 from modules.AzureRag import AzureRAGSystem
+from modules.embedding_cache import EmbeddingCache
+from modules.index_store import corpus_fingerprint
 from dotenv import load_dotenv
 from subprocess import run
 
@@ -64,7 +66,10 @@ if __name__ == "__main__":
                 azure_endpoint=AZURE_ENDPOINT_RAG,
                 api_key=API_KEY_RAG,
                 embedding_deployment=EMBEDDING_DEPLOYMENT_RAG,
-                gpt_deployment=GPT_DEPLOYMENT_RAG
+                gpt_deployment=GPT_DEPLOYMENT_RAG,
+                embedding_cache=EmbeddingCache(str(EMBEDDING_CACHE_PATH)),
+                embedding_tpm=int(os.getenv("EMBEDDING_TPM_RAG", "0")) or None,
+                index_memory_mb=int(os.getenv("INDEX_MEMORY_MB_RAG", "2048"))
             )
             print("[INFO] Starting RAG...")
             
@@ -72,9 +77,14 @@ if __name__ == "__main__":
             documents = load_data(anon_file_path)
             print(f"[INFO] Loaded {len(documents)} documents from {anon_file_path}")
 
-            # Add documents to the RAG system
-            rag.add_documents(documents)
-            print("[INFO] Documents added to RAG system.")
+            # Reuse the saved index if the documents did not change, otherwise rebuild and save it
+            corpus = corpus_fingerprint(documents)
+            if rag.load_index(str(INDEX_PATH), corpus):
+                print("[INFO] Saved index loaded, no embeddings computed.")
+            else:
+                rag.add_documents(documents)
+                rag.save_index(str(INDEX_PATH), corpus)
+                print("[INFO] Documents added to RAG system.")
             
             # Start the chat loop
             while True:
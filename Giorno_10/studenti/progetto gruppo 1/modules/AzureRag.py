@@ -6,6 +6,10 @@ import faiss
 import pickle
 from datetime import datetime
 import json
+from modules.embedding_cache import EmbeddingCache, embed_with_cache
+from modules.embedding_client import EmbeddingClient
+from modules.index_factory import build_index, choose_index_spec
+from modules.index_store import load_index_store, save_index_store
 
 class AzureRAGSystem:
     """Sistema RAG utilizzando Azure OpenAI per embeddings e generazione"""
@@ -15,7 +19,11 @@ class AzureRAGSystem:
                  api_key: str,
                  embedding_deployment: str = "text-embedding-ada-002",
                  gpt_deployment: str = "gpt-4",
-                 api_version: str = "2024-02-01"):
+                 api_version: str = "2024-02-01",
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 embedding_tpm: Optional[int] = None,
+                 index_memory_mb: int = 2048,
+                 target_recall: float = 0.95):
         """
         Inizializza il sistema RAG con Azure OpenAI
         
@@ -25,6 +33,10 @@ class AzureRAGSystem:
             embedding_deployment: Nome del deployment per il modello di embedding
             gpt_deployment: Nome del deployment per GPT-4
             api_version: Versione API di Azure OpenAI
+            embedding_cache: Cache persistente degli embedding (opzionale)
+            embedding_tpm: Quota di token al minuto del deployment di embedding (opzionale)
+            index_memory_mb: Memoria disponibile per l'indice, usata per scegliere Flat/HNSW/IVF/IVF-PQ
+            target_recall: Recall@10 minimo rispetto alla ricerca esatta per gli indici approssimati
         """
         self.client = AzureOpenAI(
             azure_endpoint=azure_endpoint,
@@ -34,11 +46,20 @@ class AzureRAGSystem:
         
         self.embedding_deployment = embedding_deployment
         self.gpt_deployment = gpt_deployment
+        self.embedding_cache = embedding_cache
+        # Richieste di embedding a batch, in parallelo, nel rispetto della quota TPM
+        self.embedding_client = EmbeddingClient(self.client, embedding_deployment, tokens_per_minute=embedding_tpm)
         
         # initialize the FAISS index and document storage
         self.index = None
         self.documents = []
         self.embeddings = []
+        # True se l'indice è mappato in sola lettura da disco (load_index)
+        self.index_mapped = False
+        # Tipo di indice scelto e recall@k misurato (vedi index_factory.build_index)
+        self.index_report = {}
+        self.index_memory = index_memory_mb * 1024 * 1024
+        self.target_recall = target_recall
         
         # Tokenizer for counting tokens
         self.encoding = tiktoken.encoding_for_model("gpt-4")
@@ -95,6 +116,12 @@ class AzureRAGSystem:
         )
         return response.data[0].embedding
     
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embedding dei chunk non presenti in cache"""
+        return self.embedding_client.embed(
+            texts, on_progress=lambda done, total: print(f"Processati {done}/{total} chunk")
+        )
+    
     def add_documents(self, documents: List[Dict[str, str]], chunk_size: int = 1000):
         """
         Aggiunge documenti al corpus RAG
@@ -121,28 +148,74 @@ class AzureRAGSystem:
         
         # Genera embeddings per tutti i chunk
         print(f"Generazione embeddings per {len(all_chunks)} chunk...")
-        embeddings = []
-        
-        for i, chunk in enumerate(all_chunks):
-            print(f"Processati {i}/{len(all_chunks)} chunk")         
-            embedding = self.get_embedding(chunk['text'])
-            embeddings.append(embedding)
+        embeddings = embed_with_cache(
+            [chunk['text'] for chunk in all_chunks],
+            self._embed_texts,
+            self.embedding_deployment,
+            self.embedding_cache
+        )
         
         # Aggiorna l'indice FAISS
         embeddings_array = np.array(embeddings).astype('float32')
+        faiss.normalize_L2(embeddings_array)  # Normalizza per cosine similarity
         
-        if self.index is None:
-            # Crea nuovo indice
-            dimension = embeddings_array.shape[1]
-            self.index = faiss.IndexFlatIP(dimension)  # Inner product per cosine similarity
-            faiss.normalize_L2(embeddings_array)  # Normalizza per cosine similarity
-        
-        self.index.add(embeddings_array)
         self.documents.extend(all_chunks)
-        self.embeddings.extend(embeddings)
+        if len(self.embeddings):
+            self.embeddings = np.vstack([self.embeddings, embeddings_array])
+        else:
+            self.embeddings = embeddings_array
+        
+        # Tipo di indice in base a numero di vettori e memoria: se cambia si ricostruisce
+        spec = choose_index_spec(len(self.embeddings), embeddings_array.shape[1], self.index_memory)
+        if self.index is None or spec != self.index_report.get('spec'):
+            self.index, self.index_report = build_index(self.embeddings, self.index_memory, self.target_recall)
+            self.index_mapped = False
+        else:
+            if self.index_mapped:
+                # L'indice mappato è in sola lettura: ne serve una copia in memoria
+                self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+                self.index_mapped = False
+            self.index.add(embeddings_array)
         
         print(f"Aggiunti {len(all_chunks)} chunk all'indice. Totale documenti: {len(self.documents)}")
     
+    def save_index(self, directory: str, corpus: Optional[str] = None) -> str:
+        """
+        Salva indice, chunk e matrice degli embedding su disco
+        
+        Args:
+            directory: Cartella dell'indice (contiene le generazioni salvate)
+            corpus: Impronta dei documenti indicizzati (vedi corpus_fingerprint)
+            
+        Returns:
+            Percorso della generazione salvata
+        """
+        if self.index is None:
+            raise ValueError("Nessun indice da salvare. Usa add_documents() prima.")
+        return save_index_store(directory, self.index, self.documents, self.embeddings,
+                                self.embedding_deployment, corpus, self.index_report)
+    
+    def load_index(self, directory: str, corpus: Optional[str] = None) -> bool:
+        """
+        Carica un indice salvato con save_index senza richiamare l'API di embedding.
+        Vettori e indice sono mappati in memoria e condivisi tra i processi.
+        
+        Args:
+            directory: Cartella dell'indice
+            corpus: Se indicata, l'indice viene usato solo se creato dagli stessi documenti
+            
+        Returns:
+            True se l'indice è stato caricato, False se va ricostruito
+        """
+        loaded = load_index_store(directory, self.embedding_deployment, corpus)
+        if loaded is None:
+            return False
+        self.index, self.documents, self.embeddings, manifest = loaded
+        self.index_mapped = True
+        self.index_report = manifest.get('index_report') or {}
+        print(f"Indice caricato: {manifest['count']} chunk del {manifest['created_at']}")
+        return True
+    
     def search(self, query: str, top_k: int = 5) -> List[Tuple[Dict, float]]:
         """
         Cerca i documenti più rilevanti per la query
@@ -166,7 +239,7 @@ class AzureRAGSystem:
         
         results = []
         for idx, score in zip(indices[0], scores[0]):
-            if idx < len(self.documents):
+            if 0 <= idx < len(self.documents):
                 results.append((self.documents[idx], float(score)))
         
         return results
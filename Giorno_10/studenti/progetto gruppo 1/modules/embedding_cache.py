@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Da incrementare se cambia la normalizzazione dei chunk
+CACHE_VERSION = 1
+
+# SQLite limita il numero di parametri per query
+_LOOKUP_CHUNK = 500
+
+
+def embedding_key(model: str, text: str) -> bytes:
+    """Hash di versione, deployment e chunk normalizzato (NFC, spazi compattati)"""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0{model}\0".encode("utf-8"))
+    digest.update(normalized.encode("utf-8"))
+    return digest.digest()
+
+
+class EmbeddingCache:
+    """Cache SQLite degli embedding (blob float32/float16, LRU entro max_bytes)"""
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"dtype non supportato: {dtype}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, dtype TEXT NOT NULL, vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        # Totali aggiornati dai trigger: nessuna SUM sull'intera tabella a ogni put
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS totals ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO totals (id, entries, bytes)"
+            " SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM embeddings;"
+            "CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings BEGIN"
+            " UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size; END;"
+            "CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings BEGIN"
+            " UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size; END;"
+            "CREATE TRIGGER IF NOT EXISTS embeddings_update AFTER UPDATE OF size ON embeddings BEGIN"
+            " UPDATE totals SET bytes = bytes + NEW.size - OLD.size; END;"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_CHUNK):
+                chunk = unique[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                for key, dtype, blob in self._conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ):
+                    found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, items: Sequence[tuple]):
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            blob = np.asarray(vector, dtype=self.dtype).tobytes()
+            rows.append((key, self.dtype.name, blob, len(blob), now))
+        if not rows:
+            return
+        with self._lock:
+            # Upsert invece di INSERT OR REPLACE, che non attiva il trigger di cancellazione
+            self._conn.executemany(
+                "INSERT INTO embeddings (key, dtype, vector, size, last_access)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET dtype = excluded.dtype, vector = excluded.vector,"
+                " size = excluded.size, last_access = excluded.last_access", rows
+            )
+            # Elimina le voci meno recenti oltre il limite
+            total = self._conn.execute("SELECT bytes FROM totals").fetchone()[0]
+            excess = total - self.max_bytes
+            if excess > 0:
+                to_delete = []
+                for key, size in self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_access"):
+                    to_delete.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._conn.executemany("DELETE FROM embeddings WHERE key = ?", to_delete)
+            self._conn.commit()
+
+
+def embed_with_cache(texts: Sequence[str], embed: Callable[[List[str]], List[List[float]]],
+                     model: str, cache: Optional[EmbeddingCache]) -> List[List[float]]:
+    """Embedding nello stesso ordine dei testi; embed viene chiamato solo per i chunk nuovi"""
+    if cache is None:
+        return embed(list(texts))
+    keys = [embedding_key(model, text) for text in texts]
+    found = cache.get_many(keys)
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+    if missing:
+        vectors = embed(list(missing.values()))
+        cache.put_many(list(zip(missing, vectors)))
+        for key, vector in zip(missing, vectors):
+            found[key] = np.asarray(vector, dtype=np.float32)
+    return [found[key].tolist() for key in keys]
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+# Da incrementare se cambia il contenuto o il formato dei file salvati
+FORMAT_VERSION = 1
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.json"
+
+
+def corpus_fingerprint(documents: List[Dict[str, str]]) -> str:
+    """Hash di titoli e contenuti dei documenti (indipendente dall'ordine)"""
+    digest = hashlib.sha256()
+    for title, content in sorted((doc['title'], doc['content']) for doc in documents):
+        digest.update(f"{title}\0{content}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_flags() -> int:
+    """Flag di lettura FAISS per mappare in memoria i dati dell'indice, se supportato"""
+    flags = getattr(faiss, "IO_FLAG_MMAP", 0) | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+    # Le versioni recenti mappano anche i codici degli indici flat
+    return flags | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+
+def save_index_store(directory: str, index, chunks: List[Dict], vectors: np.ndarray,
+                     embedding_deployment: str, corpus: Optional[str] = None,
+                     index_report: Optional[Dict] = None) -> str:
+    """
+    Salva indice FAISS, metadati dei chunk e matrice degli embedding in una
+    nuova generazione (directory gen-*) e la rende corrente riscrivendo il
+    file CURRENT in modo atomico. Chi sta leggendo la generazione precedente
+    non viene interrotto.
+
+    Returns:
+        Percorso della generazione salvata
+    """
+    os.makedirs(directory, exist_ok=True)
+    generation = f"gen-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+    path = os.path.join(directory, generation)
+    os.makedirs(path)
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    faiss.write_index(index, os.path.join(path, INDEX_FILE))
+    np.save(os.path.join(path, VECTORS_FILE), vectors)
+    with open(os.path.join(path, CHUNKS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(chunks, f, ensure_ascii=False)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "embedding_deployment": embedding_deployment,
+        "index_type": type(index).__name__,
+        "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "count": len(chunks),
+        "dtype": "float32",
+        "corpus": corpus,
+        "index_report": index_report,
+    }
+    with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    tmp = os.path.join(directory, CURRENT_FILE + ".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(generation)
+    os.replace(tmp, os.path.join(directory, CURRENT_FILE))
+
+    # Elimina le generazioni vecchie tranne la precedente (può essere ancora in uso)
+    generations = sorted(name for name in os.listdir(directory) if name.startswith("gen-"))
+    for name in generations[:-2]:
+        if name != generation:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    print(f"Indice salvato in {path} ({len(chunks)} chunk)")
+    return path
+
+
+def load_index_store(directory: str, embedding_deployment: str,
+                     corpus: Optional[str] = None) -> Optional[Tuple[object, List[Dict], np.ndarray, Dict]]:
+    """
+    Carica la generazione corrente salvata con save_index_store.
+
+    La matrice degli embedding è letta con np.load(mmap_mode='r') e l'indice
+    con i flag di memory mapping di FAISS: le pagine restano nella cache del
+    sistema operativo e sono condivise tra i processi che aprono lo stesso indice.
+
+    Returns:
+        (indice, chunk, vettori, manifest) oppure None se l'indice manca o non
+        è compatibile (versione del formato, deployment o corpus diversi)
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding='utf-8') as f:
+            path = os.path.join(directory, f.read().strip())
+        with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        print(f"Indice in {path} con formato {manifest.get('format_version')}, atteso {FORMAT_VERSION}: da ricostruire")
+        return None
+    if manifest.get("embedding_deployment") != embedding_deployment:
+        print(f"Indice creato con {manifest.get('embedding_deployment')}, non {embedding_deployment}: da ricostruire")
+        return None
+    if corpus is not None and manifest.get("corpus") != corpus:
+        print("Documenti cambiati rispetto all'indice salvato: da ricostruire")
+        return None
+
+    index_path = os.path.join(path, INDEX_FILE)
+    try:
+        index = faiss.read_index(index_path, _read_flags())
+    except RuntimeError:
+        # Versioni di FAISS senza memory mapping per questo tipo di indice
+        index = faiss.read_index(index_path)
+    vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode='r')
+    with open(os.path.join(path, CHUNKS_FILE), encoding='utf-8') as f:
+        chunks = json.load(f)
+
+    if not (index.ntotal == len(chunks) == vectors.shape[0] == manifest.get("count")):
+        print(f"Indice in {path} incoerente: da ricostruire")
+        return None
+    return index, chunks, vectors, manifest
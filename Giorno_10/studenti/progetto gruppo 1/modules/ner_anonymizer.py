@@ -2,6 +2,12 @@ import re
 from transformers import BertTokenizerFast, BertForTokenClassification, pipeline
 from config import *
 
+# Streaming: characters per block (kept under the 512-token model context)
+# and look-ahead read past each block so no entity is split at the edge
+BLOCK_CHARS = 1500
+OVERLAP_CHARS = 200
+READ_CHARS = 64 * 1024
+
 class NERAnonymizer:
     def __init__(self, model_path: str):
         # NER model initialization
@@ -22,30 +28,82 @@ class NERAnonymizer:
     def extract_entities(self, text: str) -> list[dict]:
         return self.ner_pipeline(text)
 
+    def find_replacements(self, text: str) -> list[tuple[int, int, str]]:
+        # Step 1: NER (person names), source 0
+        found = [
+            (ent["start"], ent["end"], 0, "[NAME]")
+            for ent in self.extract_entities(text)
+            if ent["entity_group"] == "PER"
+        ]
+        # Step 2: Regex, sources 1.. in pattern order
+        for source, (pattern, replacement) in enumerate(self.patterns, start=1):
+            found.extend((m.start(), m.end(), source, replacement) for m in pattern.finditer(text))
+
+        # Keep the leftmost of overlapping matches; at the same start NER wins, then pattern order
+        replacements = []
+        for start, end, _, replacement in sorted(found, key=lambda r: (r[0], r[2])):
+            if replacements and start < replacements[-1][1]:
+                continue
+            replacements.append((start, end, replacement))
+        return replacements
+
+    def apply_replacements(self, text: str, replacements: list[tuple[int, int, str]]) -> str:
+        parts, cursor = [], 0
+        for start, end, replacement in replacements:
+            parts.append(text[cursor:start])
+            parts.append(replacement)
+            cursor = end
+        parts.append(text[cursor:])
+        return "".join(parts)
+
     def anonymize_text(self, text: str) -> str:
-        # Step 1: NER
-        ents = self.extract_entities(text)
-        ents_sorted = sorted(ents, key=lambda e: e["end"], reverse=True)
-        for ent in ents_sorted:
-            tag = f"[{ent['entity_group']}]"
-            if tag == "[PER]":
-                text = text[:ent["start"]] + "[NAME]" + text[ent["end"]:]
+        return self.apply_replacements(text, self.find_replacements(text))
 
-        # Step 2: Regex
-        for pattern, replacement in self.patterns:
-            text = pattern.sub(replacement, text)
+    def anonymize_stream(self, infile, block_chars: int = BLOCK_CHARS, overlap_chars: int = OVERLAP_CHARS):
+        """
+        Reads infile in paragraph-aligned blocks and yields the anonymized text
+        block by block. Each block is analysed with overlap_chars of look-ahead:
+        if an entity crosses the cut, the cut is moved to its end.
+        Memory stays bounded by block_chars + overlap_chars + READ_CHARS.
+        """
+        window_chars = block_chars + overlap_chars
+        buffer, eof = "", False
 
-        return text
+        while True:
+            while not eof and len(buffer) < window_chars:
+                data = infile.read(READ_CHARS)
+                eof = not data
+                buffer += data
+            if not buffer:
+                return
 
-    def anonymize_txt_file(self, input_path: str, output_path: str):
-        with open(input_path, "r", encoding="utf-8") as infile:
-            text = infile.read()
+            window = buffer[:window_chars]
+            if eof and len(buffer) <= window_chars:
+                cut = len(buffer)
+            else:
+                cut = block_chars
+                for sep in ("\n\n", "\n", " "):
+                    pos = window.rfind(sep, 1, block_chars)
+                    if pos != -1:
+                        cut = pos + len(sep)
+                        break
 
-        print(f"Document read ({len(text)} characters)")
+            replacements = self.find_replacements(window) if window.strip() else []
+            for start, end, _ in replacements:
+                if start < cut < end:
+                    cut = end
+            block_replacements = [r for r in replacements if r[1] <= cut]
 
-        anon_text = self.anonymize_text(text)
+            yield self.apply_replacements(buffer[:cut], block_replacements)
+            buffer = buffer[cut:]
 
-        with open(output_path, "w", encoding="utf-8") as outfile:
-            outfile.write(anon_text)
+    def anonymize_txt_file(self, input_path: str, output_path: str):
+        # Streaming: the document is never loaded whole in memory
+        total = 0
+        with open(input_path, "r", encoding="utf-8") as infile, \
+                open(output_path, "w", encoding="utf-8") as outfile:
+            for block in self.anonymize_stream(infile):
+                outfile.write(block)
+                total += len(block)
 
-        print(f"Anonymized document saved: {output_path}")
+        print(f"Anonymized document saved: {output_path} ({total} characters)")
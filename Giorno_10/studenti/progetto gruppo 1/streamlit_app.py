@@ -1,6 +1,9 @@
 import os
 import streamlit as st
 from modules.AzureRag import AzureRAGSystem 
+from modules.embedding_cache import EmbeddingCache
+from modules.index_store import corpus_fingerprint
+from config import EMBEDDING_CACHE_PATH, INDEX_PATH
 from pathlib import Path
 import shutil
 import tempfile
@@ -22,8 +25,26 @@ GPT_DEPLOYMENT_RAG = os.getenv("GPT_DEPLOYMENT_RAG")
 if "uploaded_files" not in st.session_state:
     st.session_state.uploaded_files = []
 
+def create_pipeline() -> AzureRAGSystem:
+    return AzureRAGSystem(
+        azure_endpoint=AZURE_ENDPOINT_RAG,
+        api_key=API_KEY_RAG,
+        embedding_deployment=EMBEDDING_DEPLOYMENT_RAG,
+        gpt_deployment=GPT_DEPLOYMENT_RAG,
+        embedding_cache=EmbeddingCache(str(EMBEDDING_CACHE_PATH)),
+        embedding_tpm=int(os.getenv("EMBEDDING_TPM_RAG", "0")) or None,
+        index_memory_mb=int(os.getenv("INDEX_MEMORY_MB_RAG", "2048"))
+    )
+
 if "pipeline" not in st.session_state:
     st.session_state.pipeline = None
+    # warm start: the last saved index is memory-mapped, no embeddings recomputed
+    try:
+        pipeline = create_pipeline()
+        if pipeline.load_index(str(INDEX_PATH)):
+            st.session_state.pipeline = pipeline
+    except Exception as e:
+        print(f"[WARNING] Saved index not loaded: {e}")
 
 # === CONFIGURAZIONE SIDEBAR ===
 st.sidebar.title("📂 Gestione Documenti")
@@ -51,12 +72,7 @@ for file_path in st.session_state.uploaded_files:
 if st.sidebar.button("🔧 Inizializza RAG"):
     if st.session_state.uploaded_files:
         with st.spinner("🔍 Inizializzazione sistema RAG..."):
-            st.session_state.pipeline = AzureRAGSystem(
-                azure_endpoint=AZURE_ENDPOINT_RAG,
-                api_key=API_KEY_RAG,
-                embedding_deployment=EMBEDDING_DEPLOYMENT_RAG,
-                gpt_deployment=GPT_DEPLOYMENT_RAG
-            )
+            st.session_state.pipeline = create_pipeline()
 
             # load documents into the pipeline
             documents = []
@@ -65,7 +81,11 @@ if st.sidebar.button("🔧 Inizializza RAG"):
                     content = f.read()
                 documents.append({"title": file_path.name, "content": content})
 
-            st.session_state.pipeline.add_documents(documents)
+            # same documents as the saved index: no embeddings recomputed
+            corpus = corpus_fingerprint(documents)
+            if not st.session_state.pipeline.load_index(str(INDEX_PATH), corpus):
+                st.session_state.pipeline.add_documents(documents)
+                st.session_state.pipeline.save_index(str(INDEX_PATH), corpus)
 
         st.sidebar.success("✅ Pipeline RAG inizializzata con successo!")
     else:
@@ -85,6 +105,11 @@ st.sidebar.title("💬 Gestione Chat")
 
 # show chat summary if pipeline is initialized
 if st.session_state.pipeline:
+    report = st.session_state.pipeline.index_report
+    if report.get("spec"):
+        st.sidebar.caption(
+            f"Indice {report['spec']} su {st.session_state.pipeline.index.ntotal} chunk, recall@{report['k']} {report['recall']:.2f}"
+        )
     chat_summary = st.session_state.pipeline.get_chat_summary()
     if chat_summary.get("total_exchanges", 0) > 0:
         st.sidebar.write(f"Scambi: {chat_summary['total_exchanges']}")
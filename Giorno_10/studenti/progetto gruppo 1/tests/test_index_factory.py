@@ -0,0 +1,59 @@
+"""
+Test per la scelta e la taratura dell'indice FAISS.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from modules import index_factory
+from modules.index_factory import build_index, choose_index_spec, measure_recall, tuning_queries
+
+
+def random_vectors(n, d, seed=0):
+    """Vettori normalizzati senza struttura: il caso più difficile per IVF"""
+    vectors = np.random.default_rng(seed).normal(size=(n, d))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+class TestIndexFactory:
+    """Test scelta del tipo di indice e recall misurato"""
+
+    def test_choose_index_spec(self):
+        """Test tipo di indice per numero di vettori e budget di memoria"""
+        d = 64
+        n = 100_000
+        vector_bytes = n * d * 4
+
+        assert choose_index_spec(1000, d, 10**9) == "Flat"
+        assert choose_index_spec(n, d, 10**9) == "HNSW32"
+        assert choose_index_spec(n, d, vector_bytes + 1000) == "IVF1024,Flat"
+        assert choose_index_spec(n, d, n * 40) == "IVF1024,PQ32"
+
+    def test_tuning_queries_are_not_indexed_vectors(self):
+        """Test che le query di taratura siano vicine al corpus ma mai identiche"""
+        vectors = random_vectors(500, 32)
+        queries = tuning_queries(vectors, 100, np.random.default_rng(0))
+
+        similarity = queries @ vectors.T
+        assert np.allclose(np.linalg.norm(queries, axis=1), 1.0, atol=1e-5)
+        assert similarity.max() < 0.99
+        assert np.all(similarity.max(axis=1) > 0.8)
+
+    @pytest.mark.parametrize("memory_budget, prefix", [(4000 * 32 * 4 + 1000, "IVF"), (10**9, "HNSW")])
+    def test_build_index_reaches_target(self, monkeypatch, memory_budget, prefix):
+        """Test che il recall su query nuove raggiunga l'obiettivo con il parametro scelto"""
+        monkeypatch.setattr(index_factory, "FLAT_MAX_VECTORS", 1000)
+        vectors = random_vectors(4000, 32)
+
+        index, report = build_index(vectors, memory_budget, target_recall=0.9)
+
+        assert report["spec"].startswith(prefix)
+        assert report["target_reached"]
+        held_out = tuning_queries(vectors, 200, np.random.default_rng(1))
+        assert measure_recall(index, vectors, held_out)["recall"] >= 0.9
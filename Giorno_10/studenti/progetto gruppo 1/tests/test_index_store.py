@@ -0,0 +1,105 @@
+"""
+Test per il salvataggio e il caricamento dell'indice su disco.
+"""
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from modules import index_store
+from modules.index_store import CURRENT_FILE, MANIFEST_FILE, corpus_fingerprint, load_index_store, save_index_store
+
+DOCUMENTS = [{"title": "fattura_1", "content": "Totale 100 euro"}, {"title": "fattura_2", "content": "Totale 200 euro"}]
+
+
+def flat_store(n=4, d=8, seed=0):
+    """Indice Flat piccolo con chunk e vettori coerenti"""
+    vectors = np.random.default_rng(seed).normal(size=(n, d)).astype(np.float32)
+    index = faiss.IndexFlatIP(d)
+    index.add(vectors)
+    chunks = [{"title": f"doc_{i}", "content": f"chunk {i}"} for i in range(n)]
+    return index, chunks, vectors
+
+
+class TestIndexStore:
+    """Test round trip delle generazioni salvate"""
+
+    def test_round_trip(self, tmp_path):
+        """Test che indice, chunk e vettori tornino uguali a quelli salvati"""
+        index, chunks, vectors = flat_store()
+        corpus = corpus_fingerprint(DOCUMENTS)
+        save_index_store(str(tmp_path), index, chunks, vectors, "ada", corpus)
+
+        loaded_index, loaded_chunks, loaded_vectors, manifest = load_index_store(str(tmp_path), "ada", corpus)
+
+        assert loaded_index.ntotal == 4
+        assert loaded_chunks == chunks
+        assert np.array_equal(loaded_vectors, vectors)
+        assert manifest["count"] == 4 and manifest["dimension"] == 8
+        _, found = loaded_index.search(vectors[:1], 1)
+        assert found[0][0] == 0
+
+    def test_generation_switch(self, tmp_path):
+        """Test che CURRENT punti all'ultima generazione e resti solo la precedente"""
+        paths = []
+        for n in (2, 3, 5):
+            paths.append(save_index_store(str(tmp_path), *flat_store(n), "ada"))
+
+        with open(tmp_path / CURRENT_FILE, encoding='utf-8') as f:
+            assert f.read() == os.path.basename(paths[-1])
+        assert load_index_store(str(tmp_path), "ada")[0].ntotal == 5
+        assert sorted(name for name in os.listdir(tmp_path) if name.startswith("gen-")) == [
+            os.path.basename(path) for path in paths[1:]
+        ]
+        # La generazione precedente resta leggibile per chi l'ha già aperta
+        assert os.path.exists(os.path.join(paths[1], index_store.INDEX_FILE))
+
+    def test_missing_store(self, tmp_path):
+        """Test che una directory senza indice restituisca None"""
+        assert load_index_store(str(tmp_path / "vuota"), "ada") is None
+
+    def test_deployment_mismatch(self, tmp_path):
+        """Test che un indice di un altro deployment non venga caricato"""
+        save_index_store(str(tmp_path), *flat_store(), "ada")
+
+        assert load_index_store(str(tmp_path), "text-embedding-3-small") is None
+
+    def test_corpus_mismatch(self, tmp_path):
+        """Test che un indice di documenti diversi non venga caricato"""
+        save_index_store(str(tmp_path), *flat_store(), "ada", corpus_fingerprint(DOCUMENTS))
+        changed = DOCUMENTS + [{"title": "nota_di_credito", "content": "Totale -50 euro"}]
+
+        assert load_index_store(str(tmp_path), "ada", corpus_fingerprint(changed)) is None
+        assert load_index_store(str(tmp_path), "ada", corpus_fingerprint(DOCUMENTS[::-1])) is not None
+
+    def test_format_mismatch(self, tmp_path, monkeypatch):
+        """Test che un formato diverso da FORMAT_VERSION richieda la ricostruzione"""
+        save_index_store(str(tmp_path), *flat_store(), "ada")
+        monkeypatch.setattr(index_store, "FORMAT_VERSION", index_store.FORMAT_VERSION + 1)
+
+        assert load_index_store(str(tmp_path), "ada") is None
+
+    def test_count_mismatch(self, tmp_path):
+        """Test che un manifest con conteggio diverso da ntotal venga scartato"""
+        path = save_index_store(str(tmp_path), *flat_store(), "ada")
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest["count"] = 5
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+        assert load_index_store(str(tmp_path), "ada") is None
+
+    def test_chunks_mismatch(self, tmp_path):
+        """Test che chunk e vettori non allineati all'indice vengano scartati"""
+        index, chunks, vectors = flat_store()
+        save_index_store(str(tmp_path), index, chunks[:3], vectors, "ada")
+
+        assert load_index_store(str(tmp_path), "ada") is None
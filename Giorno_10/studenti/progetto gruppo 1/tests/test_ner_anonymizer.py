@@ -0,0 +1,47 @@
+"""
+Test per la scelta tra entità NER e regex sovrapposte.
+"""
+import sys
+import os
+import re
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+pytest.importorskip("transformers")
+
+from modules.ner_anonymizer import NERAnonymizer
+
+
+def anonymizer(entities, patterns):
+    """Anonimizzatore senza modello: la pipeline restituisce entities"""
+    anon = NERAnonymizer.__new__(NERAnonymizer)
+    anon.ner_pipeline = lambda text: entities
+    anon.patterns = [(re.compile(pattern), replacement) for pattern, replacement in patterns]
+    return anon
+
+
+class TestFindReplacements:
+    """Test ordine delle sostituzioni sovrapposte"""
+
+    def test_same_start_ner_wins(self):
+        """Test che a parità di inizio vinca il NER anche se la regex è più lunga"""
+        text = "Rossi SRL paga"
+        anon = anonymizer([{"entity_group": "PER", "start": 0, "end": 5}], [(r"Rossi SRL", "[ORG]")])
+
+        assert anon.find_replacements(text) == [(0, 5, "[NAME]")]
+        assert anon.anonymize_text(text) == "[NAME] SRL paga"
+
+    def test_same_start_pattern_order(self):
+        """Test che tra regex con lo stesso inizio vinca la prima della lista"""
+        anon = anonymizer([], [(r"\d{4}", "[A]"), (r"\d{8}", "[B]")])
+
+        assert anon.find_replacements("12345678") == [(0, 4, "[A]"), (4, 8, "[A]")]
+
+    def test_leftmost_wins(self):
+        """Test che tra match sovrapposti con inizio diverso vinca il più a sinistra"""
+        text = "Mario IT60X0542811101000000123456"
+        anon = anonymizer([{"entity_group": "PER", "start": 6, "end": 10}], [(r"Mario IT", "[X]")])
+
+        assert anon.find_replacements(text) == [(0, 8, "[X]")]
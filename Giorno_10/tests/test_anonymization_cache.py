@@ -0,0 +1,156 @@
+"""
+Test per la cache persistente di anonimizzazione.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import sqlite3
+import pytest
+from unittest.mock import Mock
+from config import REGEX_PATTERNS
+from anonymization_cache import AnonymizationCache, cache_key
+from vault import Fernet
+from anonymizer import NERAnonimizer
+from test_anonymizer import fake_ner
+
+@pytest.fixture
+def key():
+    """Chiave Fernet di test"""
+    return Fernet.generate_key()
+
+@pytest.fixture
+def cache(tmp_path, key):
+    """Cache su file temporaneo"""
+    return AnonymizationCache(str(tmp_path / "cache.sqlite"), key)
+
+class TestAnonymizationCache:
+    """Test classe AnonymizationCache"""
+
+    def test_key_depends_on_content_model_and_patterns(self):
+        """Test che la chiave cambi con testo, modello e pattern"""
+        key = cache_key("testo", "modello", REGEX_PATTERNS)
+
+        assert key == cache_key("testo", "modello", REGEX_PATTERNS)
+        assert key != cache_key("testo2", "modello", REGEX_PATTERNS)
+        assert key != cache_key("testo", "altro", REGEX_PATTERNS)
+        assert key != cache_key("testo", "modello", {"EMAIL": REGEX_PATTERNS["EMAIL"]})
+
+    def test_roundtrip_and_counters(self, cache):
+        """Test salvataggio, lettura e contatori hit/miss"""
+        assert cache.get("k") is None
+        cache.put("k", "Ciao [PER_0]", {"[PER_0]": "Mario"}, [(5, 10, "PER", 0.9, "[PER_0]")])
+
+        assert cache.get("k") == ("Ciao [PER_0]", {"[PER_0]": "Mario"}, [[5, 10, "PER", 0.9, "[PER_0]"]])
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+        assert stats["hit_rate"] == 0.5
+
+    def test_persists_across_instances(self, cache, key):
+        """Test che i risultati sopravvivano a un riavvio"""
+        cache.put("k", "testo", {}, [])
+
+        reopened = AnonymizationCache(cache.path, key)
+
+        assert reopened.get("k") == ("testo", {}, [])
+
+    def test_entities_encrypted_on_disk(self, cache):
+        """Test che i valori originali non compaiano in chiaro nel file"""
+        cache.put("k", "Ciao [PER_0]", {"[PER_0]": "Mario Rossi"}, [(5, 16, "PER", 0.9, "[PER_0]")])
+        cache._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        with open(cache.path, "rb") as f:
+            assert b"Mario Rossi" not in f.read()
+        assert cache.get("k")[1] == {"[PER_0]": "Mario Rossi"}
+
+    def test_other_key_is_a_miss(self, cache):
+        """Test che le voci cifrate con un'altra chiave siano trattate come assenti"""
+        cache.put("k", "Ciao [PER_0]", {"[PER_0]": "Mario"}, [])
+
+        other = AnonymizationCache(cache.path, Fernet.generate_key())
+
+        assert other.get("k") is None
+        assert other.stats()["misses"] == 1
+
+    def test_plaintext_entries_are_dropped(self, tmp_path, key):
+        """Test che le voci in chiaro delle versioni precedenti vengano cancellate"""
+        path = str(tmp_path / "cache.sqlite")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE entries (key TEXT PRIMARY KEY, masked TEXT NOT NULL, entities TEXT NOT NULL,"
+            " spans TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO entries VALUES ('k', 'Ciao [PER_0]', '{\"[PER_0]\": \"Mario\"}', '[]', 40, 0)")
+        conn.commit()
+        conn.close()
+
+        cache = AnonymizationCache(path, key)
+
+        assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction_by_size(self, tmp_path, key):
+        """Test che oltre il limite vengano eliminate le voci meno recenti"""
+        # Ogni voce: 90 caratteri, mappa vuota cifrata (100 byte) e span "[]"
+        cache = AnonymizationCache(str(tmp_path / "cache.sqlite"), key, max_bytes=3 * 192)
+        for key in ("a", "b", "c"):
+            cache.put(key, key * 90, {}, [])
+
+        # "a" viene letta, quindi la meno recente diventa "b"
+        assert cache.get("a") is not None
+        cache.put("d", "d" * 90, {}, [])
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("d") is not None
+        assert cache.stats()["bytes"] <= 3 * 192
+    
+    def test_running_totals_match_table(self, cache):
+        """Test che i totali tenuti dai trigger coincidano con la tabella"""
+        cache.put("a", "x" * 10, {}, [])
+        cache.put("b", "y" * 20, {}, [])
+        cache.put("a", "z" * 5, {}, [])   # Sovrascrittura con dimensione diversa
+        cache.clear()
+        cache.put("c", "w" * 7, {}, [])
+
+        conn = cache._connection()
+        expected = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        assert (cache.stats()["entries"], cache.stats()["bytes"]) == tuple(expected)
+
+class TestAnonymizerWithCache:
+    """Test integrazione della cache in NERAnonimizer"""
+
+    def test_anonymize_uses_cache(self, cache, sample_text, mock_streamlit):
+        """Test che la seconda chiamata non esegua il modello"""
+        anonymizer = NERAnonimizer(cache=cache)
+        anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+
+        first = anonymizer.anonymize_with_spans(sample_text)
+        second = anonymizer.anonymize_with_spans(sample_text)
+
+        assert first == second
+        assert anonymizer._ner_pipe.call_count == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_batch_only_runs_missing_texts(self, cache, mock_streamlit):
+        """Test che nel batch passino dal modello solo i testi non in cache"""
+        anonymizer = NERAnonimizer(cache=cache)
+        anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+        anonymizer.anonymize("Saluti da Mario Rossi")
+        anonymizer._ner_pipe.reset_mock()
+
+        results = anonymizer.anonymize_batch(["Saluti da Mario Rossi", "Mario Rossi ringrazia"])
+
+        assert results[0][0] == "Saluti da [PER_0]"
+        assert results[1][0] == "[PER_0] ringrazia"
+        assert [call.args[0] for call in anonymizer._ner_pipe.call_args_list] == [["Mario Rossi ringrazia"]]
+
+    def test_no_cache_without_ner_model(self, cache, mock_streamlit):
+        """Test che un risultato solo-regex (modello non caricato) non venga salvato"""
+        anonymizer = NERAnonimizer(cache=cache)
+        anonymizer._load_ner_pipe = Mock(side_effect=RuntimeError("offline"))
+
+        anonymizer.anonymize("Scrivi a mario.rossi@example.com")
+
+        assert cache.stats()["entries"] == 0
@@ -8,7 +8,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..',
 
 import pytest
 from unittest.mock import Mock, patch
-from anonymizer import NERAnonimizer
+from anonymizer import NERAnonimizer, Span, resolve_spans, render_spans, segment_bounds, split_segments
+from config import Config
 
 class TestNERAnonimizer:
     """Test classe NERAnonimizer"""
@@ -275,4 +276,215 @@ class TestAnonymizerEdgeCases:
         iban_found = any('IBAN' in k for k in entities.keys())
         
         assert email_found
-        assert iban_found
\ No newline at end of file
+        assert iban_found
+
+class TestSpanEngine:
+    """Test motore di mascheramento basato su span"""
+    
+    def test_resolve_spans_overlap(self):
+        """Test risoluzione sovrapposizioni per priorità e lunghezza"""
+        candidates = [
+            (Span(10, 30, 'IBAN', 1.0), 0),
+            (Span(15, 25, 'CARD', 1.0), 0),   # Contenuto nell'IBAN, più corto
+            (Span(0, 12, 'PER', 0.9), 1),     # NER sovrapposto a regex: resta 0-10
+            (Span(40, 45, 'ORG', 0.8), 1)
+        ]
+        
+        spans = resolve_spans(candidates)
+        
+        assert [(s.start, s.end, s.label) for s in spans] == [
+            (0, 10, 'PER'), (10, 30, 'IBAN'), (40, 45, 'ORG')
+        ]
+        assert [s.placeholder for s in spans] == ['[PER_0]', '[IBAN_1]', '[ORG_2]']
+    
+    def test_resolve_spans_partial_overlap_keeps_remainder(self):
+        """Test che la parte non coperta di uno span perdente resti mascherata"""
+        text = "Mario Rossi mario.rossi@example.com"
+        email_start = text.index("mario.rossi@")
+        candidates = [
+            (Span(email_start, len(text), 'EMAIL', 1.0), 1),
+            (Span(0, email_start + 11, 'PER', 0.9), 2),          # NER su nome ed email
+            (Span(email_start - 6, email_start + 3, 'LOC', 0.6), 2)  # Tutto coperto dopo PER
+        ]
+        
+        spans = resolve_spans(candidates, text)
+        
+        assert [(s.start, s.end, s.label) for s in spans] == [
+            (0, 11, 'PER'), (email_start, len(text), 'EMAIL')
+        ]
+        masked = render_spans(text, spans)
+        assert masked == "[PER_0] [EMAIL_1]"
+        assert "Mario" not in masked and "Rossi" not in masked
+    
+    def test_resolve_spans_winner_inside_loser(self):
+        """Test che un vincitore interno lasci mascherati prefisso e suffisso del perdente"""
+        text = "Sig. Mario 3331234567 Rossi"
+        phone = text.index("333")
+        candidates = [
+            (Span(phone, phone + 10, 'PHONE', 1.0), 1),
+            (Span(5, len(text), 'PER', 0.8), 2)
+        ]
+        
+        spans = resolve_spans(candidates, text)
+        
+        assert [(s.start, s.end, s.label) for s in spans] == [
+            (5, 10, 'PER'), (phone, phone + 10, 'PHONE'), (phone + 11, len(text), 'PER')
+        ]
+        assert render_spans(text, spans) == "Sig. [PER_0] [PHONE_1] [PER_2]"
+
+    def test_resolve_spans_many_overlaps(self):
+        """Test catena di span sovrapposti: ogni perdente tiene solo la parte scoperta"""
+        n = 5000
+        candidates = [(Span(i * 10, i * 10 + 15, 'PER', 0.9), i % 2) for i in range(n)]
+
+        spans = resolve_spans(candidates)
+
+        # I pari (priorità 0) restano interi, i dispari tra due pari perdono entrambi i bordi
+        assert len(spans) == n
+        assert spans[0] == Span(0, 15, 'PER', 0.9, '[PER_0]')
+        assert (spans[1].start, spans[1].end) == (15, 20)
+        assert all(a.end <= b.start for a, b in zip(spans, spans[1:]))
+
+    def test_render_spans_single_pass(self):
+        """Test riscrittura del testo dagli span"""
+        text = "Mario Rossi lavora in ACME SpA"
+        spans = [
+            Span(0, 11, 'PER', 0.9, '[PER_0]'),
+            Span(22, 30, 'ORG', 0.8, '[ORG_1]')
+        ]
+        
+        assert render_spans(text, spans) == "[PER_0] lavora in [ORG_1]"
+        assert render_spans(text, []) == text
+    
+    def test_anonymize_with_spans(self, sample_text, mock_ner_pipeline, mock_streamlit):
+        """Test che gli span restituiti siano coerenti con testo e mappa"""
+        anonymizer = NERAnonimizer()
+        anonymizer._ner_pipe = mock_ner_pipeline
+        
+        anonymized_text, entities, spans = anonymizer.anonymize_with_spans(sample_text)
+        
+        assert len(spans) == len(entities)
+        assert render_spans(sample_text, spans) == anonymized_text
+        for span in spans:
+            assert entities[span.placeholder] == sample_text[span.start:span.end]
+        
+        # Gli span sono ordinati e disgiunti
+        for prev, curr in zip(spans, spans[1:]):
+            assert prev.end <= curr.start
+    
+    def test_regex_and_ner_never_overlap(self, mock_streamlit):
+        """Test che NER non riscriva un valore già coperto da regex"""
+        anonymizer = NERAnonimizer()
+        text = "Scrivere a mario.rossi@example.com"
+        mock_pipe = Mock()
+        mock_pipe.return_value = [
+            {'entity_group': 'PER', 'score': 0.95, 'start': 11, 'end': 22, 'word': 'mario.rossi'}
+        ]
+        anonymizer._ner_pipe = mock_pipe
+        
+        anonymized_text, entities = anonymizer.anonymize(text)
+        
+        assert anonymized_text == "Scrivere a [EMAIL_0]"
+        assert entities == {'[EMAIL_0]': 'mario.rossi@example.com'}
+
+def fake_ner(inputs, **kwargs):
+    """Pipeline NER finta: riconosce 'Mario Rossi' come PER"""
+    def find(text):
+        entities = []
+        start = text.find('Mario Rossi')
+        while start != -1:
+            entities.append({'entity_group': 'PER', 'score': 0.9,
+                             'start': start, 'end': start + 11, 'word': 'Mario Rossi'})
+            start = text.find('Mario Rossi', start + 1)
+        return entities
+    if isinstance(inputs, list):
+        return [find(text) for text in inputs]
+    return find(inputs)
+
+class TestBatchAnonymization:
+    """Test anonimizzazione a batch"""
+    
+    def test_split_segments_offsets(self):
+        """Test che i segmenti ricostruiscano il testo con offset corretti"""
+        text = "Primo paragrafo.\n\nSecondo paragrafo molto lungo " * 20
+        
+        segments = split_segments(text, 100)
+        
+        assert all(len(segment) <= 100 for _, segment in segments)
+        for offset, segment in segments:
+            assert text[offset:offset + len(segment)] == segment
+        assert "".join(segment for _, segment in segments) == text
+    
+    def test_split_segments_overlap(self):
+        """Test che con la sovrapposizione ogni taglio cada dentro il segmento successivo"""
+        text = " ".join(f"parola{i}" for i in range(60))
+
+        segments = split_segments(text, 100, 30)
+        bounds = segment_bounds(segments)
+
+        for (offset, segment), (next_offset, _) in zip(segments, segments[1:]):
+            assert text[offset:offset + len(segment)] == segment
+            assert offset < next_offset < offset + len(segment)
+            assert text[next_offset - 1] == " "
+        assert bounds[0][0] == 0 and bounds[-1][1] == len(text)
+        assert all(a[1] == b[0] for a, b in zip(bounds, bounds[1:]))
+
+    def test_entity_across_segment_cut(self, mock_streamlit, monkeypatch):
+        """Test che un nome a cavallo di un taglio venga trovato intero, una sola volta"""
+        monkeypatch.setattr(Config, 'NER_SEGMENT_CHARS', 100)
+        monkeypatch.setattr(Config, 'NER_SEGMENT_OVERLAP', 40)
+        anonymizer = NERAnonimizer()
+        anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+        text = "x" * 50 + " " + "y" * 40 + " Mario Rossi scrive. " + "z " * 60
+        assert split_segments(text, 100)[0][1].endswith("Mario ")
+
+        single = anonymizer.anonymize(text)
+        batch = anonymizer.anonymize_batch([text])[0]
+
+        assert single == batch[:2]
+        assert single[1] == {"[PER_0]": "Mario Rossi"}
+        assert single[0].count("[PER_") == 1
+
+    def test_cache_key_includes_segmentation(self, mock_streamlit, monkeypatch):
+        """Test che la chiave di cache cambi con i parametri di segmentazione"""
+        anonymizer = NERAnonimizer()
+        key = anonymizer._cache_key("testo")
+
+        monkeypatch.setattr(Config, 'NER_SEGMENT_OVERLAP', 0)
+        assert anonymizer._cache_key("testo") != key
+
+    def test_batch_matches_single(self, sample_text, mock_streamlit):
+        """Test che il batch dia lo stesso risultato della chiamata singola"""
+        anonymizer = NERAnonimizer()
+        anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+        texts = [sample_text, "Saluti da Mario Rossi", "", "Nessuna entità qui"]
+        
+        results = anonymizer.anonymize_batch(texts, batch_size=2)
+        
+        assert len(results) == len(texts)
+        for text, (anonymized_text, entities, spans) in zip(texts, results):
+            assert (anonymized_text, entities) == anonymizer.anonymize(text)
+        assert results[1][0] == "Saluti da [PER_0]"
+        assert results[2] == ("", {}, [])
+    
+    def test_batch_sorted_by_length(self, mock_streamlit):
+        """Test che i segmenti siano passati ordinati per lunghezza e a batch"""
+        anonymizer = NERAnonimizer()
+        anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+        texts = ["testo lungo " * 10, "corto", "medio medio"]
+        
+        anonymizer.anonymize_batch(texts, batch_size=2)
+        
+        calls = anonymizer._ner_pipe.call_args_list
+        assert [call.args[0] for call in calls] == [["corto", "medio medio"], [texts[0]]]
+        assert all(call.kwargs['batch_size'] == 2 for call in calls)
+    
+    def test_batch_progress(self, mock_streamlit):
+        """Test callback di avanzamento"""
+        anonymizer = NERAnonimizer()
+        anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+        progress = []
+        
+        anonymizer.anonymize_batch(["a", "b", "c"], batch_size=2, on_progress=progress.append)
+        
+        assert progress[-1] == 1.0
@@ -0,0 +1,85 @@
+"""
+Test per il NER a cascata.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+from unittest.mock import Mock
+from cascade_ner import CascadeNER, candidate_runs, is_candidate, split_sentences
+from test_anonymizer import fake_ner
+
+TEXT = (
+    "Totale da pagare entro il 30/06.\n"
+    "l'importo è di 120 euro.\n"
+    "Gentile Mario Rossi, la ringraziamo.\n"
+    "Saluti da Mario Rossi.\n"
+    "codice 12345\n"
+)
+
+class TestHeuristic:
+    """Test del primo stadio euristico"""
+
+    def test_split_sentences(self):
+        """Test divisione in frasi con offset"""
+        sentences = [TEXT[start:end] for start, end in split_sentences(TEXT)]
+
+        assert sentences[0] == "Totale da pagare entro il 30/06."
+        assert sentences[-1] == "codice 12345\n"
+
+    def test_is_candidate(self):
+        """Test che solo le frasi con possibili nomi propri siano candidate"""
+        assert is_candidate("Gentile Mario Rossi, la ringraziamo.")
+        assert is_candidate("fornitura da ACME SpA")
+        assert not is_candidate("Totale da pagare entro il 30/06.")
+        assert not is_candidate("l'importo è di 120 euro.")
+
+    def test_adjacent_candidates_merged(self):
+        """Test che frasi candidate adiacenti diventino un solo blocco"""
+        runs = [TEXT[start:end] for start, end in candidate_runs(TEXT)]
+
+        assert runs == ["Gentile Mario Rossi, la ringraziamo.\nSaluti da Mario Rossi."]
+
+class TestCascadeNER:
+    """Test classe CascadeNER"""
+
+    def test_offsets_match_full_model(self):
+        """Test che le entità trovate coincidano con il modello su tutto il testo"""
+        cascade = CascadeNER(fake_ner)
+
+        assert cascade(TEXT) == fake_ner(TEXT)
+        assert cascade([TEXT, "nessun nome qui"]) == [fake_ner(TEXT), []]
+
+    def test_skipped_fraction(self):
+        """Test statistiche sul testo che evita il modello completo"""
+        full = Mock(side_effect=fake_ner)
+        cascade = CascadeNER(full)
+
+        cascade([TEXT, "solo testo minuscolo."])
+
+        sent = "".join(full.call_args.args[0])
+        stats = cascade.stats()
+        assert stats["full_model_chars"] == len(sent)
+        assert 0 < stats["skipped_fraction"] < 1
+
+    def test_fast_model_confident_skips_full(self):
+        """Test che le frasi con entità sicure non passino dal modello completo"""
+        full = Mock(side_effect=fake_ner)
+        cascade = CascadeNER(full, fast_pipe=fake_ner, confidence=0.8)
+
+        assert cascade(TEXT) == fake_ner(TEXT)
+        assert not full.called
+        assert cascade.stats()["skipped_fraction"] == 1.0
+
+    def test_fast_model_low_confidence_goes_to_full(self):
+        """Test che le entità incerte vengano verificate dal modello completo"""
+        full = Mock(side_effect=fake_ner)
+        fast = Mock(side_effect=lambda texts, **kw: [
+            [{'entity_group': 'PER', 'score': 0.4, 'start': 0, 'end': 3, 'word': 'x'}] for _ in texts
+        ])
+        cascade = CascadeNER(full, fast_pipe=fast, confidence=0.8)
+
+        assert cascade(TEXT) == fake_ner(TEXT)
+        assert full.called
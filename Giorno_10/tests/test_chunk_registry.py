@@ -0,0 +1,50 @@
+"""
+Test per il registro dei chunk del vector store.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from chunk_registry import ChunkRegistry
+
+class TestChunkRegistry:
+    """Test differenze tra documenti confermati e indicizzati"""
+
+    def test_new_documents_are_added(self):
+        """Test che un registro vuoto indicizzi tutti i documenti"""
+        registry = ChunkRegistry()
+        to_add, to_delete = registry.plan({"a.txt": "uno", "b.txt": "due"})
+
+        assert to_add == {"a.txt": "uno", "b.txt": "due"}
+        assert to_delete == []
+
+    def test_unchanged_documents_are_skipped(self):
+        """Test che senza modifiche non ci sia nulla da fare"""
+        registry = ChunkRegistry()
+        registry.register("a.txt", "uno", 2)
+
+        assert registry.plan({"a.txt": "uno"}) == ({}, [])
+        assert len(registry) == 2
+
+    def test_changed_and_removed_documents(self):
+        """Test che i documenti modificati vengano sostituiti e quelli rimossi eliminati"""
+        registry = ChunkRegistry()
+        old_a = registry.register("a.txt", "uno", 2)
+        old_b = registry.register("b.txt", "due", 1)
+        registry.register("c.txt", "tre", 1)
+
+        to_add, to_delete = registry.plan({"a.txt": "uno modificato", "c.txt": "tre", "d.txt": "quattro"})
+
+        assert to_add == {"a.txt": "uno modificato", "d.txt": "quattro"}
+        assert sorted(to_delete) == sorted(old_a + old_b)
+
+    def test_ids_change_with_content(self):
+        """Test che gli ID dipendano dal contenuto, così i vecchi chunk restano eliminabili"""
+        registry = ChunkRegistry()
+        first = registry.register("a.txt", "uno", 2)
+        second = registry.register("a.txt", "due", 2)
+
+        assert len(set(first + second)) == 4
+        registry.forget(["a.txt"])
+        assert len(registry) == 0
@@ -0,0 +1,73 @@
+"""
+Test per la cache degli embedding.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+from unittest.mock import Mock
+from embedding_cache import CachedEmbeddings, EmbeddingCache, embed_with_cache, embedding_key
+
+def fake_embed(texts):
+    """Embedding finto: lunghezza e numero di parole"""
+    return [[float(len(text)), float(len(text.split())), 0.5] for text in texts]
+
+class TestEmbeddingCache:
+    """Test cache degli embedding"""
+
+    def test_only_new_chunks_are_embedded(self, tmp_path):
+        """Test che i chunk già visti (anche con spazi diversi) non richiamino il modello"""
+        cache = EmbeddingCache(str(tmp_path / "emb.sqlite"))
+        embed = Mock(side_effect=fake_embed)
+
+        first = embed_with_cache(["uno due", "tre", "uno due"], embed, "ada", cache)
+        second = embed_with_cache(["tre", "quattro", "uno  due\n"], embed, "ada", cache)
+
+        assert first == fake_embed(["uno due", "tre", "uno due"])
+        assert second[0] == first[1] and second[2] == first[0]
+        assert [call.args[0] for call in embed.call_args_list] == [["uno due", "tre"], ["quattro"]]
+        assert cache.stats()["hits"] == 2
+
+    def test_model_is_part_of_key(self):
+        """Test che deployment diversi non condividano i vettori"""
+        assert embedding_key("ada", "testo") != embedding_key("small", "testo")
+        assert embedding_key("ada", " testo ") == embedding_key("ada", "testo")
+
+    def test_float16_and_eviction(self, tmp_path):
+        """Test blob float16 e limite di dimensione con eliminazione LRU"""
+        cache = EmbeddingCache(str(tmp_path / "emb.sqlite"), max_bytes=2 * 8, dtype="float16")
+        cache.put_many([(b"a", [1.0, 2.0, 3.0, 4.0]), (b"b", [0.5] * 4)])
+        cache.get_many([b"a"])
+        cache.put_many([(b"c", [0.25] * 4)])
+
+        found = cache.get_many([b"a", b"b", b"c"])
+        assert sorted(found) == [b"a", b"c"]
+        assert found[b"a"].dtype == np.float32
+        assert found[b"a"].tolist() == [1.0, 2.0, 3.0, 4.0]
+        assert cache.stats()["bytes"] == 16
+
+    def test_running_totals_match_table(self, tmp_path):
+        """Test che i totali tenuti dai trigger coincidano con la tabella"""
+        cache = EmbeddingCache(str(tmp_path / "emb.sqlite"))
+        cache.put_many([(b"a", [1.0] * 4), (b"b", [2.0] * 8)])
+        cache.put_many([(b"a", [3.0] * 2)])   # Sovrascrittura con dimensione diversa
+        cache.clear()
+        cache.put_many([(b"c", [4.0] * 3)])
+
+        conn = cache._connection()
+        expected = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        assert (cache.stats()["entries"], cache.stats()["bytes"]) == tuple(expected) == (1, 12)
+
+    def test_langchain_wrapper(self, tmp_path):
+        """Test wrapper Embeddings: documenti in cache, query sempre al modello"""
+        inner = Mock(embed_documents=Mock(side_effect=fake_embed), embed_query=Mock(return_value=[1.0]))
+        embeddings = CachedEmbeddings(inner, "ada", EmbeddingCache(str(tmp_path / "emb.sqlite")))
+
+        embeddings.embed_documents(["a", "b"])
+        embeddings.embed_documents(["b", "c"])
+
+        assert inner.embed_documents.call_count == 2
+        assert inner.embed_documents.call_args.args[0] == ["c"]
+        assert embeddings.embed_query("a") == [1.0]
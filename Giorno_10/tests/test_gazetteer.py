@@ -0,0 +1,149 @@
+"""
+Test per il dizionario delle entità confermate.
+"""
+import sys
+import os
+import io
+import re
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+from unittest.mock import Mock
+from anonymizer import NERAnonimizer, Span, unmask_candidates, NER_PRIORITY, GAZETTEER_PRIORITY
+from gazetteer import AhoCorasick, Gazetteer
+from vault import Fernet
+from stream_anonymizer import anonymize_stream
+from test_anonymizer import fake_ner
+
+class TestAhoCorasick:
+    """Test automa Aho-Corasick"""
+
+    def test_finds_all_overlapping_occurrences(self):
+        """Test che tutte le occorrenze, anche sovrapposte, vengano trovate"""
+        keys = ["he", "she", "his", "hers"]
+        text = "ushers his"
+
+        found = sorted((start, end, keys[i]) for start, end, i in AhoCorasick(keys).iter(text))
+
+        expected = sorted(
+            (m.start(), m.start() + len(key), key)
+            for key in keys for m in re.finditer(f"(?={key})", text)
+        )
+        assert found == expected
+
+class TestGazetteer:
+    """Test classe Gazetteer"""
+
+    def test_add_confirmed_and_find(self):
+        """Test che le entità confermate vengano trovate con placeholder stabile"""
+        gazetteer = Gazetteer()
+        gazetteer.add_confirmed({"[PER_0]": "Mario Rossi", "[ORG_3]": "ACME SpA", "[EMAIL_1]": "x"})
+
+        text = "Mario Rossi di ACME SpA; ancora Mario Rossi"
+        found = gazetteer.find(text)
+
+        assert [(text[s:e], label) for s, e, label, _ in found] == [
+            ("Mario Rossi", "PER"), ("ACME SpA", "ORG"), ("Mario Rossi", "PER")
+        ]
+        assert found[0][3] == found[2][3]
+        assert len(gazetteer) == 2  # "x" troppo corto
+
+    def test_word_boundaries_and_longest_match(self):
+        """Test confini di parola e preferenza per il valore più lungo"""
+        gazetteer = Gazetteer()
+        gazetteer.add("Rossi", "PER")
+        gazetteer.add("Mario Rossi", "PER")
+
+        text = "Mario Rossi, Rossini e Rossi"
+        found = [text[s:e] for s, e, _, _ in gazetteer.find(text)]
+
+        assert found == ["Mario Rossi", "Rossi"]
+
+    def test_persistence(self, tmp_path):
+        """Test che il dizionario sopravviva a un riavvio, cifrato su disco"""
+        path = str(tmp_path / "gazetteer.json")
+        key = Fernet.generate_key()
+        gazetteer = Gazetteer(path, key)
+        gazetteer.add_confirmed({"[PER_0]": "Mario Rossi"})
+        placeholder = gazetteer.find("Mario Rossi")[0][3]
+
+        reopened = Gazetteer(path, key)
+
+        assert reopened.find("Mario Rossi")[0][3] == placeholder
+        assert reopened.version == gazetteer.version
+        assert reopened.add("Anna Neri", "PER") != placeholder
+        with open(path, "rb") as f:
+            assert b"Mario" not in f.read()
+        assert os.stat(path).st_mode & 0o777 == 0o600
+
+    def test_path_requires_key(self, tmp_path):
+        """Test che il dizionario su disco non possa essere salvato in chiaro"""
+        with pytest.raises(ValueError):
+            Gazetteer(str(tmp_path / "gazetteer.json"))
+
+    def test_plaintext_file_is_rewritten(self, tmp_path):
+        """Test che un dizionario in chiaro delle versioni precedenti venga cifrato"""
+        path = tmp_path / "gazetteer.json"
+        path.write_text('{"counter": 1, "entries": {"Mario Rossi": ["PER", "[PER_G1]"]}}', encoding="utf-8")
+
+        gazetteer = Gazetteer(str(path), Fernet.generate_key())
+
+        assert gazetteer.find("Mario Rossi")[0][3] == "[PER_G1]"
+        assert b"Mario" not in path.read_bytes()
+
+class TestAnonymizerWithGazetteer:
+    """Test integrazione del dizionario in NERAnonimizer"""
+
+    @pytest.fixture
+    def anonymizer(self, mock_streamlit):
+        gazetteer = Gazetteer()
+        gazetteer.add("Luca Bianchi", "PER")
+        anonymizer = NERAnonimizer(gazetteer=gazetteer)
+        anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+        return anonymizer
+
+    def test_same_placeholder_in_every_document(self, anonymizer):
+        """Test che un'entità nota abbia lo stesso placeholder in ogni documento"""
+        first, first_entities = anonymizer.anonymize("Luca Bianchi scrive a Mario Rossi")
+        second, second_entities = anonymizer.anonymize("Saluti, Luca Bianchi")
+
+        placeholder = anonymizer.gazetteer.find("Luca Bianchi")[0][3]
+        assert first == f"{placeholder} scrive a [PER_1]"
+        assert second == f"Saluti, {placeholder}"
+        assert first_entities[placeholder] == second_entities[placeholder] == "Luca Bianchi"
+
+    def test_ner_sees_masked_text(self, anonymizer):
+        """Test che il NER riceva il testo con le entità note già mascherate"""
+        anonymizer.anonymize("Luca Bianchi scrive a Mario Rossi")
+
+        ner_input = anonymizer._ner_pipe.call_args.args[0]
+        assert "Luca Bianchi" not in ner_input
+        assert "Mario Rossi" in ner_input
+
+    def test_batch_and_stream_keep_stable_placeholders(self, anonymizer):
+        """Test che batch e streaming diano lo stesso risultato della chiamata singola"""
+        text = "Luca Bianchi scrive a Mario Rossi.\n\n" * 30
+
+        expected = anonymizer.anonymize(text)[0]
+        batch = anonymizer.anonymize_batch([text])[0][0]
+        streamed = "".join(masked for masked, _ in anonymize_stream(
+            anonymizer, io.StringIO(text), block_chars=200, overlap_chars=50))
+
+        assert batch == expected
+        assert streamed == expected
+
+    def test_unmask_candidates(self):
+        """Test che gli offset tornino sul testo originale"""
+        text = "Luca Bianchi e Mario Rossi"
+        known = [(Span(0, 12, "PER", 1.0, "[PER_G1]"), GAZETTEER_PRIORITY)]
+        masked = "[PER_G1] e Mario Rossi"
+        start = masked.index("Mario")
+        candidates = [
+            (Span(start, start + 11, "PER", 0.9), NER_PRIORITY),
+            (Span(1, 5, "PER", 0.9), NER_PRIORITY),
+        ]
+
+        result = unmask_candidates(candidates, known)
+
+        assert [text[span.start:span.end] for span, _ in result] == ["Mario Rossi"]
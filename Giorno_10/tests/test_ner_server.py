@@ -0,0 +1,134 @@
+"""
+Test per il server NER condiviso con micro-batching.
+"""
+import sys
+import os
+import threading
+from concurrent.futures import TimeoutError
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+from unittest.mock import Mock
+import ner_server
+from anonymizer import NERAnonimizer
+from ner_server import NERInferenceServer, get_ner_server
+from test_anonymizer import fake_ner
+
+class TestNERInferenceServer:
+    """Test classe NERInferenceServer"""
+
+    def test_same_interface_as_pipeline(self):
+        """Test che stringa e lista diano gli stessi risultati della pipeline"""
+        server = NERInferenceServer(fake_ner, max_wait_ms=1)
+
+        assert server("Saluti da Mario Rossi") == fake_ner("Saluti da Mario Rossi")
+        texts = ["Mario Rossi", "nessuno", "ancora Mario Rossi qui"]
+        assert server(texts) == fake_ner(texts)
+        assert server([]) == []
+
+    def test_concurrent_requests_are_batched(self):
+        """Test che richieste concorrenti finiscano nello stesso batch"""
+        pipe = Mock(side_effect=fake_ner)
+        server = NERInferenceServer(pipe, max_batch=64, max_wait_ms=200)
+        barrier = threading.Barrier(8)
+        results = {}
+
+        def session(i):
+            barrier.wait()
+            results[i] = server(f"Sessione {i}: Mario Rossi")
+
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i in range(8):
+            assert results[i] == fake_ner(f"Sessione {i}: Mario Rossi")
+        assert pipe.call_count < 8
+        assert server.stats()["requests"] == 8
+
+    def test_batch_is_capped(self):
+        """Test che la raccolta si fermi a max_batch testi"""
+        server = NERInferenceServer(fake_ner, max_batch=2, max_wait_ms=1000)
+        server._queue = Mock()
+        server._queue.get.side_effect = [(["a", "b"], None), (["c"], None)]
+
+        assert len(server._collect()) == 1
+
+    def test_errors_reach_every_caller(self):
+        """Test che un errore della pipeline arrivi al chiamante"""
+        server = NERInferenceServer(Mock(side_effect=RuntimeError("OOM")), max_wait_ms=1)
+
+        with pytest.raises(RuntimeError):
+            server("testo")
+
+    def test_request_times_out(self):
+        """Test che una richiesta bloccata fallisca dopo il timeout"""
+        release = threading.Event()
+
+        def slow_ner(texts, **kwargs):
+            release.wait(5)
+            return fake_ner(texts)
+
+        server = NERInferenceServer(slow_ner, max_wait_ms=1, timeout=0.05)
+        try:
+            with pytest.raises(TimeoutError):
+                server("Mario Rossi")
+        finally:
+            release.set()
+        server.timeout = 5
+        assert server("Mario Rossi") == fake_ner("Mario Rossi")
+
+    def test_worker_exit_fails_pending_requests(self):
+        """Test che le richieste in attesa falliscano se il worker termina"""
+        server = NERInferenceServer(Mock(side_effect=SystemExit), max_wait_ms=1, timeout=5)
+
+        with pytest.raises(RuntimeError):
+            server("testo")
+        server._worker.join(5)
+        assert not server.alive
+        with pytest.raises(RuntimeError):
+            server("altro testo")
+
+    def test_exposes_pipeline_tokenizer(self):
+        """Test che il server esponga il tokenizer per il bucketing in token"""
+        tokenizer = Mock()
+        pipe = Mock(side_effect=fake_ner, tokenizer=tokenizer)
+
+        assert NERInferenceServer(pipe, max_wait_ms=1).tokenizer is tokenizer
+
+class TestSharedServer:
+    """Test del server condiviso tra sessioni"""
+
+    @pytest.fixture(autouse=True)
+    def reset_server(self, monkeypatch):
+        monkeypatch.setattr(ner_server, '_server', None)
+
+    def test_model_loaded_once(self, mock_streamlit):
+        """Test che più sessioni condividano un solo modello"""
+        loader = Mock(return_value=fake_ner)
+        sessions = [NERAnonimizer(ner_loader=lambda: get_ner_server(loader)) for _ in range(5)]
+
+        results = [session.anonymize("Saluti da Mario Rossi")[0] for session in sessions]
+
+        assert loader.call_count == 1
+        assert results == ["Saluti da [PER_0]"] * 5
+        assert len({id(session.ner_pipe) for session in sessions}) == 1
+
+    def test_failed_load_is_retried(self):
+        """Test che un caricamento fallito non lasci un server a metà"""
+        with pytest.raises(OSError):
+            get_ner_server(Mock(side_effect=OSError("offline")))
+
+        assert get_ner_server(Mock(return_value=fake_ner)) is not None
+
+    def test_dead_server_is_replaced(self):
+        """Test che un server con il worker fermo venga ricreato"""
+        dead = get_ner_server(Mock(return_value=Mock(side_effect=SystemExit)))
+        with pytest.raises(RuntimeError):
+            dead("testo")
+        dead._worker.join(5)
+
+        assert get_ner_server(Mock(return_value=fake_ner)) is not dead
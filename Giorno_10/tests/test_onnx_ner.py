@@ -0,0 +1,74 @@
+"""
+Test per il backend ONNX Runtime del modello NER.
+"""
+import sys
+import os
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+from config import Config
+from onnx_ner import entity_agreement
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+def entity(start, end, group='PER', score=0.9):
+    return {'entity_group': group, 'start': start, 'end': end, 'score': score}
+
+class TestEntityAgreement:
+    """Test metrica di accordo tra backend"""
+    
+    def test_identical(self):
+        """Test accordo perfetto"""
+        results = [[entity(0, 5), entity(10, 15, 'ORG')], []]
+        
+        agreement = entity_agreement(results, results)
+        
+        assert agreement['f1'] == 1.0
+        assert agreement['reference'] == 2
+    
+    def test_partial(self):
+        """Test accordo parziale con entità mancanti e in più"""
+        reference = [[entity(0, 5), entity(10, 15, 'ORG')]]
+        candidate = [[entity(0, 5), entity(20, 25, 'LOC')]]
+        
+        agreement = entity_agreement(reference, candidate)
+        
+        assert agreement['precision'] == 0.5
+        assert agreement['recall'] == 0.5
+    
+    def test_threshold(self):
+        """Test che le entità sotto soglia siano ignorate"""
+        reference = [[entity(0, 5)]]
+        candidate = [[entity(0, 5, score=0.3)]]
+        
+        assert entity_agreement(reference, candidate)['recall'] == 0.0
+
+@pytest.mark.slow
+@pytest.mark.integration
+class TestOnnxParity:
+    """Parità ONNX vs PyTorch sulle fixture (richiede modello e onnxruntime)"""
+    
+    @pytest.fixture
+    def texts(self, sample_text, sample_text_no_entities):
+        return [sample_text, sample_text_no_entities] + [
+            path.read_text(encoding="utf-8") for path in sorted(DATA_DIR.glob("*.txt"))
+        ]
+    
+    @pytest.mark.parametrize("quantize, min_f1", [(False, 0.99), (True, 0.9)])
+    def test_parity_with_pytorch(self, texts, tmp_path, quantize, min_f1):
+        """Test accordo a livello di entità con il modello PyTorch"""
+        pytest.importorskip("onnxruntime")
+        from windowed_ner import WindowedNER
+        from onnx_ner import OnnxWindowedNER
+        
+        try:
+            torch_ner = WindowedNER.from_pretrained(Config.NER_MODEL)
+            onnx_ner = OnnxWindowedNER.from_pretrained(Config.NER_MODEL, str(tmp_path), quantize=quantize)
+        except OSError as e:
+            pytest.skip(f"Modello NER non disponibile: {e}")
+        
+        agreement = entity_agreement(torch_ner(texts), onnx_ner(texts))
+        
+        assert agreement['f1'] >= min_f1
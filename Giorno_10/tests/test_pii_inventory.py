@@ -0,0 +1,113 @@
+"""
+Test per l'inventario dei dati personali.
+"""
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+from unittest.mock import Mock
+from anonymizer import NERAnonimizer
+from pii_inventory import PIIInventory, scan_files, iter_files, value_hash, load_inventory_key
+from test_anonymizer import fake_ner
+
+IBAN = "IT60X0542811101000000123456"
+KEY = "segreto"
+
+@pytest.fixture
+def anonymizer(mock_streamlit):
+    """Anonimizzatore con NER finto"""
+    anonymizer = NERAnonimizer()
+    anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+    return anonymizer
+
+@pytest.fixture
+def archive(tmp_path):
+    """Piccolo archivio di mail"""
+    folder = tmp_path / "archivio"
+    folder.mkdir()
+    (folder / "a.txt").write_text(f"Gentile Mario Rossi, IBAN {IBAN}.", encoding="utf-8")
+    (folder / "b.txt").write_text("Scrivere a info@acme.it per il rimborso.", encoding="utf-8")
+    (folder / "c.txt").write_text(f"Pagamento su IT60 X054 2811 1010 0000 0123 456 da Mario Rossi", encoding="utf-8")
+    (folder / "note.md").write_text(f"IBAN {IBAN}", encoding="utf-8")
+    return folder
+
+class TestPIIInventory:
+    """Test indice delle occorrenze"""
+
+    def test_detect_batch_matches_anonymize(self, anonymizer, sample_text):
+        """Test che il rilevamento trovi gli stessi span dell'anonimizzazione"""
+        spans = anonymizer.detect_batch([sample_text, ""])
+
+        assert spans[0] == anonymizer.anonymize_with_spans(sample_text)[2]
+        assert spans[1] == []
+
+    def test_scan_and_query(self, anonymizer, archive, tmp_path):
+        """Test scansione parallela e ricerca per valore senza rileggere i file"""
+        inventory = PIIInventory(str(tmp_path / "inventory.sqlite"), KEY)
+
+        stats = scan_files(anonymizer, inventory, iter_files(str(archive)), workers=2, batch_docs=1)
+
+        assert stats["documents"] == 3
+        docs = [os.path.basename(doc) for doc, label, _ in inventory.documents_with_value(IBAN, "IBAN")]
+        assert docs == ["a.txt", "c.txt"]  # anche con spazi
+        assert [os.path.basename(doc) for doc, _ in inventory.documents_with_label("EMAIL")] == ["b.txt"]
+        assert inventory.summary()["IBAN"] == {"occurrences": 2, "distinct_values": 1, "documents": 2}
+
+    def test_rescan_skips_unchanged(self, anonymizer, archive, tmp_path):
+        """Test che una nuova scansione salti i file non modificati"""
+        inventory = PIIInventory(str(tmp_path / "inventory.sqlite"), KEY)
+        scan_files(anonymizer, inventory, iter_files(str(archive)))
+        (archive / "b.txt").write_text("Nessun dato personale, ma più lungo di prima.", encoding="utf-8")
+
+        stats = scan_files(anonymizer, inventory, iter_files(str(archive)))
+
+        assert stats == {"documents": 1, "skipped": 2, "occurrences": 0}
+        assert inventory.documents_with_label("EMAIL") == []
+
+    def test_keyed_hash(self):
+        """Test che la chiave cambi gli hash e la normalizzazione resti"""
+        hashed = value_hash("IBAN", IBAN, KEY)
+
+        assert value_hash("IBAN", "it60 x054 2811 1010 0000 0123 456", KEY) == hashed
+        assert value_hash("IBAN", IBAN, "altra chiave") != hashed
+
+    def test_key_required(self, tmp_path):
+        """Test che senza chiave, o con una chiave diversa, l'indice non si apra"""
+        path = str(tmp_path / "inventory.sqlite")
+        with pytest.raises(ValueError):
+            PIIInventory(path, "")
+        with pytest.raises(ValueError):
+            value_hash("IBAN", IBAN, "")
+
+        PIIInventory(path, KEY)
+        with pytest.raises(ValueError):
+            PIIInventory(path, "altra chiave")
+
+    def test_generated_key_persisted(self, tmp_path):
+        """Test che la chiave generata resti la stessa tra due esecuzioni"""
+        key_path = str(tmp_path / "inventory.key")
+        key = load_inventory_key(key_path)
+
+        assert len(key) == 64
+        assert load_inventory_key(key_path) == key
+
+    def test_ner_loaded_once_before_workers(self, mock_streamlit, archive, tmp_path):
+        """Test che i worker non carichino il modello NER in parallelo"""
+        calls = []
+
+        def slow_loader():
+            calls.append(threading.get_ident())
+            time.sleep(0.05)
+            return Mock(side_effect=fake_ner, tokenizer=None)
+
+        anonymizer = NERAnonimizer(ner_loader=slow_loader)
+        inventory = PIIInventory(str(tmp_path / "inventory.sqlite"), KEY)
+
+        stats = scan_files(anonymizer, inventory, iter_files(str(archive)), workers=4, batch_docs=1)
+
+        assert stats["documents"] == 3
+        assert calls == [threading.get_ident()]
@@ -0,0 +1,57 @@
+"""
+Test per i tempi e contatori della pipeline.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import csv
+from unittest.mock import Mock
+from anonymizer import NERAnonimizer
+from pipeline_metrics import CSVSink, PipelineMetrics, prometheus_text
+from test_anonymizer import fake_ner
+
+class TestPipelineMetrics:
+    """Test strumentazione per fase"""
+
+    def test_stages_and_documents(self, mock_streamlit, sample_text):
+        """Test che anonymize e anonymize_batch misurino ogni fase e documento"""
+        metrics = PipelineMetrics()
+        anonymizer = NERAnonimizer(metrics=metrics)
+        anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+
+        _, entities = anonymizer.anonymize(sample_text)
+        anonymizer.anonymize_batch([sample_text, "Saluti da Mario Rossi", ""])
+
+        snapshot = metrics.snapshot()
+        assert snapshot["documents"] == 3
+        assert snapshot["chars"] == 2 * len(sample_text) + len("Saluti da Mario Rossi")
+        assert snapshot["entities"] == 2 * len(entities) + 1
+        assert list(snapshot["stages"]) == ["gazetteer", "regex", "tokenize", "ner", "merge", "render"]
+        assert snapshot["stages"]["merge"]["calls"] == 3
+        assert snapshot["stages"]["tokenize"]["items"] >= 2
+
+    def test_model_load_time(self, mock_streamlit):
+        """Test che il caricamento lazy del modello venga misurato"""
+        metrics = PipelineMetrics()
+        anonymizer = NERAnonimizer(ner_loader=lambda: Mock(side_effect=fake_ner), metrics=metrics)
+
+        assert anonymizer.ner_pipe is not None
+        assert metrics.snapshot()["stages"]["model_load"]["calls"] == 1
+
+    def test_csv_sink_and_prometheus(self, tmp_path):
+        """Test esportazione su CSV e in formato Prometheus"""
+        path = str(tmp_path / "metrics.csv")
+        metrics = PipelineMetrics(CSVSink(path))
+
+        metrics.record("ner", 0.25, items=4)
+        metrics.observe_document(100, 3)
+        metrics.sink.close()
+
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert [(row["name"], row["count"]) for row in rows] == [("ner", "4"), ("document", "3")]
+        text = prometheus_text(metrics)
+        assert 'anonymizer_stage_seconds_total{stage="ner"} 0.250000' in text
+        assert "anonymizer_entities_total 3" in text
@@ -0,0 +1,64 @@
+"""
+Test per lo scanner regex multi-pattern.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+from config import REGEX_PATTERNS
+from regex_scanner import RegexScanner, get_scanner
+
+class TestRegexScanner:
+    """Test classe RegexScanner"""
+    
+    def test_single_pass_all_labels(self, sample_text):
+        """Test che un solo passaggio trovi tutte le etichette"""
+        scanner = RegexScanner(REGEX_PATTERNS, engine="re")
+        
+        found = {label: sample_text[start:end] for start, end, label in scanner.scan(sample_text)}
+        
+        assert found["IBAN"] == "IT60 X054 2811 1010 0000 0123 456"
+        assert found["EMAIL"] == "mario.rossi@example.com"
+        assert found["CF"] == "RSSMRA80A01H501Z"
+        assert found["CARD"] == "4532 1234 5678 9012"
+    
+    def test_case_insensitive(self):
+        """Test che CF, IBAN ed email in minuscolo vengano trovati"""
+        scanner = RegexScanner(REGEX_PATTERNS, engine="re")
+        text = "cf rssmra80a01h501z, iban it60x0542811101000000123456, MARIO.ROSSI@EXAMPLE.COM"
+        
+        found = {label: text[start:end] for start, end, label in scanner.scan(text)}
+        
+        assert found["CF"] == "rssmra80a01h501z"
+        assert found["IBAN"] == "it60x0542811101000000123456"
+        assert found["EMAIL"] == "MARIO.ROSSI@EXAMPLE.COM"
+    
+    def test_matches_in_text_order(self, sample_text):
+        """Test che i match siano ordinati e non sovrapposti"""
+        scanner = RegexScanner(REGEX_PATTERNS, engine="re")
+        
+        matches = list(scanner.scan(sample_text))
+        
+        for (_, prev_end, _), (next_start, _, _) in zip(matches, matches[1:]):
+            assert prev_end <= next_start
+    
+    def test_priority_order(self):
+        """Test che a parità di posizione vinca il primo pattern"""
+        scanner = RegexScanner({"LONG": r"\d{4}", "SHORT": r"\d{2}"}, engine="re")
+        
+        assert list(scanner.scan("1234")) == [(0, 4, "LONG")]
+        
+        scanner = RegexScanner({"SHORT": r"\d{2}", "LONG": r"\d{4}"}, engine="re")
+        
+        assert list(scanner.scan("1234")) == [(0, 2, "SHORT"), (2, 4, "SHORT")]
+    
+    def test_unknown_engine(self):
+        """Test motore non supportato"""
+        with pytest.raises(ValueError):
+            RegexScanner(REGEX_PATTERNS, engine="pcre")
+    
+    def test_get_scanner_cached(self):
+        """Test che lo scanner venga compilato una sola volta"""
+        assert get_scanner(REGEX_PATTERNS, "re") is get_scanner(dict(REGEX_PATTERNS), "re")
@@ -0,0 +1,51 @@
+"""
+Test per la memo NER a livello di frase.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from unittest.mock import Mock
+from sentence_memo import MemoizedNER, SentenceMemo
+from test_anonymizer import fake_ner
+
+SIGNATURE = "Cordiali saluti, Mario Rossi.\nACME Srl - Via Roma 1 - Milano.\n"
+
+class TestSentenceMemo:
+    """Test memo per frase"""
+
+    def test_same_entities_as_model(self):
+        """Test che gli offset coincidano con quelli del modello sul testo intero"""
+        memo_ner = MemoizedNER(Mock(side_effect=fake_ner), SentenceMemo())
+        texts = [f"Ordine 12 spedito.\n{SIGNATURE}", f"  Rif. Mario Rossi!\n\n{SIGNATURE}", ""]
+
+        results = memo_ner(texts)
+
+        assert results == [fake_ner(text) for text in texts]
+        assert memo_ner("Saluti da Mario Rossi") == fake_ner("Saluti da Mario Rossi")
+
+    def test_repeated_sentences_skip_model(self):
+        """Test che le frasi ripetute, anche nello stesso batch, passino dal modello una volta"""
+        pipe = Mock(side_effect=fake_ner)
+        memo_ner = MemoizedNER(pipe, SentenceMemo())
+
+        memo_ner([f"Mail uno.\n{SIGNATURE}", f"Mail due.\n{SIGNATURE}"])
+        memo_ner([f"Mail tre.\n{SIGNATURE}"])
+
+        model_sentences = [s for call in pipe.call_args_list for s in call.args[0]]
+        assert sorted(model_sentences) == sorted([
+            "Mail uno.", "Mail due.", "Mail tre.", "Cordiali saluti, Mario Rossi.",
+            "ACME Srl - Via Roma 1 - Milano.",
+        ])
+        assert memo_ner.stats()["hits"] == 4
+
+    def test_lru_bound(self):
+        """Test che la memo non superi il numero massimo di frasi"""
+        memo = SentenceMemo(max_entries=2)
+        memo_ner = MemoizedNER(Mock(side_effect=fake_ner), memo)
+
+        memo_ner(["Uno.", "Due.", "Uno.", "Tre."])
+
+        assert len(memo) == 2
+        assert memo.stats()["hits"] == 1  # "Uno." ripetuta nello stesso batch
@@ -0,0 +1,91 @@
+"""
+Test per l'anonimizzazione in streaming.
+"""
+import sys
+import os
+import io
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+from unittest.mock import Mock
+from anonymizer import NERAnonimizer
+from stream_anonymizer import anonymize_stream, anonymize_file, find_cut, read_entities
+from test_anonymizer import fake_ner
+
+@pytest.fixture
+def anonymizer(mock_streamlit):
+    """Anonimizzatore con NER finto"""
+    anonymizer = NERAnonimizer()
+    anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+    return anonymizer
+
+class TestStreamAnonymizer:
+    """Test anonimizzazione a blocchi"""
+
+    def test_find_cut_prefers_paragraphs(self):
+        """Test che il taglio avvenga dopo una riga vuota se possibile"""
+        text = "uno due\n\ntre quattro\ncinque sei"
+
+        assert find_cut(text, 20) == len("uno due\n\n")
+        assert find_cut("tre quattro\ncinque sei", 20) == len("tre quattro\n")
+        assert find_cut("abcdef", 4) == 4
+
+    def test_stream_matches_full_text(self, anonymizer, sample_text):
+        """Test che l'output a blocchi coincida con quello sul testo intero"""
+        text = (sample_text + "\n\n") * 20
+
+        chunks = list(anonymize_stream(anonymizer, io.StringIO(text), block_chars=300, overlap_chars=80))
+        expected_text, expected_entities = anonymizer.anonymize(text)
+
+        assert len(chunks) > 1
+        assert "".join(masked for masked, _ in chunks) == expected_text
+        entities = {}
+        for _, block_entities in chunks:
+            entities.update(block_entities)
+        assert entities == expected_entities
+
+    def test_entity_across_cut_not_split(self, anonymizer):
+        """Test che un'entità a cavallo del taglio resti intera"""
+        text = "x" * 40 + " mario.rossi@example.com " + "y" * 40
+
+        chunks = list(anonymize_stream(anonymizer, io.StringIO(text), block_chars=50, overlap_chars=40))
+
+        output = "".join(masked for masked, _ in chunks)
+        assert output == "x" * 40 + " [EMAIL_0] " + "y" * 40
+        assert any(entities == {"[EMAIL_0]": "mario.rossi@example.com"} for _, entities in chunks)
+
+    def test_window_size_is_bounded(self, anonymizer):
+        """Test che nessuna finestra superi blocco + sovrapposizione"""
+        text = "Saluti da Mario Rossi.\n\n" * 2000
+        anonymizer.find_regex_spans = Mock(wraps=anonymizer.find_regex_spans)
+
+        output = "".join(masked for masked, _ in anonymize_stream(
+            anonymizer, io.StringIO(text), block_chars=500, overlap_chars=100))
+
+        assert output.count("[PER_") == 2000
+        assert max(len(call.args[0]) for call in anonymizer.find_regex_spans.call_args_list) <= 600
+
+    def test_anonymize_file(self, anonymizer, tmp_path):
+        """Test scrittura su file"""
+        source = tmp_path / "input.txt"
+        source.write_text("Mario Rossi scrive.\n\nContatto: mario.rossi@example.com\n", encoding="utf-8")
+
+        count = anonymize_file(anonymizer, str(source), str(tmp_path / "output.txt"),
+                               str(tmp_path / "entities.jsonl"), block_chars=20, overlap_chars=10)
+
+        assert (tmp_path / "output.txt").read_text(encoding="utf-8") == "[PER_0] scrive.\n\nContatto: [EMAIL_1]\n"
+        assert count == 2
+        # Una riga per blocco: la mappa viene scritta man mano
+        assert len((tmp_path / "entities.jsonl").read_text(encoding="utf-8").splitlines()) == 2
+        assert dict(read_entities(str(tmp_path / "entities.jsonl"))) == {
+            "[PER_0]": "Mario Rossi", "[EMAIL_1]": "mario.rossi@example.com"}
+
+    def test_placeholders_follow_span_order(self, anonymizer):
+        """Test che la numerazione continua segua l'ordine degli span nei blocchi"""
+        text = "Mario Rossi scrive.\n\n" * 3
+
+        output = "".join(masked for masked, _ in anonymize_stream(
+            anonymizer, io.StringIO(text), block_chars=25, overlap_chars=10))
+
+        assert output == "[PER_0] scrive.\n\n[PER_1] scrive.\n\n[PER_2] scrive.\n\n"
@@ -0,0 +1,91 @@
+"""
+Test per l'anonimizzazione di tabelle.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pandas as pd
+import pytest
+from unittest.mock import Mock
+from anonymizer import NERAnonimizer
+from tabular_anonymizer import anonymize_dataframe, profile_columns, read_table, REGEX_COLUMN, SKIP_COLUMN, TEXT_COLUMN
+from test_anonymizer import fake_ner
+
+@pytest.fixture
+def anonymizer(mock_streamlit):
+    """Anonimizzatore con NER finto"""
+    anonymizer = NERAnonimizer()
+    anonymizer._ner_pipe = Mock(side_effect=fake_ner, tokenizer=None)
+    return anonymizer
+
+@pytest.fixture
+def crm():
+    """Export CRM con colonne strutturate, testo libero e duplicati"""
+    return pd.DataFrame({
+        "cliente": ["Mario Rossi", "Anna Neri", "Mario Rossi", None] * 25,
+        "email": ["mario@example.com", "anna@example.com", "mario@example.com", ""] * 25,
+        "iban": [None if i % 4 == 3 else "non comunicato" if i == 2 else f"IT60X0542811101000000{i:06d}"
+                 for i in range(100)],
+        "importo": ["1200,50", "300", "99.90", "0"] * 25,
+        "note": ["Richiamare Mario Rossi", "Scrive da anna@example.com", None, "ok"] * 25,
+    }, dtype=object)
+
+class TestTabularAnonymizer:
+    """Test anonimizzazione per colonna"""
+
+    def test_profile_columns(self, anonymizer, crm):
+        """Test riconoscimento del tipo di colonna"""
+        profile = profile_columns(crm, anonymizer.regex_patterns)
+
+        assert profile == {"cliente": TEXT_COLUMN, "email": "EMAIL", "iban": "IBAN",
+                           "importo": REGEX_COLUMN, "note": TEXT_COLUMN}
+        assert profile_columns(pd.DataFrame({"vuota": [None, "", " "]}), anonymizer.regex_patterns) == {
+            "vuota": SKIP_COLUMN}
+
+    def test_phone_column_scanned(self, anonymizer):
+        """Test che una colonna di telefoni senza lettere passi dalle regex"""
+        df = pd.DataFrame({"telefono": ["+39 333 1234567", "+39 02 12345678", "+39 333 1234567", None]},
+                          dtype=object)
+
+        result, entities, profile = anonymize_dataframe(anonymizer, df)
+
+        assert profile == {"telefono": REGEX_COLUMN}
+        assert not any("1234567" in str(value) or "12345678" in str(value) for value in result["telefono"])
+        assert result.iloc[0]["telefono"] == result.iloc[2]["telefono"]
+        assert sorted(entities.values()) == ["39 02 12345678", "39 333 1234567"]
+        assert anonymizer._ner_pipe.call_count == 0
+
+    def test_anonymize_dataframe(self, anonymizer, crm):
+        """Test placeholder coerenti in tutta la tabella"""
+        result, entities, _ = anonymize_dataframe(anonymizer, crm)
+
+        row = result.iloc[0]
+        assert row["cliente"] == "[PER_0]"
+        assert row["note"] == "Richiamare [PER_0]"
+        assert entities[row["email"]] == "mario@example.com"
+        assert result.iloc[1]["note"] == f"Scrive da {result.iloc[1]['email']}"
+        assert result.iloc[2]["iban"] == "non comunicato"
+        assert pd.isna(result.iloc[3]["cliente"]) and pd.isna(result.iloc[3]["iban"])
+        assert list(result["importo"]) == list(crm["importo"])
+        assert not any("example.com" in str(v) for v in result.to_numpy().ravel())
+
+    def test_unique_values_analyzed_once(self, anonymizer, crm):
+        """Test che ogni valore distinto di testo passi dal modello una sola volta"""
+        anonymize_dataframe(anonymizer, crm)
+
+        analyzed = [text for call in anonymizer._ner_pipe.call_args_list for text in call.args[0]]
+        assert len(analyzed) == len(set(analyzed))
+        assert sorted(analyzed) == sorted(["Mario Rossi", "Anna Neri", "non comunicato", "ok",
+                                           "Richiamare Mario Rossi", "Scrive da anna@example.com"])
+
+    def test_read_entities_csv(self, anonymizer):
+        """Test su un export reale del repository"""
+        path = os.path.join(os.path.dirname(__file__), '..', '..', 'NER_Graph_G13', 'data', 'entities.csv')
+        df = read_table(path)
+
+        result, _, profile = anonymize_dataframe(anonymizer, df)
+
+        assert profile["Documento"] == TEXT_COLUMN
+        assert result.shape == df.shape
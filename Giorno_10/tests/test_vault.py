@@ -0,0 +1,102 @@
+"""
+Test per il vault cifrato e la re-identificazione.
+"""
+import sys
+import os
+import sqlite3
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from vault import EntityVault, load_key
+
+@pytest.fixture
+def vault(tmp_path):
+    return EntityVault(str(tmp_path / "vault.sqlite"), load_key(str(tmp_path / "vault.key")))
+
+class TestEntityVault:
+    """Test classe EntityVault"""
+
+    def test_values_encrypted_on_disk(self, vault):
+        """Test che i valori non siano salvati in chiaro"""
+        vault.store("doc1.txt", {"[PER_0]": "Mario Rossi"})
+
+        raw = sqlite3.connect(vault.path).execute("SELECT value FROM mappings").fetchone()[0]
+        assert b"Mario Rossi" not in raw
+        assert vault.lookup(["[PER_0]"]) == {"[PER_0]": "Mario Rossi"}
+
+    def test_reidentify(self, vault):
+        """Test sostituzione placeholder, anche sconosciuti o ripetuti"""
+        vault.store("doc1.txt", {"[PER_0]": "Mario Rossi", "[IBAN_1]": "IT60X0542811101000000123456"})
+
+        text = "[PER_0] deve pagare su [IBAN_1]. Firmato [PER_0], cc [PER_9]"
+
+        assert vault.reidentify(text) == (
+            "Mario Rossi deve pagare su IT60X0542811101000000123456. "
+            "Firmato Mario Rossi, cc [PER_9]"
+        )
+
+    def test_doc_ids_scope(self, vault):
+        """Test che doc_ids limiti la ricerca ai documenti fonte"""
+        vault.store("a.txt", {"[PER_0]": "Mario Rossi"})
+        vault.store("b.txt", {"[PER_0]": "Anna Neri", "[ORG_1]": "ACME SpA"})
+
+        assert vault.reidentify("[PER_0] [ORG_1]", ["a.txt"]) == "Mario Rossi [ORG_1]"
+        assert vault.reidentify("[PER_0] [ORG_1]", ["b.txt"]) == "Anna Neri ACME SpA"
+        assert vault.reidentify("[PER_0]", []) == "[PER_0]"
+
+    def test_ambiguous_placeholder_unchanged(self, vault):
+        """Test che un placeholder con valori diversi in più documenti resti invariato"""
+        vault.store("a.txt", {"[PER_0]": "Mario Rossi", "[ORG_G1]": "ACME SpA"})
+        vault.store("b.txt", {"[PER_0]": "Anna Neri", "[ORG_G1]": "ACME SpA"})
+
+        assert vault.reidentify("[PER_0] [ORG_G1]", ["a.txt", "b.txt"]) == "[PER_0] ACME SpA"
+        assert vault.reidentify("[PER_0] [ORG_G1]") == "[PER_0] ACME SpA"
+
+    def test_many_documents(self, vault):
+        """Test filtro per documento con più documenti del limite di parametri SQLite"""
+        for i in range(1000):
+            vault.store(f"doc{i}.txt", {"[PER_0]": f"Persona {i}"})
+
+        assert vault.reidentify("[PER_0]", ["doc999.txt"]) == "Persona 999"
+        assert vault.reidentify("[PER_0]", [f"doc{i}.txt" for i in range(998, 1000)]) == "[PER_0]"
+        assert vault.reidentify("[PER_0]", [f"doc{i}.txt" for i in range(1000)] + ["doc5.txt"]) == "[PER_0]"
+
+    def test_store_replaces_document(self, vault):
+        """Test che una nuova conferma sostituisca la mappa precedente"""
+        vault.store("doc1.txt", {"[PER_0]": "Mario Rossi", "[PER_1]": "Anna Neri"})
+        vault.store("doc1.txt", {"[PER_0]": "Mario Bianchi"})
+
+        assert vault.reidentify("[PER_0] [PER_1]") == "Mario Bianchi [PER_1]"
+        assert vault.count() == 1
+
+    def test_batch_many_placeholders(self, vault):
+        """Test batch con più placeholder del limite di parametri SQLite"""
+        vault.store("doc.txt", {f"[PER_{i}]": f"Persona {i}" for i in range(2500)})
+        texts = [f"[PER_{i}] e [PER_{i + 1}]" for i in range(0, 2498, 2)]
+
+        result = vault.reidentify_batch(texts)
+
+        assert result[0] == "Persona 0 e Persona 1"
+        assert result[-1] == "Persona 2496 e Persona 2497"
+
+    def test_key_persisted(self, tmp_path):
+        """Test che il vault si riapra con la stessa chiave generata"""
+        path, key_path = str(tmp_path / "vault.sqlite"), str(tmp_path / "vault.key")
+        EntityVault(path, load_key(key_path)).store("doc.txt", {"[ORG_G1]": "ACME SpA"})
+
+        reopened = EntityVault(path, load_key(key_path))
+
+        assert reopened.reidentify("Fornitore: [ORG_G1]") == "Fornitore: ACME SpA"
+
+    @pytest.mark.skipif(os.name != "posix", reason="permessi POSIX")
+    def test_key_file_private(self, tmp_path):
+        """Test che il file della chiave sia leggibile solo dal proprietario"""
+        key_path = str(tmp_path / "vault.key")
+        key = load_key(key_path)
+
+        assert os.stat(key_path).st_mode & 0o777 == 0o600
+        assert load_key(key_path) == key
@@ -0,0 +1,96 @@
+"""
+Test per NER a finestre scorrevoli.
+"""
+import sys
+import os
+import re
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+import numpy as np
+from windowed_ner import WindowedNER
+
+LABELS = {0: 'O', 1: 'B-PER', 2: 'I-PER'}
+VOCAB = {'Mario': 5, 'Rossi': 6}
+
+class FakeEncoding(dict):
+    """Encoding con word_ids come quello dei tokenizer fast"""
+    def word_ids(self):
+        return list(range(len(self['input_ids'])))
+
+class FakeTokenizer:
+    """Tokenizer a parole con offset mapping"""
+    model_max_length = 8
+    cls_token_id = 1
+    sep_token_id = 2
+    pad_token_id = 0
+    
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=True):
+        words = list(re.finditer(r'\w+|[^\w\s]', text))
+        return FakeEncoding(
+            input_ids=[VOCAB.get(w.group(), 7) for w in words],
+            offset_mapping=[(w.start(), w.end()) for w in words]
+        )
+
+class FakeWindowedNER(WindowedNER):
+    """Modello finto: 'Mario' -> B-PER, 'Rossi' -> I-PER"""
+    def _forward(self, input_ids, attention_mask):
+        self.batches.append(input_ids.shape)
+        logits = np.zeros(input_ids.shape + (3,), dtype=np.float32)
+        logits[..., 0] = 1.0
+        logits[input_ids == 5, 1] = 5.0
+        logits[input_ids == 6, 2] = 5.0
+        return logits
+
+def make_ner(**kwargs):
+    ner = FakeWindowedNER(FakeTokenizer(), id2label=LABELS, **kwargs)
+    ner.batches = []
+    return ner
+
+class TestWindowedNER:
+    """Test classe WindowedNER"""
+    
+    def test_entities_across_windows(self):
+        """Test che tutte le occorrenze siano trovate anche a cavallo delle finestre"""
+        ner = make_ner(stride=2)
+        text = " ".join(["Gentile Mario Rossi, saluti."] * 10)
+        
+        entities = ner(text)
+        
+        expected = [m.span() for m in re.finditer('Mario Rossi', text)]
+        assert [(e['start'], e['end']) for e in entities] == expected
+        assert all(e['entity_group'] == 'PER' and e['word'] == 'Mario Rossi' for e in entities)
+        assert all(0.0 < e['score'] <= 1.0 for e in entities)
+    
+    def test_windows_cover_all_tokens(self):
+        """Test che le finestre coprano tutti i token con la sovrapposizione richiesta"""
+        ner = make_ner(stride=2)
+        
+        starts = ner._windows(20)
+        
+        assert starts[0] == 0
+        assert all(b - a == ner.window - ner.stride for a, b in zip(starts, starts[1:]))
+        assert starts[-1] + ner.window >= 20
+    
+    def test_batched_windows(self):
+        """Test che le finestre di più testi passino nel modello a batch"""
+        ner = make_ner(stride=2, batch_size=4)
+        texts = ["Mario Rossi " * 6, "nessuna entità", "Rossi"]
+        
+        results = ner(texts)
+        
+        assert len(results) == 3
+        assert len(results[0]) == 6
+        assert results[1] == []
+        assert all(shape[0] <= 4 for shape in ner.batches)
+        assert results == [ner(text) for text in texts]
+    
+    def test_empty_text(self):
+        """Test testo vuoto"""
+        assert make_ner(stride=2)("") == []
+    
+    def test_invalid_stride(self):
+        """Test stride non compatibile con la finestra"""
+        with pytest.raises(ValueError):
+            make_ner(stride=6)
@@ -46,7 +46,13 @@ class FoundryEmbedding(Embeddings):
         )
         return response.data[0].embedding
 
-embedding_model = FoundryEmbedding(client)
+# Cache degli embedding su disco: ai riavvii vengono ricalcolati solo i documenti nuovi o modificati
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+embedding_model = CachedEmbeddings(
+    FoundryEmbedding(client),
+    "text-embedding-ada-002",
+    EmbeddingCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings.sqlite"))
+)
 
 # ---- Caricamento dei documenti da cartella ----
 from langchain_core.documents import Document
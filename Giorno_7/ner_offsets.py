@@ -0,0 +1,130 @@
+import numpy as np
+import torch
+from transformers import PreTrainedTokenizerFast
+
+# Tokens shared by consecutive windows of a long text
+DEFAULT_STRIDE = 128
+
+def align_entities(text, entities):
+    """
+    Give a character span to NER entities that have none (slow tokenizers).
+
+    Entities come out of the pipeline in text order, so each word is searched
+    from the end of the previous one: repeated names get their own position
+    and the text is scanned once overall.
+
+    Args:
+        text (str): The text passed to the NER pipeline
+        entities (list): Pipeline entities, in text order
+
+    Returns:
+        list: The same entities, with start/end set where the word was found
+    """
+    cursor = 0
+    for entity in entities:
+        if entity.get('start') is None:
+            # Remove leading ▁ if present (XLM-RoBERTa tokenizer specific)
+            clean_text = entity['word'].replace('▁', ' ').strip()
+            position = text.find(clean_text, cursor)
+            if position == -1:
+                continue
+            entity['start'] = position
+            entity['end'] = position + len(clean_text)
+            entity['word'] = clean_text
+        cursor = max(cursor, entity['end'])
+    return entities
+
+def ner_entities(ner_pipeline, texts, batch_size=8, stride=DEFAULT_STRIDE):
+    """
+    Run NER on a batch of texts with exact character offsets.
+
+    Texts are tokenized together with the fast tokenizer's offset mapping.
+    Long texts are split into windows that share `stride` tokens, and each
+    shared token keeps the prediction of the window where it is farthest from
+    the edge, so entities crossing a window boundary are tagged with full
+    context and grouped as one. The model runs on the whole batch, and tokens
+    are grouped into entities with numpy over all texts at once, like the
+    pipeline's "simple" aggregation. Slow tokenizers have no offset mapping:
+    the pipeline is used and its entities aligned with align_entities.
+
+    Args:
+        ner_pipeline: HuggingFace token-classification pipeline
+        texts (list): Texts to analyze
+        batch_size (int): Windows per forward pass
+        stride (int): Tokens shared by consecutive windows of a text
+
+    Returns:
+        list: For each text, entities as dicts (entity_group, score, word, start, end)
+    """
+    tokenizer = ner_pipeline.tokenizer
+    if not isinstance(tokenizer, PreTrainedTokenizerFast):
+        return [align_entities(text, ner_pipeline(text)) for text in texts]
+    if not texts:
+        return []
+
+    model = ner_pipeline.model
+    max_length = min(tokenizer.model_max_length, getattr(model.config, "max_position_embeddings", 512))
+    encoding = tokenizer(
+        list(texts), return_offsets_mapping=True, return_overflowing_tokens=True,
+        truncation=True, max_length=max_length, stride=min(stride, max_length // 2),
+        padding=True, return_special_tokens_mask=True, return_tensors="np"
+    )
+
+    logits = []
+    with torch.no_grad():
+        for i in range(0, len(encoding["input_ids"]), batch_size):
+            inputs = {
+                name: torch.as_tensor(encoding[name][i:i + batch_size])
+                for name in ("input_ids", "attention_mask", "token_type_ids") if name in encoding
+            }
+            logits.append(model(**inputs).logits.float().numpy())
+    logits = np.concatenate(logits)
+    probabilities = np.exp(logits - logits.max(-1, keepdims=True))
+    probabilities /= probabilities.sum(-1, keepdims=True)
+
+    # Flatten the real tokens of every window, with their distance from the window edges
+    offsets = encoding["offset_mapping"]
+    keep = (encoding["attention_mask"] == 1) & (encoding["special_tokens_mask"] == 0) & (offsets[..., 1] > offsets[..., 0])
+    columns = np.arange(keep.shape[1])
+    first_column = keep.argmax(1)[:, None]
+    last_column = keep.shape[1] - 1 - keep[:, ::-1].argmax(1)[:, None]
+    edge_distance = np.minimum(columns - first_column, last_column - columns)[keep]
+    text_ids = np.broadcast_to(np.asarray(encoding["overflow_to_sample_mapping"])[:, None], keep.shape)[keep]
+    label_ids = probabilities.argmax(-1)[keep]
+    scores = probabilities.max(-1)[keep]
+    starts, ends = offsets[..., 0][keep], offsets[..., 1][keep]
+
+    # Tokens shared by two windows: keep the copy farthest from an edge
+    order = np.lexsort((-edge_distance, starts, text_ids))
+    unique = np.ones(len(order), dtype=bool)
+    unique[1:] = (text_ids[order][1:] != text_ids[order][:-1]) | (starts[order][1:] != starts[order][:-1])
+    order = order[unique]
+    text_ids, label_ids, scores = text_ids[order], label_ids[order], scores[order]
+    starts, ends = starts[order], ends[order]
+
+    id2label = model.config.id2label
+    labels = [id2label[int(i)] for i in range(len(id2label))]
+    entity_type = np.array([label.split("-", 1)[-1] if label != "O" else "" for label in labels])[label_ids]
+    is_begin = np.array([label.startswith("B-") for label in labels])[label_ids]
+
+    # A token opens a new entity on B-, on a type change or at a new text
+    inside = entity_type != ""
+    new_group = np.ones(len(label_ids), dtype=bool)
+    new_group[1:] = is_begin[1:] | (entity_type[1:] != entity_type[:-1]) | (text_ids[1:] != text_ids[:-1])
+    first = np.flatnonzero(new_group)
+    last = np.append(first[1:], len(label_ids)) - 1
+    mean_scores = np.add.reduceat(scores, first) / (last - first + 1) if len(first) else scores
+
+    results = [[] for _ in texts]
+    for f, l, score in zip(first, last, mean_scores):
+        if inside[f]:
+            text = texts[text_ids[f]]
+            start, end = int(starts[f]), int(ends[l])
+            results[text_ids[f]].append({
+                "entity_group": str(entity_type[f]),
+                "score": float(score),
+                "word": text[start:end],
+                "start": start,
+                "end": end,
+            })
+    return results
@@ -14,6 +14,9 @@ os.environ['CURL_CA_BUNDLE'] = certifi.where()
 
 from transformers import pipeline
 
+# Entità NER con offset esatti (finestre sovrapposte, batch su tutti i documenti)
+from ner_offsets import ner_entities
+
 ner_pipeline = pipeline("ner", 
                    model="Davlan/bert-base-multilingual-cased-ner-hrl",
                    aggregation_strategy="simple"
@@ -65,29 +68,18 @@ Documento:
  
 def anonymize_documents():
     os.makedirs("anonymized", exist_ok=True)
-    for file in os.listdir("Giorno_6\\documenti"):
+    files = os.listdir("Giorno_6\\documenti")
+    texts = []
+    for file in files:
         with open(os.path.join("Giorno_6\\documenti", file), "r", encoding="utf-8") as f:
-            text = f.read()
+            texts.append(f.read())
+    # Entità NER di tutti i documenti in un solo batch
+    all_entities = ner_entities(ner_pipeline, texts)
+    for file, text, model_entities in zip(files, texts, all_entities):
         iban_pattern = r'\b[A-Z]{2}\d{2}[A-Z0-9]{1,30}\b'
         fiscal_code_pattern = r'\b([A-Z]{6}\d{2}[A-Z]\d{2}[A-Z]\d{3}[A-Z])\b'
         cell_number_pattern = r'\b(?:\+39)?3\d{8,9}\b' # Italian cell number pattern (e.g., 3XXYYYYYYY or +393XXXXXXXXX)
         email_pattern = r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+'
-        # Get NER results with simple aggregation strategy
-        model_entities = ner_pipeline(text)
-        # Manually find start and end positions for model results
-        for entity in model_entities:
-            if 'start' not in entity or entity['start'] is None:
-                # Find the entity word in the original text
-                entity_text = entity['word']
-                # Remove leading ▁ if present (XLM-RoBERTa tokenizer specific)
-                clean_text = entity_text.replace('▁', ' ').strip()
-                # Find position in original text
-                position = text.find(clean_text)
-                if position != -1:
-                    entity['start'] = position
-                    entity['end'] = position + len(clean_text)
-                    # Update word to match the text in the document
-                    entity['word'] = clean_text
         # Convert model entities to the same format as regex matches
         results = []
         for entity in model_entities:
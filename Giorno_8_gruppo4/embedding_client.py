@@ -0,0 +1,197 @@
+"""
+Client di embedding a batch e in parallelo per i front-end RAG (OpenAI/Azure).
+
+Gli input sono raggruppati in poche richieste, entro il budget di token al
+minuto del deployment; le risposte 429/5xx vengono ripetute rispettando il
+Retry-After del server.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Limiti Azure per text-embedding-ada-002: 8191 token per input; alcune
+# versioni dell'API accettano al massimo 16 input per richiesta
+MAX_INPUT_TOKENS = 8191
+MAX_BATCH_INPUTS = 16
+MAX_BATCH_TOKENS = 32000
+
+
+class TokenBudget:
+    """Budget di token al minuto (TPM) condiviso da tutte le richieste in corso"""
+
+    def __init__(self, tokens_per_minute: int) -> None:
+        self.capacity = tokens_per_minute
+        self.available = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def acquire(self, tokens: int) -> None:
+        tokens = min(tokens, self.capacity)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                self._cond.wait((tokens - self.available) / self.rate)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Secondi di attesa chiesti dal server (header Retry-After / retry-after-ms)"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Vero per 429, errori 5xx e problemi di connessione"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("RateLimitError", "APIConnectionError", "APITimeoutError", "Timeout")
+
+
+class EmbeddingClient:
+    """
+    Embedding a batch e in parallelo su un client OpenAI/Azure.
+
+    Gli input sono raggruppati in richieste limitate per numero di token e di
+    input, al più max_concurrency richieste sono in volo, il budget TPM viene
+    rispettato prima di ogni richiesta e le risposte 429/5xx sono ripetute
+    dopo il Retry-After del server (o con backoff esponenziale); durante
+    l'attesa si fermano anche le altre richieste. I vettori tornano
+    nell'ordine degli input.
+
+    I tentativi sono gestiti solo qui: i retry interni del client OpenAI sono
+    disattivati, altrimenti ogni tentativo ne nasconderebbe altri max_retries
+    dell'SDK. Gli input oltre MAX_INPUT_TOKENS vengono troncati.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        max_batch_inputs: int = MAX_BATCH_INPUTS,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_concurrency: int = 4,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 6,
+        encoding_name: str = "cl100k_base",
+    ) -> None:
+        # with_options restituisce una copia: il client del chiamante non cambia
+        self.client = client.with_options(max_retries=0) if hasattr(client, "with_options") else client
+        self.model = model
+        self.max_batch_inputs = max_batch_inputs
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.encoding = tiktoken.get_encoding(encoding_name) if tiktoken is not None else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.truncated = 0
+
+    def truncate(self, text: str) -> Tuple[str, int]:
+        """Testo ridotto a MAX_INPUT_TOKENS token e numero di token da inviare"""
+        if self.encoding is None:
+            # Senza tokenizer i token sono stimati (circa 4 caratteri l'uno):
+            # il taglio usa 2 caratteri per token per restare sotto il limite
+            if len(text) > MAX_INPUT_TOKENS * 2:
+                text = text[:MAX_INPUT_TOKENS * 2]
+                self.truncated += 1
+            return text, len(text) // 4 + 1
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) > MAX_INPUT_TOKENS:
+            tokens = tokens[:MAX_INPUT_TOKENS]
+            text = self.encoding.decode(tokens)
+            self.truncated += 1
+        return text, len(tokens)
+
+    def pack(self, counts: Sequence[int]) -> List[List[int]]:
+        """Indici degli input (dati i loro token) raggruppati in richieste, in ordine"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        tokens = 0
+        for i, n in enumerate(counts):
+            if current and (len(current) >= self.max_batch_inputs or tokens + n > self.max_batch_tokens):
+                batches.append(current)
+                current, tokens = [], 0
+            current.append(i)
+            tokens += n
+        if current:
+            batches.append(current)
+        return batches
+
+    def _wait_pause(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _request(self, batch: List[str], tokens: int) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self._wait_pause()
+            if self.budget is not None:
+                self.budget.acquire(tokens)
+            try:
+                with self._lock:
+                    self.requests += 1
+                response = self.client.embeddings.create(input=batch, model=self.model)
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+            except Exception as error:
+                if attempt == self.max_retries or not is_retryable(error):
+                    raise
+                delay = retry_after(error)
+                if delay is None:
+                    delay = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                with self._lock:
+                    self.retries += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                attempt += 1
+
+    def embed(self, texts: Sequence[str],
+              on_progress: Optional[Callable[[int, int], None]] = None) -> List[List[float]]:
+        """Vettori degli input nello stesso ordine; on_progress(fatti, totale) dopo ogni richiesta"""
+        prepared = [self.truncate(text) for text in texts]
+        texts = [text for text, _ in prepared]
+        counts = [count for _, count in prepared]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        done = 0
+
+        def run(indexes: List[int]) -> List[int]:
+            tokens = sum(counts[i] for i in indexes)
+            for i, vector in zip(indexes, self._request([texts[i] for i in indexes], tokens)):
+                results[i] = vector
+            return indexes
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as pool:
+            for indexes in pool.map(run, self.pack(counts)):
+                done += len(indexes)
+                if on_progress:
+                    on_progress(done, len(texts))
+        return results
@@ -6,6 +6,7 @@ from azure.ai.projects import AIProjectClient
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
 from langchain.embeddings.base import Embeddings
+from embedding_client import EmbeddingClient
 from typing import List
 import re
 from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
@@ -61,6 +62,8 @@ class AdaEmbeddingModel(AIProjectClientDefinition):
         self.client = client_class.client
         self.model_name = model_name
         self.azure_client = client_class.client.inference.get_azure_openai_client(api_version="2023-05-15")
+        # Richieste a batch e in parallelo, con gestione dei 429 (Retry-After)
+        self.batch_client = EmbeddingClient(self.azure_client, self.model_name)
 
 
     def embed_text(self, text: str) -> list[float]:
@@ -70,6 +73,9 @@ class AdaEmbeddingModel(AIProjectClientDefinition):
         )
         return response.data[0].embedding
 
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        return self.batch_client.embed(texts)
+
 
 
 class LangchainAdaWrapper(Embeddings):
@@ -77,7 +83,7 @@ class LangchainAdaWrapper(Embeddings):
         self.ada_model = ada_model
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        return [self.ada_model.embed_text(text) for text in texts]
+        return self.ada_model.embed_texts(texts)
 
     def embed_query(self, text: str) -> List[float]:
         return self.ada_model.embed_text(text)